@@ -0,0 +1,91 @@
+"""Бэкенды кеша со статистикой попаданий и промахов.
+
+Статистика ведётся в памяти процесса отдельно для каждого бэкенда
+(класс и расположение) и общая для всех потоков воркера. Экземпляры
+бэкендов создаются на поток, поэтому флаг ``_counting`` не разделяется.
+"""
+import threading
+from collections import defaultdict
+
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from . import metrics
+
+_MISSING = object()
+_lock = threading.Lock()
+_stats = defaultdict(lambda: {'hits': 0, 'misses': 0})
+
+
+def cache_stats():
+    """Снимок статистики: попадания, промахи и доля попаданий."""
+    with _lock:
+        snapshot = {name: dict(values) for name, values in _stats.items()}
+    for values in snapshot.values():
+        total = values['hits'] + values['misses']
+        values['hit_rate'] = values['hits'] / total if total else None
+    return snapshot
+
+
+def reset_cache_stats():
+    with _lock:
+        _stats.clear()
+
+
+class StatsMixin:
+    """Подсчёт попаданий для ``get`` и ``get_many``.
+
+    Бэкенды реализуют один метод через другой, поэтому учитывается
+    только внешний вызов.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(location, params)
+        self.stats_name = f'{type(self).__name__}:{location}'
+        self._counting = False
+
+    def _record(self, hits, misses):
+        with _lock:
+            values = _stats[self.stats_name]
+            values['hits'] += hits
+            values['misses'] += misses
+        metrics.add_cache_lookups(hits, misses)
+
+    def get(self, key, default=None, version=None):
+        if self._counting:
+            return super().get(key, default, version)
+        self._counting = True
+        try:
+            value = super().get(key, _MISSING, version)
+        finally:
+            self._counting = False
+        if value is _MISSING:
+            self._record(0, 1)
+            return default
+        self._record(1, 0)
+        return value
+
+    def get_many(self, keys, version=None):
+        if self._counting:
+            return super().get_many(keys, version)
+        keys = list(keys)
+        self._counting = True
+        try:
+            found = super().get_many(keys, version)
+        finally:
+            self._counting = False
+        self._record(len(found), len(keys) - len(found))
+        return found
+
+
+class StatsLocMemCache(StatsMixin, LocMemCache):
+    pass
+
+
+class StatsFileBasedCache(StatsMixin, FileBasedCache):
+    pass
+
+
+class StatsDatabaseCache(StatsMixin, DatabaseCache):
+    pass
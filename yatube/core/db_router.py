@@ -0,0 +1,48 @@
+"""Чтение с реплик, запись в основную базу.
+
+Реплики перечислены в ``DATABASE_REPLICAS``. Поток закрепляется за
+основной базой после первой записи и внутри транзакций, а
+``ReplicaPinMiddleware`` продлевает закрепление cookie на
+``DATABASE_PIN_SECONDS``: пользователь сразу видит свой пост или
+комментарий, даже если реплики отстают.
+"""
+import random
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_local = threading.local()
+
+
+def reset(pinned=False):
+    """Начать новый запрос; вернуть, была ли запись в предыдущем."""
+    wrote = getattr(_local, 'wrote', False)
+    _local.pinned = pinned
+    _local.wrote = False
+    return wrote
+
+
+def is_pinned():
+    return getattr(_local, 'pinned', False)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if (
+            not replicas
+            or is_pinned()
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        _local.pinned = True
+        _local.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """Реплики — копии основной базы, связи между ними допустимы."""
+        return True
@@ -0,0 +1,140 @@
+"""Метрики производительности запросов.
+
+Замер текущего запроса хранится в ``threading.local``: его дополняют
+обёртка SQL, бэкенд шаблонов и бэкенды кеша. По завершении запроса
+замер попадает в агрегаты по представлениям — счётчики и гистограммы
+времени ответа в памяти процесса.
+"""
+import threading
+import time
+from collections import defaultdict
+
+# Верхние границы корзин гистограммы времени ответа, мс.
+BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, float('inf'))
+
+_local = threading.local()
+_lock = threading.Lock()
+
+
+def _empty():
+    return {
+        'requests': 0,
+        'total_ms': 0.0,
+        'sql_queries': 0,
+        'sql_ms': 0.0,
+        'template_ms': 0.0,
+        'cache_hits': 0,
+        'cache_misses': 0,
+        'histogram': [0] * len(BUCKETS),
+    }
+
+
+_views = defaultdict(_empty)
+
+
+class Measurement:
+    """Показатели одного запроса."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total_ms = 0.0
+        self.sql_queries = 0
+        self.sql_ms = 0.0
+        self.template_ms = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def finish(self):
+        self.total_ms = (time.perf_counter() - self.started) * 1000
+
+    def server_timing(self):
+        """Значение заголовка ``Server-Timing``."""
+        return ', '.join((
+            f'total;dur={self.total_ms:.1f}',
+            f'db;dur={self.sql_ms:.1f};desc="{self.sql_queries} queries"',
+            f'tpl;dur={self.template_ms:.1f}',
+            f'cache;desc="{self.cache_hits} hits, '
+            f'{self.cache_misses} misses"',
+        ))
+
+
+def start():
+    _local.measurement = Measurement()
+    return _local.measurement
+
+
+def stop():
+    measurement = current()
+    _local.measurement = None
+    return measurement
+
+
+def current():
+    return getattr(_local, 'measurement', None)
+
+
+def sql_wrapper(execute, sql, params, many, context):
+    """Обёртка ``connection.execute_wrapper``: число и время запросов."""
+    measurement = current()
+    if measurement is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        measurement.sql_queries += 1
+        measurement.sql_ms += (time.perf_counter() - started) * 1000
+
+
+def add_template_time(seconds):
+    measurement = current()
+    if measurement is not None:
+        measurement.template_ms += seconds * 1000
+
+
+def add_cache_lookups(hits, misses):
+    measurement = current()
+    if measurement is not None:
+        measurement.cache_hits += hits
+        measurement.cache_misses += misses
+
+
+def record(view, measurement):
+    """Добавить замер запроса в агрегаты представления ``view``."""
+    bucket = next(
+        index for index, bound in enumerate(BUCKETS)
+        if measurement.total_ms <= bound
+    )
+    with _lock:
+        values = _views[view]
+        values['requests'] += 1
+        values['total_ms'] += measurement.total_ms
+        values['sql_queries'] += measurement.sql_queries
+        values['sql_ms'] += measurement.sql_ms
+        values['template_ms'] += measurement.template_ms
+        values['cache_hits'] += measurement.cache_hits
+        values['cache_misses'] += measurement.cache_misses
+        values['histogram'][bucket] += 1
+
+
+def snapshot():
+    """Агрегаты по представлениям со средними и гистограммой."""
+    with _lock:
+        views = {
+            view: dict(values, histogram=list(values['histogram']))
+            for view, values in _views.items()
+        }
+    bounds = ['+Inf' if bound == float('inf') else bound
+              for bound in BUCKETS]
+    for values in views.values():
+        requests = values['requests']
+        values['mean_ms'] = values['total_ms'] / requests
+        values['mean_sql_queries'] = values['sql_queries'] / requests
+        values['histogram'] = dict(zip(map(str, bounds),
+                                       values['histogram']))
+    return views
+
+
+def reset():
+    with _lock:
+        _views.clear()
@@ -0,0 +1,70 @@
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import db_router, metrics
+
+PIN_COOKIE = 'db_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+
+class PerformanceMiddleware:
+    """Замер времени ответа, SQL, шаблонов и кеша для представлений.
+
+    Учитываются представления из пространств имён
+    ``PERFORMANCE_NAMESPACES``; результат уходит в заголовок
+    ``Server-Timing`` и в агрегаты ``core.metrics``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.namespaces = set(settings.PERFORMANCE_NAMESPACES)
+
+    def __call__(self, request):
+        measurement = metrics.start()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(metrics.sql_wrapper)
+                    )
+                response = self.get_response(request)
+        finally:
+            metrics.stop()
+        measurement.finish()
+        match = getattr(request, 'resolver_match', None)
+        if match is None or match.namespace not in self.namespaces:
+            return response
+        metrics.record(match.view_name, measurement)
+        if settings.PERFORMANCE_SERVER_TIMING:
+            response['Server-Timing'] = measurement.server_timing()
+        return response
+
+
+class ReplicaPinMiddleware:
+    """Чтение своих записей: после записи — основная база на время.
+
+    Небезопасные методы целиком идут в основную базу, а ответ на
+    запрос с записью ставит cookie, пока оно живо, чтение не уходит
+    на реплики.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        db_router.reset(
+            pinned=PIN_COOKIE in request.COOKIES
+            or request.method not in SAFE_METHODS
+        )
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = db_router.reset()
+        if wrote and settings.DATABASE_REPLICAS:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=settings.DATABASE_PIN_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response
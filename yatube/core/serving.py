@@ -0,0 +1,145 @@
+"""Раздача статики и медиа без DEBUG (``SERVE_FILES``).
+
+Статика берётся из ``STATIC_ROOT`` после ``collectstatic``. Файл с
+хешем в имени кешируется браузером на год как неизменяемый, а при
+подходящем ``Accept-Encoding`` вместо него отдаётся готовая копия
+``.br`` или ``.gz``. Медиа с именем из хеша содержимого
+(``core.storage``) тоже неизменяемы.
+
+Байты медиа Python не читает: при ``MEDIA_SENDFILE`` ответ содержит
+только заголовок ``X-Accel-Redirect`` (nginx) или ``X-Sendfile``
+(Apache), и файл отдаёт фронт-сервер; без него ``FileResponse`` уходит
+в ``wsgi.file_wrapper``, который WSGI-сервер передаёт через sendfile.
+"""
+import mimetypes
+import os
+import re
+from pathlib import Path
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import (
+    ImproperlyConfigured, SuspiciousFileOperation,
+)
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseNotModified,
+)
+from django.urls import re_path
+from django.utils._os import safe_join
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+IMMUTABLE_SECONDS = 60 * 60 * 24 * 365
+# Файлы без хеша в имени браузер перепроверяет через час.
+REVALIDATE_SECONDS = 60 * 60
+# styles.3f2a1b4c5d6e.css — имя из манифеста статики.
+STATIC_HASHED = re.compile(r'\.[0-9a-f]{12}\.\w+$')
+# posts/3f/3fa2….jpg — имя из хеша содержимого.
+MEDIA_HASHED = re.compile(r'(^|/)([0-9a-f]{2})/\2[0-9a-f]{62}\.\w+$')
+# Кодировки по предпочтению и суффиксы их копий.
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+SENDFILE_BACKENDS = ('x-accel', 'x-sendfile')
+
+
+def file_patterns():
+    """Маршруты статики и медиа для urls.py."""
+    return [
+        re_path(_prefix(settings.STATIC_URL), static),
+        re_path(_prefix(settings.MEDIA_URL), media),
+    ]
+
+
+def _prefix(url):
+    return r'^%s(?P<path>.+)$' % re.escape(url.lstrip('/'))
+
+
+def _find(root, path):
+    try:
+        fullpath = Path(safe_join(root, path))
+    except SuspiciousFileOperation:
+        raise Http404
+    if not fullpath.is_file():
+        raise Http404
+    return fullpath
+
+
+def accepted_encodings(request):
+    """Кодировки из ``Accept-Encoding``, кроме запрещённых ``q=0``."""
+    encodings = set()
+    for part in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        name, *params = (item.strip() for item in part.split(';'))
+        if not any(re.fullmatch(r'q=0(\.0*)?', p) for p in params):
+            encodings.add(name.lower())
+    return encodings
+
+
+def _content_type(fullpath):
+    return mimetypes.guess_type(str(fullpath))[0] or 'application/octet-stream'
+
+
+def _finish(response, stat, immutable):
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    if immutable:
+        patch_cache_control(
+            response, public=True, max_age=IMMUTABLE_SECONDS, immutable=True
+        )
+    else:
+        patch_cache_control(
+            response, public=True, max_age=REVALIDATE_SECONDS
+        )
+    return response
+
+
+def static(request, path):
+    fullpath = _find(settings.STATIC_ROOT, path)
+    stat = fullpath.stat()
+    immutable = bool(STATIC_HASHED.search(path))
+    if not was_modified_since(
+        request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime
+    ):
+        return _finish(HttpResponseNotModified(), stat, immutable)
+    served, encoding = fullpath, None
+    accepted = accepted_encodings(request)
+    for name, suffix in ENCODINGS:
+        candidate = fullpath.with_name(fullpath.name + suffix)
+        if name in accepted and candidate.is_file():
+            served, encoding = candidate, name
+            break
+    response = FileResponse(
+        served.open('rb'), content_type=_content_type(fullpath)
+    )
+    if encoding:
+        response['Content-Encoding'] = encoding
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return _finish(response, stat, immutable)
+
+
+def media(request, path):
+    fullpath = _find(settings.MEDIA_ROOT, path)
+    stat = fullpath.stat()
+    immutable = bool(MEDIA_HASHED.search(path))
+    if not was_modified_since(
+        request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime
+    ):
+        return _finish(HttpResponseNotModified(), stat, immutable)
+    backend = settings.MEDIA_SENDFILE
+    content_type = _content_type(fullpath)
+    if not backend:
+        response = FileResponse(fullpath.open('rb'), content_type=content_type)
+    elif backend not in SENDFILE_BACKENDS:
+        raise ImproperlyConfigured(
+            f'MEDIA_SENDFILE: ожидается одно из {SENDFILE_BACKENDS}.'
+        )
+    else:
+        response = HttpResponse(content_type=content_type)
+        if backend == 'x-accel':
+            relative = fullpath.relative_to(
+                os.path.abspath(settings.MEDIA_ROOT)
+            ).as_posix()
+            response['X-Accel-Redirect'] = (
+                settings.MEDIA_SENDFILE_URL + quote(relative)
+            )
+        else:
+            response['X-Sendfile'] = str(fullpath)
+    return _finish(response, stat, immutable)
@@ -0,0 +1,119 @@
+"""Хранилища медиафайлов и статики.
+
+Медиа хранятся с адресацией по содержимому.
+
+Файл сохраняется под именем из SHA-256 его содержимого в каталоге,
+который задало поле (``upload_to``): ``posts/3f/3fa2….jpg``. Вторая
+загрузка той же картинки не пишет ничего и получает то же имя, а
+миниатюры sorl, чьи имена выводятся из имени исходника, становятся
+общими. Поэтому файл нельзя удалять вместе с одним из ссылающихся на
+него объектов: неиспользуемые файлы убирает команда ``gc_media``.
+
+Статика после ``collectstatic`` получает хеш в имени (манифест
+Django) и готовые сжатые копии ``.gz`` и ``.br`` рядом с файлом, чтобы
+их отдавать без сжатия на лету (см. ``core.serving``). Brotli
+используется, если установлен пакет ``brotli``.
+"""
+import gzip
+import hashlib
+import io
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+CHUNK_SIZE = 64 * 1024
+COMPRESSIBLE = (
+    '.css', '.js', '.map', '.svg', '.ico', '.txt', '.json', '.xml',
+    '.html',
+)
+# Меньшие файлы сжатие почти не уменьшает.
+MIN_COMPRESS_SIZE = 256
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    for chunk in content.chunks(CHUNK_SIZE):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+@deconstructible
+class HashedFileSystemStorage(FileSystemStorage):
+    """``FileSystemStorage``, где имя файла — хеш содержимого."""
+
+    def hashed_name(self, name, content):
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        digest = content_hash(content)
+        return os.path.join(directory, digest[:2], digest + extension)
+
+    def _save(self, name, content):
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            # Свежая дата защищает файл от gc_media, пока ссылка на него
+            # ещё не сохранена в базе.
+            os.utime(self.path(name))
+            return name
+        return super()._save(name, content)
+
+
+def _gzip(data):
+    """gzip без времени в заголовке: одинаковые файлы — одинаковые копии.
+
+    ``gzip.compress(mtime=...)`` появился только в Python 3.8.
+    """
+    buffer = io.BytesIO()
+    with gzip.GzipFile(
+        fileobj=buffer, mode='wb', compresslevel=9, mtime=0
+    ) as archive:
+        archive.write(data)
+    return buffer.getvalue()
+
+
+def compressed_copies(data):
+    """Суффикс -> сжатые байты; копии не меньше исходника отбрасываются."""
+    copies = {'.gz': _gzip(data)}
+    if brotli is not None:
+        copies['.br'] = brotli.compress(data)
+    return {
+        suffix: body for suffix, body in copies.items()
+        if len(body) < len(data)
+    }
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Статика с хешем в имени и сжатыми копиями рядом с файлом."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        compressed = set()
+        for name, hashed_name, processed in super().post_process(
+            paths, dry_run, **options
+        ):
+            # При ошибке вместо имени приходит исключение.
+            if (
+                not dry_run and isinstance(hashed_name, str)
+                and hashed_name not in compressed
+            ):
+                self.compress(hashed_name)
+                compressed.add(hashed_name)
+            yield name, hashed_name, processed
+
+    def compress(self, name):
+        if not name.endswith(COMPRESSIBLE):
+            return
+        with self.open(name) as source:
+            data = source.read()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return
+        for suffix, body in compressed_copies(data).items():
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            self._save(name + suffix, ContentFile(body))
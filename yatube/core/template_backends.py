@@ -0,0 +1,32 @@
+"""Бэкенд шаблонов Django с учётом времени отрисовки в метриках."""
+import time
+
+from django.template.backends import django as django_backend
+
+from . import metrics
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.add_template_time(time.perf_counter() - started)
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """Обычный DTL; шаблоны верхнего уровня отрисовываются с замером.
+
+    Вложенные ``include`` и ``extends`` идут мимо бэкенда, поэтому
+    время не считается дважды.
+    """
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except django_backend.TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
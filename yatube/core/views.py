@@ -1,5 +1,10 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
 from django.shortcuts import render
 
+from . import metrics
+from .cache_backends import cache_stats
+
 
 def page_not_found(request, exception):
     return render(
@@ -17,3 +22,12 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=""):
     return render(request, "core/403csrf.html")
+
+
+@staff_member_required
+def performance_metrics(request):
+    """Агрегаты замеров по представлениям и статистика кешей."""
+    return JsonResponse(
+        {'views': metrics.snapshot(), 'caches': cache_stats()},
+        json_dumps_params={'ensure_ascii': False},
+    )
@@ -0,0 +1,64 @@
+"""Число комментариев и время последней активности поста.
+
+Поля ``Post.comment_count`` и ``Post.last_activity`` меняются одним
+UPDATE с ``F()`` при добавлении и удалении комментария, поэтому
+одновременные комментарии не теряются, а ленты могут показывать и
+сортировать посты по активности без JOIN и COUNT.
+"""
+from django.db import models, transaction
+from django.db.models import Count, F, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Post
+
+BATCH_SIZE = 1000
+
+
+def _latest_comment():
+    return Subquery(
+        Comment.objects.filter(post=OuterRef('pk')).order_by()
+        .values('post').annotate(latest=Max('created')).values('latest')
+    )
+
+
+def comment_added(comment):
+    Post.objects.filter(pk=comment.post_id).update(
+        comment_count=F('comment_count') + 1,
+        # Без output_field SQLite сохранит дату в другом текстовом формате,
+        # и сравнение с остальными строками поломается.
+        last_activity=Greatest(
+            'last_activity',
+            Value(comment.created, output_field=models.DateTimeField()),
+        ),
+    )
+
+
+def comment_removed(comment):
+    """Уменьшить счётчик и вернуть активность к последнему комментарию."""
+    Post.objects.filter(pk=comment.post_id).update(
+        comment_count=Greatest(F('comment_count') - 1, Value(0)),
+        last_activity=Greatest(
+            'pub_date', Coalesce(_latest_comment(), 'pub_date')
+        ),
+    )
+
+
+def refresh_post_activity(batch_size=BATCH_SIZE):
+    """Пересчитать поля активности постов пачками по первичному ключу."""
+    total = Subquery(
+        Comment.objects.filter(post=OuterRef('pk')).order_by()
+        .values('post').annotate(total=Count('id')).values('total')
+    )
+    last = Post.objects.order_by('-pk').values_list('pk', flat=True).first()
+    updated = 0
+    for start in range(0, last or 0, batch_size):
+        with transaction.atomic():
+            updated += Post.objects.filter(
+                pk__gt=start, pk__lte=start + batch_size
+            ).update(
+                comment_count=Coalesce(total, Value(0)),
+                last_activity=Greatest(
+                    'pub_date', Coalesce(_latest_comment(), 'pub_date')
+                ),
+            )
+    return updated
@@ -0,0 +1,446 @@
+"""JSON API: посты, группы, комментарии и подписки.
+
+Ответы собираются из ``values()`` с JOIN к авторам и группам, без
+экземпляров моделей и шаблонов; параметр ``fields`` сужает набор
+колонок в SELECT. Списки листаются курсором (``CursorPaginator``),
+а ETag строится по версиям областей кеша (см. ``posts.caching``),
+поэтому запрос с ``If-None-Match`` получает 304 без обращения к базе.
+
+Запись — от имени пользователя сессии, с CSRF-токеном в заголовке
+``X-CSRFToken``; тело — JSON или multipart (картинка поста).
+"""
+import json
+from functools import wraps
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.http import Http404, HttpResponse, JsonResponse, QueryDict
+from django.http.multipartparser import MultiPartParserError
+from django.shortcuts import get_object_or_404
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, patch_vary_headers,
+)
+from django.utils.datastructures import MultiValueDict
+from django.utils.http import http_date
+
+from . import caching, counters, follows, ranking, search
+from .feed import FEED_ORDERING, feed_posts
+from .forms import CommentForm, PostForm
+from .models import Comment, Follow, Group, Post
+from .utils import CURSOR_PARAM, CursorPaginator
+from .views import INDEX_ORDERINGS, group_authors, post_ordering
+
+User = get_user_model()
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+SAFE_METHODS = ('GET', 'HEAD')
+
+# Поле ответа -> путь поля в values().
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'comment_count': 'comment_count',
+    'last_activity': 'last_activity',
+}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'post': 'post_id',
+    'author': 'author__username',
+    'text': 'text',
+    'created': 'created',
+}
+GROUP_FIELDS = {
+    'id': 'id',
+    'slug': 'slug',
+    'title': 'title',
+    'description': 'description',
+}
+FOLLOWER_FIELDS = {
+    'id': 'id',
+    'username': 'user__username',
+}
+FOLLOWING_FIELDS = {
+    'id': 'id',
+    'username': 'author__username',
+}
+COMMENT_ORDERING = ('-created', '-id')
+GROUP_ORDERING = ('id',)
+FOLLOW_ORDERING = ('-id',)
+
+
+class ApiError(Exception):
+    """Ошибка запроса, которая отдаётся клиенту как JSON."""
+
+    def __init__(self, status, detail):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+def _error(status, detail):
+    return JsonResponse({'detail': detail}, status=status)
+
+
+def api_view(*methods, login=False):
+    """Допустимые методы, вход для записи и ошибки в виде JSON."""
+    if 'GET' in methods:
+        methods += ('HEAD',)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                response = _error(405, 'Метод не поддерживается.')
+                response['Allow'] = ', '.join(methods)
+                return response
+            if (
+                (login or request.method not in SAFE_METHODS)
+                and not request.user.is_authenticated
+            ):
+                return _error(401, 'Требуется вход.')
+            try:
+                return view(request, *args, **kwargs)
+            except Http404:
+                return _error(404, 'Не найдено.')
+            except ApiError as error:
+                return _error(error.status, error.detail)
+        return wrapper
+    return decorator
+
+
+def conditional(request, scopes, build):
+    """Ответ ``build()`` с ETag по версиям ``scopes``.
+
+    Версии читаются до выборки данных; совпавший ETag даёт 304,
+    и ``build`` не вызывается.
+    """
+    versions = caching.get_versions(scopes)
+    etag, last_modified = caching.validators(
+        f'{request.get_full_path()}|{request.user.pk}', versions
+    )
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        response = JsonResponse(build())
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_vary_headers(response, ('Cookie',))
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def requested_fields(request, spec):
+    """Поля из ``?fields=a,b``; по умолчанию — все."""
+    value = request.GET.get('fields')
+    if not value:
+        return list(spec)
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = sorted(set(names) - spec.keys())
+    if unknown or not names:
+        raise ApiError(400, f'Неизвестные поля: {", ".join(unknown)}.')
+    return names
+
+
+def page_size(request):
+    try:
+        size = int(request.GET.get('limit', PAGE_SIZE))
+    except ValueError:
+        raise ApiError(400, 'limit должен быть числом.')
+    return min(max(size, 1), MAX_PAGE_SIZE)
+
+
+def serialize(row, names, spec):
+    """Строка values() -> словарь ответа с запрошенными полями."""
+    item = {name: row[spec[name]] for name in names}
+    if 'image' in item:
+        item['image'] = (
+            default_storage.url(item['image']) if item['image'] else None
+        )
+    return item
+
+
+def rows(queryset, names, spec, extra=()):
+    return queryset.values(*{spec[name] for name in names}, *extra)
+
+
+def page(request, queryset, spec, ordering):
+    """Страница списка по курсору со ссылками на соседние страницы."""
+    names = requested_fields(request, spec)
+    keys = [field.lstrip('-') for field in ordering]
+    paginator = CursorPaginator(
+        rows(queryset, names, spec, keys), page_size(request), ordering
+    )
+    token = request.GET.get(CURSOR_PARAM)
+    try:
+        direction, values = paginator.decode(token)
+    except ValueError:
+        raise ApiError(400, 'Некорректный курсор.')
+    current = paginator.page(direction, values, token)
+    return {
+        'results': [serialize(row, names, spec) for row in current],
+        'next': _page_url(request, current.next_cursor),
+        'previous': _page_url(request, current.previous_cursor),
+    }
+
+
+def _page_url(request, token):
+    if token is None:
+        return None
+    query = request.GET.copy()
+    query[CURSOR_PARAM] = token
+    return request.build_absolute_uri(f'?{query.urlencode()}')
+
+
+def detail(request, queryset, spec, extra=()):
+    """Объект с запрошенными полями и строка values() с ``extra``."""
+    names = requested_fields(request, spec)
+    row = rows(queryset, names, spec, extra).first()
+    if row is None:
+        raise Http404
+    return serialize(row, names, spec), row
+
+
+def payload(request):
+    """Данные запроса и файлы: JSON-объект или форма.
+
+    Тело формы Django разбирает только для POST, для PATCH оно
+    разбирается здесь теми же обработчиками загрузки.
+    """
+    if request.content_type != 'application/json':
+        if request.method == 'POST':
+            return request.POST.dict(), request.FILES
+        return form_payload(request)
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        raise ApiError(400, 'Некорректный JSON.')
+    if not isinstance(data, dict):
+        raise ApiError(400, 'Ожидается JSON-объект.')
+    return data, None
+
+
+def form_payload(request):
+    if request.content_type == 'multipart/form-data':
+        try:
+            data, files = request.parse_file_upload(request.META, request)
+        except MultiPartParserError:
+            raise ApiError(400, 'Некорректное тело multipart.')
+    elif request.content_type == 'application/x-www-form-urlencoded':
+        data = QueryDict(request.body, encoding=request.encoding)
+        files = MultiValueDict()
+    else:
+        raise ApiError(
+            415, 'Ожидается JSON, multipart или форма urlencoded.'
+        )
+    return data.dict(), files
+
+
+def post_form(request, instance=None):
+    """Форма поста; группа в данных задаётся слагом, как в ответах."""
+    data, files = payload(request)
+    values = {}
+    if instance is not None:
+        values = {'text': instance.text, 'group': instance.group_id}
+    values.update(
+        (field, data[field]) for field in ('text', 'group') if field in data
+    )
+    group = values.get('group')
+    if isinstance(group, str) and group:
+        values['group'] = Group.objects.filter(slug=group).values_list(
+            'pk', flat=True
+        ).first() or group
+    form = PostForm(values, files=files, instance=instance)
+    if not form.is_valid():
+        raise ApiError(400, form.errors.get_json_data())
+    return form
+
+
+def _post_response(request, post, status=200):
+    data, _ = detail(request, Post.objects.filter(pk=post.pk), POST_FIELDS)
+    return JsonResponse(data, status=status)
+
+
+@api_view('GET', 'POST')
+def posts(request):
+    """Лента постов (``order``, ``group``, ``author``, ``q``) и создание."""
+    if request.method == 'POST':
+        form = post_form(request)
+        form.instance.author = request.user
+        post = form.save()
+        return _post_response(request, post, status=201)
+    order, ordering = post_ordering(request, INDEX_ORDERINGS)
+    scopes = ['posts']
+    queryset = Post.objects.all()
+    if order in ranking.ORDERINGS:
+        scopes.append('ranking')
+        queryset = ranking.ranked(queryset)
+    if 'group' in request.GET:
+        queryset = queryset.filter(group__slug=request.GET['group'])
+    if 'author' in request.GET:
+        queryset = queryset.filter(author__username=request.GET['author'])
+    if 'q' in request.GET:
+        queryset = search.filter_posts(queryset, request.GET['q'].strip())
+    return conditional(
+        request, scopes,
+        lambda: page(request, queryset, POST_FIELDS, ordering),
+    )
+
+
+@api_view('GET', 'PATCH')
+def post(request, post_id):
+    """Пост и его редактирование автором."""
+    if request.method == 'PATCH':
+        instance = get_object_or_404(Post, pk=post_id)
+        if instance.author_id != request.user.pk:
+            raise ApiError(403, 'Редактировать пост может только автор.')
+        return _post_response(request, post_form(request, instance).save())
+    return conditional(
+        request, ['posts', f'post:{post_id}'],
+        lambda: detail(
+            request, Post.objects.filter(pk=post_id), POST_FIELDS
+        )[0],
+    )
+
+
+@api_view('GET', 'POST')
+def comments(request, post_id):
+    """Комментарии поста, от новых к старым, и добавление комментария."""
+    if request.method == 'POST':
+        instance = get_object_or_404(Post, pk=post_id)
+        form = CommentForm(payload(request)[0])
+        if not form.is_valid():
+            raise ApiError(400, form.errors.get_json_data())
+        comment = form.save(commit=False)
+        comment.author = request.user
+        comment.post = instance
+        comment.save()
+        data, _ = detail(
+            request, Comment.objects.filter(pk=comment.pk), COMMENT_FIELDS
+        )
+        return JsonResponse(data, status=201)
+    return conditional(
+        request, [f'post:{post_id}'],
+        lambda: page(
+            request, Comment.objects.filter(post_id=post_id),
+            COMMENT_FIELDS, COMMENT_ORDERING,
+        ),
+    )
+
+
+@api_view('GET')
+def groups(request):
+    return conditional(
+        request, ['posts'],
+        lambda: page(request, Group.objects.all(), GROUP_FIELDS,
+                     GROUP_ORDERING),
+    )
+
+
+@api_view('GET')
+def group(request, slug):
+    def build():
+        data, row = detail(
+            request, Group.objects.filter(slug=slug), GROUP_FIELDS, ['id']
+        )
+        data['posts_count'] = counters.post_count(group=Group(pk=row['id']))
+        return data
+
+    return conditional(request, ['posts'], build)
+
+
+@api_view('GET')
+def author(request, username):
+    """Автор: число постов и подписчиков, подписан ли текущий пользователь."""
+    instance = get_object_or_404(
+        User.objects.only('pk', 'username', 'first_name', 'last_name'),
+        username=username,
+    )
+    scopes = ['posts', f'author:{instance.pk}']
+    user = request.user
+    if user.is_authenticated:
+        scopes.append(f'follow:{user.pk}')
+
+    def build():
+        return {
+            'username': instance.username,
+            'full_name': instance.get_full_name(),
+            'posts_count': counters.post_count(author=instance),
+            'followers_count': counters.follower_counts(
+                [instance.pk]
+            )[instance.pk],
+            'following': user.is_authenticated and Follow.objects.filter(
+                user=user, author=instance
+            ).exists(),
+        }
+
+    return conditional(request, scopes, build)
+
+
+@api_view('POST', 'DELETE')
+def follow(request, username):
+    """Подписка (POST) и отписка (DELETE); повтор ничего не меняет."""
+    instance = get_object_or_404(User, username=username)
+    if request.method == 'DELETE':
+        follows.unfollow(request.user, [instance.pk])
+        return HttpResponse(status=204)
+    if instance == request.user:
+        raise ApiError(400, 'Нельзя подписаться на себя.')
+    created = follows.follow(request.user, [instance.pk])
+    return JsonResponse(
+        {'author': instance.username, 'following': True},
+        status=201 if created else 200,
+    )
+
+
+@api_view('GET')
+def followers(request, username):
+    """Подписчики автора, новые первыми."""
+    instance = get_object_or_404(User.objects.only('pk'), username=username)
+    return conditional(
+        request, [f'author:{instance.pk}'],
+        lambda: page(
+            request, Follow.objects.filter(author=instance),
+            FOLLOWER_FIELDS, FOLLOW_ORDERING,
+        ),
+    )
+
+
+@api_view('GET')
+def following(request, username):
+    """Авторы, на которых подписан пользователь, новые первыми."""
+    instance = get_object_or_404(User.objects.only('pk'), username=username)
+    return conditional(
+        request, [f'follow:{instance.pk}'],
+        lambda: page(
+            request, Follow.objects.filter(user=instance),
+            FOLLOWING_FIELDS, FOLLOW_ORDERING,
+        ),
+    )
+
+
+@api_view('POST')
+def group_follow(request, slug):
+    """Подписка на всех авторов группы; повтор ничего не меняет."""
+    group = get_object_or_404(Group, slug=slug)
+    created = follows.follow(request.user, group_authors(group))
+    return JsonResponse(
+        {'group': group.slug, 'followed': len(created)},
+        status=201 if created else 200,
+    )
+
+
+@api_view('GET', login=True)
+def feed(request):
+    """Посты авторов, на которых подписан пользователь."""
+    return conditional(
+        request, ['posts', f'follow:{request.user.pk}'],
+        lambda: page(
+            request, feed_posts(request.user), POST_FIELDS, FEED_ORDERING
+        ),
+    )
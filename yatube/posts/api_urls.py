@@ -0,0 +1,26 @@
+from django.urls import path
+from . import api
+
+app_name = 'api'
+
+urlpatterns = [
+    path('posts/', api.posts, name='posts'),
+    path('posts/<int:post_id>/', api.post, name='post'),
+    path('posts/<int:post_id>/comments/', api.comments, name='comments'),
+    path('groups/', api.groups, name='groups'),
+    path('groups/<slug:slug>/', api.group, name='group'),
+    path(
+        'groups/<slug:slug>/follow/', api.group_follow, name='group_follow'
+    ),
+    path('authors/<str:username>/', api.author, name='author'),
+    path('authors/<str:username>/follow/', api.follow, name='follow'),
+    path(
+        'authors/<str:username>/followers/', api.followers,
+        name='followers'
+    ),
+    path(
+        'authors/<str:username>/following/', api.following,
+        name='following'
+    ),
+    path('feed/', api.feed, name='feed'),
+]
@@ -0,0 +1,435 @@
+"""Замеры маршрутов приложения posts на текущих данных.
+
+Каждый маршрут из ``posts/urls.py`` запрашивается тестовым клиентом
+несколько раз: по каждому считаются перцентили времени ответа, число
+SQL-запросов и пик памяти (tracemalloc) на один запрос. Маршруты,
+меняющие данные, не замеряются.
+
+Отдельно замеряется отрисовка основных шаблонов на контексте,
+который для них собирает представление: с кеширующим загрузчиком
+из настроек и с обычным, который читает и разбирает шаблоны заново.
+
+Загрузка картинок замеряется по пику памяти: Python-объектов
+(tracemalloc) и всего процесса (VmHWM, куда попадают и буферы
+Pillow), — в запросе ``post_create`` и в фоновой обработке.
+"""
+import gc
+import io
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.template import Engine, RequestContext, engines
+from django.template.loader import get_template
+from django.test import Client
+from django.test.client import BOUNDARY, encode_multipart
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from . import thumbnails, urls
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Маршруты с побочными эффектами: подписывают, отписывают и т.п.
+MUTATING = {
+    'add_comment', 'profile_follow', 'profile_unfollow', 'group_follow',
+}
+LOGIN_REQUIRED = {'post_create', 'post_edit', 'follow_index'}
+PERCENTILES = (50, 90, 95, 99)
+# Адрес вне INTERNAL_IPS, чтобы в ответ не встраивалась debug-панель.
+CLIENT_ADDR = '192.0.2.1'
+# Шаблон -> маршрут, который его отрисовывает.
+TEMPLATE_ROUTES = {
+    'posts/index.html': 'index',
+    'posts/profile.html': 'profile',
+    'posts/post_detail.html': 'post_detail',
+}
+# Картинки для замера загрузки: ширина, высота, мегабайты «хвоста»
+# после данных, чтобы файл превысил POSTS_UPLOAD_MAX_BYTES, и формат.
+# PNG draft() не уменьшает: маленький файл с градиентом декодируется
+# в полный размер.
+UPLOAD_SAMPLES = {
+    'photo': (1600, 1200, 0, 'jpeg'),
+    'large': (6000, 4000, 0, 'jpeg'),
+    'large_png': (6000, 4000, 0, 'png'),
+    'oversized': (1600, 1200, 16, 'jpeg'),
+}
+SAMPLE_TYPES = {'jpeg': ('jpg', 'image/jpeg'), 'png': ('png', 'image/png')}
+
+
+def route_kwargs():
+    """Аргументы маршрутов по данным из базы; ``None`` — данных нет."""
+    post = (
+        Post.objects.filter(pk=Comment.objects.values('post_id')[:1]).first()
+        or Post.objects.first()
+    )
+    group = Group.objects.filter(posts__isnull=False).first()
+    username = post.author.username if post else None
+    follow = Follow.objects.select_related('user', 'author').first()
+    return {
+        'index': {},
+        'search': {},
+        'post_create': {},
+        'follow_index': {},
+        'group_list': group and {'slug': group.slug},
+        'profile': username and {'username': username},
+        'followers': follow and {'username': follow.author.username},
+        'following': follow and {'username': follow.user.username},
+        'post_detail': post and {'post_id': post.pk},
+        'post_comments': post and {'post_id': post.pk},
+        'post_edit': post and {'post_id': post.pk},
+    }
+
+
+def routes():
+    """Имена маршрутов posts: замеряемые и пропущенные."""
+    names = [pattern.name for pattern in urls.urlpatterns]
+    measured = [name for name in names if name not in MUTATING]
+    return measured, sorted(MUTATING & set(names))
+
+
+def _query(name):
+    if name == 'search':
+        return {'q': 'пост'}
+    return {}
+
+
+def _client(name, post):
+    client = Client(REMOTE_ADDR=CLIENT_ADDR)
+    if name not in LOGIN_REQUIRED:
+        return client
+    if name == 'post_edit' and post is not None:
+        user = post.author
+    else:
+        follow = Follow.objects.select_related('user').first()
+        user = follow.user if follow else User.objects.first()
+    if user is not None:
+        client.force_login(user)
+    return client
+
+
+def _revision():
+    """Коммит рабочей копии, чтобы сравнивать отчёты между коммитами."""
+    try:
+        result = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def _percentiles(timings):
+    """Перцентили с линейной интерполяцией между соседними замерами.
+
+    То же, что ``statistics.quantiles(method='inclusive')``, которого
+    нет в Python 3.7.
+    """
+    ordered = sorted(timings)
+    last = len(ordered) - 1
+    result = {}
+    for p in PERCENTILES:
+        position = last * p / 100
+        low = int(position)
+        high = min(low + 1, last)
+        fraction = position - low
+        result[f'p{p}'] = (
+            ordered[low] + (ordered[high] - ordered[low]) * fraction
+        )
+    return result
+
+
+def measure(url, client, requests, cold=False, params=None):
+    """Замер одного маршрута: время в мс, запросы и память в КиБ."""
+    timings, queries = [], []
+    client.get(url, params)  # прогрев: шаблоны, соединение
+    for _ in range(requests):
+        if cold:
+            caches['posts'].clear()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = client.get(url, params)
+            timings.append((time.perf_counter() - started) * 1000)
+        queries.append(len(captured))
+    if cold:
+        caches['posts'].clear()
+    tracemalloc.start()
+    try:
+        client.get(url, params)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'url': url,
+        'status': response.status_code,
+        'requests': requests,
+        'mean_ms': statistics.mean(timings),
+        **{f'{key}_ms': value
+           for key, value in _percentiles(timings).items()},
+        'max_ms': max(timings),
+        'queries': max(queries),
+        'peak_memory_kib': peak / 1024,
+        'response_kib': len(response.content) / 1024,
+    }
+
+
+def run(requests=20, cold=False, only=None):
+    """Замерить маршруты и вернуть отчёт, пригодный для JSON."""
+    measured, skipped = routes()
+    kwargs = route_kwargs()
+    post_id = (kwargs.get('post_detail') or {}).get('post_id')
+    post = Post.objects.select_related('author').filter(pk=post_id).first()
+    report = {
+        'meta': {
+            'commit': _revision(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'requests': requests,
+            'cold_cache': cold,
+            'data': {
+                'users': User.objects.count(),
+                'groups': Group.objects.count(),
+                'posts': Post.objects.count(),
+                'comments': Comment.objects.count(),
+                'follows': Follow.objects.count(),
+            },
+        },
+        'routes': {},
+        'skipped': skipped,
+    }
+    for name in measured:
+        if only and name not in only:
+            continue
+        route = kwargs.get(name)
+        if route is None:
+            report['skipped'].append(name)
+            continue
+        url = reverse(f'posts:{name}', kwargs=route)
+        report['routes'][name] = measure(
+            url, _client(name, post), requests, cold, _query(name)
+        )
+    return report
+
+
+def compare(report, baseline, metric='p50_ms'):
+    """Изменение метрики относительно прошлого отчёта, в процентах."""
+    changes = {}
+    for name, values in report['routes'].items():
+        old = baseline.get('routes', {}).get(name, {}).get(metric)
+        if old:
+            changes[name] = (values[metric] - old) / old * 100
+    return changes
+
+
+def template_context(route, kwargs):
+    """Контекст и запрос, с которыми представление рендерит шаблон."""
+    caches['posts'].clear()
+    response = Client(REMOTE_ADDR=CLIENT_ADDR).get(
+        reverse(f'posts:{route}', kwargs=kwargs)
+    )
+    # Для страницы с include контекстов несколько, первый — страницы.
+    context = response.context
+    if isinstance(context, list):
+        context = context[0]
+    return context.flatten(), response.wsgi_request
+
+
+def plain_engine():
+    """Движок с настройками проекта, но без кеширующего загрузчика."""
+    configured = engines.all()[0].engine
+    return Engine(
+        dirs=configured.dirs,
+        loaders=[
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ],
+        context_processors=configured.context_processors,
+        libraries=configured.libraries,
+        builtins=configured.builtins,
+    )
+
+
+def time_render(render, repeat):
+    """Время отрисовки в мс; кеш фрагментов очищается перед каждой."""
+    render()  # прогрев
+    timings = []
+    for _ in range(repeat):
+        caches['posts'].clear()
+        started = time.perf_counter()
+        render()
+        timings.append((time.perf_counter() - started) * 1000)
+    caches['posts'].clear()
+    return {
+        'mean_ms': statistics.mean(timings),
+        **{f'{key}_ms': value
+           for key, value in _percentiles(timings).items()},
+    }
+
+
+def run_templates(repeat=50, only=None):
+    """Замерить отрисовку шаблонов и вернуть отчёт, пригодный для JSON."""
+    kwargs = route_kwargs()
+    engine = plain_engine()
+    report = {
+        'meta': {
+            'commit': _revision(),
+            'django': django.get_version(),
+            'repeat': repeat,
+            'posts': Post.objects.count(),
+        },
+        'templates': {},
+        'skipped': [],
+    }
+    for name, route in TEMPLATE_ROUTES.items():
+        if only and name not in only:
+            continue
+        if kwargs.get(route) is None:
+            report['skipped'].append(name)
+            continue
+        context, request = template_context(route, kwargs[route])
+        report['templates'][name] = {
+            'cached_loader': time_render(
+                lambda: get_template(name).render(context, request), repeat
+            ),
+            'plain_loader': time_render(
+                lambda: engine.get_template(name).render(
+                    RequestContext(request, context)
+                ),
+                repeat,
+            ),
+        }
+    return report
+
+
+def sample_image(width, height, padding_mb=0, fmt='jpeg'):
+    """JPEG с шумом, который сжимается примерно как фотография.
+
+    PNG — с градиентом: при тех же пикселях файл в сотни раз меньше.
+    """
+    if fmt == 'png':
+        base = Image.linear_gradient('L').resize((width, height))
+    else:
+        base = Image.effect_noise((width // 8, height // 8), 40).resize(
+            (width, height), Image.BICUBIC
+        )
+    image = Image.merge('RGB', (
+        base, base.rotate(180), base.transpose(Image.FLIP_LEFT_RIGHT)
+    ))
+    buffer = io.BytesIO()
+    if fmt == 'png':
+        image.save(buffer, 'PNG')
+    else:
+        image.save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue() + b'\0' * padding_mb * 1024 * 1024
+
+
+def _status_kib(field):
+    """Поле /proc/self/status в КиБ или ``None`` вне Linux."""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith(f'{field}:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak_rss():
+    try:
+        with open('/proc/self/clear_refs', 'w') as refs:
+            refs.write('5')
+    except OSError:
+        return False
+    return True
+
+
+def measure_memory(action):
+    """Время и пики памяти одного вызова ``action``."""
+    gc.collect()
+    peak_reset = _reset_peak_rss()
+    before = _status_kib('VmRSS')
+    tracemalloc.start()
+    try:
+        started = time.perf_counter()
+        result = action()
+        elapsed = (time.perf_counter() - started) * 1000
+        _, python_peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    peak = _status_kib('VmHWM')
+    return result, {
+        'ms': elapsed,
+        'python_peak_kib': python_peak / 1024,
+        'rss_peak_kib': (
+            peak - before if peak_reset and peak is not None else None
+        ),
+    }
+
+
+def measure_upload(client, width, height, padding_mb=0, fmt='jpeg'):
+    """Загрузка картинки через ``post_create`` и её фоновая обработка."""
+    content = sample_image(width, height, padding_mb, fmt)
+    extension, content_type = SAMPLE_TYPES[fmt]
+    body = encode_multipart(BOUNDARY, {
+        'text': 'Замер загрузки',
+        'image': SimpleUploadedFile(
+            f'sample.{extension}', content, content_type
+        ),
+    })
+    last = Post.objects.order_by('pk').values_list('pk', flat=True).last()
+    # Тело собрано заранее, чтобы в замер попал только разбор запроса.
+    response, request = measure_memory(lambda: client.post(
+        reverse('posts:post_create'), body,
+        content_type=f'multipart/form-data; boundary={BOUNDARY}',
+    ))
+    post = Post.objects.filter(pk__gt=last or 0).first()
+    result = {
+        'upload_kib': len(content) / 1024,
+        'status': response.status_code,
+        'accepted': post is not None,
+        'request': request,
+    }
+    if post is not None and post.image:
+        _, result['worker'] = measure_memory(
+            lambda: thumbnails.generate(post.image.name)
+        )
+    return result
+
+
+def run_uploads(only=None):
+    """Замерить загрузку картинок; данные и файлы не сохраняются."""
+    report = {
+        'meta': {
+            'commit': _revision(),
+            'django': django.get_version(),
+            'upload_max_bytes': settings.POSTS_UPLOAD_MAX_BYTES,
+            'image_max_pixels': settings.POSTS_IMAGE_MAX_PIXELS,
+            'image_max_side': settings.POSTS_IMAGE_MAX_SIDE,
+        },
+        'uploads': {},
+    }
+    with tempfile.TemporaryDirectory() as media, \
+            override_settings(MEDIA_ROOT=media), transaction.atomic():
+        client = Client(REMOTE_ADDR=CLIENT_ADDR)
+        client.force_login(User.objects.create_user('upload-benchmark'))
+        for name, (width, height, padding_mb, fmt) in UPLOAD_SAMPLES.items():
+            if only and name not in only:
+                continue
+            report['uploads'][name] = {
+                'width': width, 'height': height, 'format': fmt,
+                **measure_upload(client, width, height, padding_mb, fmt),
+            }
+        transaction.set_rollback(True)
+    return report
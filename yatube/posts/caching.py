@@ -0,0 +1,205 @@
+"""Версии кешируемых фрагментов и страниц.
+
+Каждая область (``posts``, ``post:<id>``, ``author:<id>``,
+``group:<id>``, ``follow:<user_id>``, ``ranking``) имеет версию в кеше;
+сигналы и пересчёт оценок повышают её при изменении данных, а версия
+входит в ключ фрагмента.
+Поэтому фрагменты можно хранить часами: устаревшие ключи просто
+перестают запрашиваться. Это верно для общего кеша; в кеше процесса
+(locmem) версии истекают вместе с фрагментами.
+
+Страницы для анонимов кешируются целиком вместе с версиями областей,
+от которых зависят; те же версии дают ETag и Last-Modified.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, QueryDict
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, patch_vary_headers,
+)
+from django.utils.http import http_date
+
+CACHE_ALIAS = 'posts'
+VERSION_KEY = 'version:{}'
+PAGE_KEY = 'page:{}'
+# Параметры запроса, от которых зависят кешируемые страницы.
+PAGE_PARAMS = ('page', 'order', 'cursor', 'comments', 'q')
+
+
+def posts_cache():
+    """Кеш фрагментов постов с собственным префиксом ключей."""
+    return caches[CACHE_ALIAS]
+
+
+def _now():
+    return int(time.time() * 1000)
+
+
+def get_versions(scopes):
+    """Версии областей; отсутствующие инициализируются текущим временем."""
+    cache = posts_cache()
+    keys = {scope: VERSION_KEY.format(scope) for scope in scopes}
+    stored = cache.get_many(keys.values())
+    versions = {}
+    for scope, key in keys.items():
+        if key not in stored:
+            cache.add(key, _now(), version_ttl())
+            stored[key] = cache.get(key)
+        versions[scope] = stored[key]
+    return versions
+
+
+def bump(*scopes):
+    """Сделать устаревшими фрагменты, зависящие от областей ``scopes``.
+
+    Версия — время изменения в миллисекундах, поэтому она растёт даже
+    после вытеснения ключа из кеша.
+    """
+    cache = posts_cache()
+    keys = [VERSION_KEY.format(scope) for scope in scopes]
+    stored = cache.get_many(keys)
+    now = _now()
+    cache.set_many(
+        {key: max(now, stored.get(key, 0) + 1) for key in keys},
+        version_ttl(),
+    )
+
+
+def post_scopes(author_id, group_id):
+    """Области страниц, на которых виден пост этого автора и группы."""
+    scopes = ['posts', f'author:{author_id}']
+    if group_id is not None:
+        scopes.append(f'group:{group_id}')
+    return scopes
+
+
+def bump_posts(rows):
+    """Повысить версии страниц постов из строк (id, author_id, group_id)."""
+    scopes = set()
+    for pk, author_id, group_id in rows:
+        scopes.add(f'post:{pk}')
+        scopes.update(post_scopes(author_id, group_id))
+    if scopes:
+        bump(*scopes)
+
+
+def fragment_scopes(name, user, ranked=False):
+    """Области, от которых зависит фрагмент страницы ``name``.
+
+    ``ranked`` — лента отсортирована по оценкам из ``posts.ranking``.
+    """
+    if name == 'follow':
+        return ['posts', f'follow:{user.pk}']
+    if ranked:
+        return ['posts', 'ranking']
+    return ['posts']
+
+
+def fragment_version(name, user, ranked=False):
+    versions = get_versions(fragment_scopes(name, user, ranked))
+    return '.'.join(str(versions[scope]) for scope in sorted(versions))
+
+
+def fragment_ttl():
+    return settings.POSTS_FRAGMENT_CACHE_TTL
+
+
+def page_ttl():
+    return settings.POSTS_PAGE_CACHE_TTL
+
+
+def version_ttl():
+    """Версии в общем кеше бессрочные, в кеше процесса — как фрагменты.
+
+    Истёкшая версия заводится заново текущим временем, поэтому воркер,
+    не видевший ``bump()``, отстаёт не дольше срока жизни фрагментов.
+    """
+    if settings.CACHE_SHARED:
+        return None
+    return max(fragment_ttl(), page_ttl())
+
+
+def depends_on(request, *scopes):
+    """Отметить области, от которых зависит страница запроса.
+
+    Версии читаются сразу, до выборки остальных данных страницы:
+    изменение во время отрисовки не спрячется за новой версией.
+    """
+    versions = getattr(request, 'page_versions', {})
+    versions.update(get_versions(scopes))
+    request.page_versions = versions
+
+
+def validators(path, versions):
+    """ETag и время последнего изменения (в секундах) по версиям."""
+    state = ','.join(
+        f'{scope}={versions[scope]}' for scope in sorted(versions)
+    )
+    digest = hashlib.md5(f'{path}|{state}'.encode()).hexdigest()
+    return f'"{digest}"', max(versions.values()) // 1000
+
+
+def page_query(query):
+    """Только параметры из ``PAGE_PARAMS``, в постоянном порядке."""
+    result = QueryDict(mutable=True)
+    for name in PAGE_PARAMS:
+        if name in query:
+            result.setlist(name, query.getlist(name))
+    result._mutable = False
+    return result
+
+
+def anonymous_page_cache(view):
+    """Кеш страницы целиком для анонимов с условными GET-запросами.
+
+    Представление объявляет зависимости через ``depends_on``. Запись
+    в кеше действительна, пока версии её областей не изменились.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if (
+            request.method not in ('GET', 'HEAD')
+            or request.user.is_authenticated
+        ):
+            return view(request, *args, **kwargs)
+        cache = posts_cache()
+        # Прочие параметры отбрасываются: иначе каждое ?x=… заводило
+        # бы свою запись и вытесняло настоящие страницы.
+        request.GET = page_query(request.GET)
+        path = request.path
+        if request.GET:
+            path = f'{path}?{request.GET.urlencode()}'
+        key = PAGE_KEY.format(hashlib.md5(path.encode()).hexdigest())
+        entry = cache.get(key)
+        if (
+            entry is not None
+            and get_versions(entry['versions']) == entry['versions']
+        ):
+            versions = entry['versions']
+            response = HttpResponse(
+                entry['content'], content_type=entry['content_type']
+            )
+        else:
+            response = view(request, *args, **kwargs)
+            versions = getattr(request, 'page_versions', None)
+            if response.status_code != 200 or not versions:
+                return response
+            cache.set(key, {
+                'versions': versions,
+                'content': response.content,
+                'content_type': response['Content-Type'],
+            }, page_ttl())
+        etag, last_modified = validators(path, versions)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, ('Cookie',))
+        patch_cache_control(response, no_cache=True)
+        return get_conditional_response(
+            request, etag=etag, last_modified=last_modified,
+            response=response,
+        )
+    return wrapper
@@ -0,0 +1,135 @@
+"""Денормализованные счётчики постов и подписчиков.
+
+Значения хранятся в таблице ``Counter`` и обновляются сигналами
+(см. ``posts.signals``), поэтому страницы не выполняют COUNT(*) по
+``Post``. Отсутствующий счётчик один раз вычисляется по индексу и
+сохраняется; ``refresh_post_counters`` пересчитывает всё заново.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from .models import Counter, Follow, Post
+
+ALL_POSTS_KEY = 'posts:all'
+
+
+def author_key(author_id):
+    return f'posts:author:{author_id}'
+
+
+def group_key(group_id):
+    return f'posts:group:{group_id}'
+
+
+def followers_key(author_id):
+    return f'followers:{author_id}'
+
+
+def post_keys(author_id, group_id):
+    """Ключи счётчиков, которые учитывают пост."""
+    keys = [ALL_POSTS_KEY, author_key(author_id)]
+    if group_id is not None:
+        keys.append(group_key(group_id))
+    return keys
+
+
+def _queryset_for(key):
+    """Запрос, по которому вычисляется значение счётчика."""
+    if key == ALL_POSTS_KEY:
+        return Post.objects.all()
+    if key.startswith('followers:'):
+        return Follow.objects.filter(author_id=key.split(':')[1])
+    _, field, pk = key.split(':')
+    return Post.objects.filter(**{f'{field}_id': pk})
+
+
+def get_counts(keys):
+    """Значения счётчиков по ключам; недостающие вычисляются и сохраняются."""
+    keys = list(keys)
+    counts = dict(
+        Counter.objects.filter(key__in=keys).values_list('key', 'value')
+    )
+    for key in keys:
+        if key not in counts:
+            counts[key] = _initialize(key)
+    return counts
+
+
+def _initialize(key):
+    value = _queryset_for(key).count()
+    try:
+        with transaction.atomic():
+            Counter.objects.create(key=key, value=value)
+    except IntegrityError:
+        return Counter.objects.get(key=key).value
+    return value
+
+
+def change(keys, delta):
+    """Атомарно изменить счётчики на ``delta``.
+
+    Недостающие счётчики создаются на пути записи, чтобы при чтении
+    страниц их уже не пришлось вычислять.
+    """
+    keys = list(keys)
+    updated = Counter.objects.filter(key__in=keys).update(
+        value=F('value') + delta
+    )
+    if updated < len(keys):
+        existing = set(
+            Counter.objects.filter(key__in=keys).values_list('key', flat=True)
+        )
+        for key in keys:
+            if key not in existing:
+                _initialize(key)
+
+
+def post_count(author=None, group=None):
+    """Число постов автора, группы или всех постов."""
+    if author is not None:
+        key = author_key(author.pk)
+    elif group is not None:
+        key = group_key(group.pk)
+    else:
+        key = ALL_POSTS_KEY
+    return get_counts([key])[key]
+
+
+def follower_counts(author_ids):
+    """Число подписчиков для каждого автора из ``author_ids``."""
+    keys = {author_id: followers_key(author_id) for author_id in author_ids}
+    counts = get_counts(keys.values())
+    return {author_id: counts[key] for author_id, key in keys.items()}
+
+
+def follow_feed_count(user):
+    """Число постов в ленте подписок как сумма счётчиков авторов."""
+    authors = Follow.objects.filter(user=user).values_list(
+        'author_id', flat=True
+    )
+    return sum(get_counts(author_key(pk) for pk in authors).values())
+
+
+def refresh_post_counters(batch_size=500):
+    """Пересчитать счётчики постов и подписчиков агрегатными запросами."""
+    totals = {ALL_POSTS_KEY: Post.objects.count()}
+    for field, make_key in (('author', author_key), ('group', group_key)):
+        rows = (
+            Post.objects.filter(**{f'{field}__isnull': False})
+            .order_by().values(field).annotate(total=Count('id'))
+        )
+        for row in rows.iterator():
+            totals[make_key(row[field])] = row['total']
+    rows = Follow.objects.order_by().values('author').annotate(
+        total=Count('id')
+    )
+    for row in rows.iterator():
+        totals[followers_key(row['author'])] = row['total']
+    with transaction.atomic():
+        Counter.objects.filter(key__startswith='posts:').delete()
+        Counter.objects.filter(key__startswith='followers:').delete()
+        Counter.objects.bulk_create(
+            (Counter(key=key, value=value) for key, value in totals.items()),
+            batch_size=batch_size,
+        )
+    return len(totals)
@@ -0,0 +1,101 @@
+"""Потоковая выгрузка групп, постов, комментариев и подписок.
+
+Строки читаются ``.iterator(chunk_size=...)`` и сразу превращаются
+в текст, поэтому память не зависит от объёма данных. Посты
+выгружаются в формате, который понимает ``import_posts``.
+"""
+import csv
+import json
+
+from .models import Comment, Follow, Group, Post
+
+CHUNK_SIZE = 2000
+# Размер кусков, которыми текст отдаётся в файл или ответ.
+BUFFER_SIZE = 64 * 1024
+FORMATS = ('jsonl', 'csv')
+
+# Колонка выгрузки -> путь поля в values_list.
+MODELS = {
+    'groups': (Group, (
+        ('id', 'id'),
+        ('slug', 'slug'),
+        ('title', 'title'),
+        ('description', 'description'),
+    )),
+    'posts': (Post, (
+        ('id', 'id'),
+        ('author', 'author__username'),
+        ('group', 'group__slug'),
+        ('pub_date', 'pub_date'),
+        ('image', 'image'),
+        ('text', 'text'),
+    )),
+    'comments': (Comment, (
+        ('id', 'id'),
+        ('post', 'post_id'),
+        ('author', 'author__username'),
+        ('created', 'created'),
+        ('text', 'text'),
+    )),
+    'follows': (Follow, (
+        ('id', 'id'),
+        ('user', 'user__username'),
+        ('author', 'author__username'),
+    )),
+}
+
+
+class _Echo:
+    """Файл для csv.writer, который возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def _plain(value):
+    """Даты — в ISO 8601 без потери микросекунд."""
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def rows(kind, chunk_size=CHUNK_SIZE):
+    """Кортежи значений таблицы ``kind`` в порядке первичного ключа."""
+    model, columns = MODELS[kind]
+    return model.objects.order_by('pk').values_list(
+        *(path for _, path in columns)
+    ).iterator(chunk_size=chunk_size)
+
+
+def header(kind):
+    return [name for name, _ in MODELS[kind][1]]
+
+
+def lines(kinds, fmt, chunk_size=CHUNK_SIZE):
+    """Строки выгрузки: в CSV одна таблица, в JSONL — с полем ``model``."""
+    if fmt == 'csv':
+        if len(kinds) != 1:
+            raise ValueError('CSV выгружает одну таблицу')
+        writer = csv.writer(_Echo())
+        yield writer.writerow(header(kinds[0]))
+        for row in rows(kinds[0], chunk_size):
+            yield writer.writerow(_plain(value) for value in row)
+        return
+    for kind in kinds:
+        names = header(kind)
+        for row in rows(kind, chunk_size):
+            record = {'model': kind, **dict(zip(names, row))}
+            yield json.dumps(
+                record, ensure_ascii=False, default=_plain
+            ) + '\n'
+
+
+def chunks(lines, size=BUFFER_SIZE):
+    """Склеить строки в куски около ``size`` символов."""
+    buffer, length = [], 0
+    for line in lines:
+        buffer.append(line)
+        length += len(line)
+        if length >= size:
+            yield ''.join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield ''.join(buffer)
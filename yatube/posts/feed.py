@@ -0,0 +1,176 @@
+"""Лента подписок с раздачей постов при записи (fan-out-on-write).
+
+Новый пост сразу попадает в ``FeedEntry`` каждого подписчика автора,
+а подписка добавляет в ленту посты автора. Для авторов, у которых
+подписчиков больше ``POSTS_FEED_FANOUT_LIMIT``, раздача не делается:
+их посты подмешиваются в ленту при чтении (fan-out-on-read).
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F, Q
+
+from . import counters
+from .models import FeedEntry, Follow, Post
+
+BATCH_SIZE = 500
+# Сортировка ленты: по полям FeedEntry, чтобы страница читалась обходом
+# индекса feed_user_pub_date_idx, а не сортировкой всей ленты.
+FEED_ORDERING = ('-feed_pub_date', '-feed_post_id')
+
+
+def fanout_limit():
+    return settings.POSTS_FEED_FANOUT_LIMIT
+
+
+def is_celebrity(author_id):
+    """Посты автора читаются напрямую, без раздачи по лентам."""
+    return counters.follower_counts([author_id])[author_id] > fanout_limit()
+
+
+def _insert(entries):
+    FeedEntry.objects.bulk_create(
+        entries, batch_size=BATCH_SIZE, ignore_conflicts=True
+    )
+
+
+def fan_out_post(post):
+    """Разложить новый пост по лентам подписчиков автора."""
+    if is_celebrity(post.author_id):
+        return
+    followers = Follow.objects.filter(author_id=post.author_id).values_list(
+        'user_id', flat=True
+    )
+    _insert(
+        FeedEntry(
+            user_id=user_id, post_id=post.pk,
+            author_id=post.author_id, pub_date=post.pub_date,
+        )
+        for user_id in followers.iterator()
+    )
+
+
+def fan_out_posts(posts):
+    """Разложить по лентам пачку постов, вставленных в обход сигналов."""
+    limit = fanout_limit()
+    fanned = {
+        author_id
+        for author_id, followers in counters.follower_counts(
+            {post.author_id for post in posts}
+        ).items()
+        if followers <= limit
+    }
+    by_author = defaultdict(list)
+    for post in posts:
+        if post.author_id in fanned:
+            by_author[post.author_id].append(post)
+    followers = Follow.objects.filter(author_id__in=by_author).values_list(
+        'author_id', 'user_id'
+    )
+    _insert(
+        FeedEntry(
+            user_id=user_id, post_id=post.pk,
+            author_id=author_id, pub_date=post.pub_date,
+        )
+        for author_id, user_id in followers.iterator()
+        for post in by_author[author_id]
+    )
+
+
+def add_author(user_id, author_id):
+    """Добавить в ленту пользователя все посты автора."""
+    add_authors(user_id, [author_id])
+
+
+def add_authors(user_id, author_ids):
+    """Добавить в ленту пользователя посты авторов, кроме знаменитостей."""
+    limit = fanout_limit()
+    fanned = [
+        author_id
+        for author_id, followers in counters.follower_counts(
+            author_ids
+        ).items()
+        if followers <= limit
+    ]
+    posts = Post.objects.filter(author_id__in=fanned).values_list(
+        'id', 'author_id', 'pub_date'
+    )
+    _insert(
+        FeedEntry(
+            user_id=user_id, post_id=post_id,
+            author_id=author_id, pub_date=pub_date,
+        )
+        for post_id, author_id, pub_date in posts.iterator()
+    )
+
+
+def remove_authors(user_id, author_ids):
+    """Убрать из ленты пользователя посты авторов."""
+    FeedEntry.objects.filter(
+        user_id=user_id, author_id__in=author_ids
+    ).delete()
+
+
+def backfill_author(author_id):
+    """Раздать посты автора всем подписчикам.
+
+    Нужно, когда автор перестаёт быть «знаменитостью»: посты, которые
+    читались напрямую, должны появиться в материализованных лентах.
+    """
+    followers = Follow.objects.filter(author_id=author_id).values_list(
+        'user_id', flat=True
+    )
+    for user_id in followers.iterator():
+        add_author(user_id, author_id)
+
+
+def feed_posts(user):
+    """Посты ленты подписок пользователя; сортировать по ``FEED_ORDERING``.
+
+    Ключ сортировки — аннотации ``feed_pub_date`` и ``feed_post_id``:
+    колонки ``FeedEntry`` для материализованной ленты и поля самого
+    поста, когда в ленту подмешаны знаменитости.
+    """
+    followed = Follow.objects.filter(user=user).values_list(
+        'author_id', flat=True
+    )
+    limit = fanout_limit()
+    celebrities = [
+        author_id
+        for author_id, followers in counters.follower_counts(followed).items()
+        if followers > limit
+    ]
+    if not celebrities:
+        return Post.objects.filter(feed_entries__user=user).annotate(
+            feed_pub_date=F('feed_entries__pub_date'),
+            feed_post_id=F('feed_entries__post_id'),
+        )
+    entries = FeedEntry.objects.filter(user=user).values('post_id')
+    return Post.objects.filter(
+        Q(pk__in=entries) | Q(author_id__in=celebrities)
+    ).annotate(feed_pub_date=F('pub_date'), feed_post_id=F('id'))
+
+
+def rebuild_feeds():
+    """Пересобрать все ленты по текущим подпискам одним INSERT ... SELECT."""
+    celebrities = list(
+        Follow.objects.order_by().values('author')
+        .annotate(followers=Count('id'))
+        .filter(followers__gt=fanout_limit())
+        .values_list('author', flat=True)
+    )
+    quote = connection.ops.quote_name
+    sql = (
+        f'INSERT INTO {quote(FeedEntry._meta.db_table)} '
+        '(user_id, post_id, author_id, pub_date) '
+        'SELECT f.user_id, p.id, p.author_id, p.pub_date '
+        f'FROM {quote(Follow._meta.db_table)} f '
+        f'JOIN {quote(Post._meta.db_table)} p ON p.author_id = f.author_id'
+    )
+    if celebrities:
+        placeholders = ', '.join(['%s'] * len(celebrities))
+        sql += f' WHERE f.author_id NOT IN ({placeholders})'
+    with transaction.atomic(), connection.cursor() as cursor:
+        FeedEntry.objects.all().delete()
+        cursor.execute(sql, celebrities)
@@ -0,0 +1,174 @@
+"""Подписки: вставка и удаление одним запросом.
+
+``follow`` и ``unfollow`` выполняют один ``INSERT … ON CONFLICT DO
+NOTHING`` или ``DELETE`` с ``RETURNING`` (SQLite 3.35+, PostgreSQL)
+для любого числа авторов. Повтор ничего не меняет, а ``RETURNING``
+возвращает только действительно созданные или удалённые подписки:
+для них и вызываются те же действия, что сигналы выполняют при
+сохранении ``Follow`` по одному (``followed`` и ``unfollowed``) —
+счётчики, ленты и версии кеша.
+
+Без ``RETURNING`` (старый SQLite, прочие СУБД) те же подписки
+вычисляются разницей выборок до и после записи в той же транзакции.
+"""
+from django.db import connections, router, transaction
+
+from . import caching, counters, feed
+from .models import Follow
+
+# Сколько авторов за раз: предел параметров запроса в SQLite — 999.
+BATCH_SIZE = 400
+# Первая версия SQLite с INSERT/DELETE … RETURNING.
+SQLITE_RETURNING = (3, 35, 0)
+
+
+def _alias():
+    return router.db_for_write(Follow)
+
+
+def supports_returning(alias):
+    """Умеет ли база вернуть строки из INSERT и DELETE."""
+    connection = connections[alias]
+    if connection.vendor == 'postgresql':
+        return True
+    if connection.vendor == 'sqlite':
+        version = connection.Database.sqlite_version_info
+        return version >= SQLITE_RETURNING
+    return False
+
+
+def _execute(alias, sql, params):
+    with connections[alias].cursor() as cursor:
+        cursor.execute(sql, params)
+        return [author_id for author_id, in cursor.fetchall()]
+
+
+def _names(alias):
+    quote = connections[alias].ops.quote_name
+    return (
+        quote(Follow._meta.db_table),
+        quote(Follow._meta.get_field('user').column),
+        quote(Follow._meta.get_field('author').column),
+    )
+
+
+def _followed_ids(alias, user_id, author_ids):
+    return set(
+        Follow.objects.using(alias)
+        .filter(user_id=user_id, author_id__in=author_ids)
+        .values_list('author_id', flat=True)
+    )
+
+
+def follow(user, author_ids):
+    """Подписать пользователя на авторов; вернуть id новых подписок."""
+    author_ids = sorted(set(author_ids) - {user.pk})
+    alias = _alias()
+    insert = _insert if supports_returning(alias) else _insert_fallback
+    created = []
+    with transaction.atomic(using=alias):
+        for start in range(0, len(author_ids), BATCH_SIZE):
+            batch = author_ids[start:start + BATCH_SIZE]
+            created += insert(alias, user.pk, batch)
+        followed(user.pk, created)
+    return created
+
+
+def _insert(alias, user_id, author_ids):
+    table, user_column, author_column = _names(alias)
+    rows = ', '.join(['(%s, %s)'] * len(author_ids))
+    return _execute(
+        alias,
+        f'INSERT INTO {table} ({user_column}, {author_column}) '
+        f'VALUES {rows} ON CONFLICT DO NOTHING '
+        f'RETURNING {author_column}',
+        [value for author_id in author_ids
+         for value in (user_id, author_id)],
+    )
+
+
+def _insert_fallback(alias, user_id, author_ids):
+    before = _followed_ids(alias, user_id, author_ids)
+    # bulk_create не шлёт сигналов: действия выполнит followed().
+    Follow.objects.using(alias).bulk_create(
+        [
+            Follow(user_id=user_id, author_id=author_id)
+            for author_id in author_ids if author_id not in before
+        ],
+        ignore_conflicts=True,
+    )
+    return sorted(_followed_ids(alias, user_id, author_ids) - before)
+
+
+def unfollow(user, author_ids):
+    """Отписать пользователя от авторов; вернуть id снятых подписок."""
+    author_ids = sorted(set(author_ids))
+    alias = _alias()
+    delete = _delete if supports_returning(alias) else _delete_fallback
+    removed = []
+    with transaction.atomic(using=alias):
+        for start in range(0, len(author_ids), BATCH_SIZE):
+            batch = author_ids[start:start + BATCH_SIZE]
+            removed += delete(alias, user.pk, batch)
+        unfollowed(user.pk, removed)
+    return removed
+
+
+def _delete_sql(alias, author_ids):
+    table, user_column, author_column = _names(alias)
+    placeholders = ', '.join(['%s'] * len(author_ids))
+    return (
+        f'DELETE FROM {table} WHERE {user_column} = %s '
+        f'AND {author_column} IN ({placeholders})'
+    )
+
+
+def _delete(alias, user_id, author_ids):
+    _, _, author_column = _names(alias)
+    return _execute(
+        alias,
+        f'{_delete_sql(alias, author_ids)} RETURNING {author_column}',
+        [user_id, *author_ids],
+    )
+
+
+def _delete_fallback(alias, user_id, author_ids):
+    before = _followed_ids(alias, user_id, author_ids)
+    if not before:
+        return []
+    # Запрос вместо QuerySet.delete(): сигнал post_delete повторил бы
+    # действия unfollowed() для каждой подписки.
+    with connections[alias].cursor() as cursor:
+        cursor.execute(
+            _delete_sql(alias, sorted(before)), [user_id, *sorted(before)]
+        )
+    return sorted(before - _followed_ids(alias, user_id, author_ids))
+
+
+def followed(user_id, author_ids):
+    """Учесть новые подписки и добавить посты авторов в ленту."""
+    if not author_ids:
+        return
+    counters.change(map(counters.followers_key, author_ids), 1)
+    feed.add_authors(user_id, author_ids)
+    caching.bump(
+        f'follow:{user_id}', *(f'author:{pk}' for pk in author_ids)
+    )
+
+
+def unfollowed(user_id, author_ids):
+    """Учесть снятые подписки и убрать посты авторов из ленты."""
+    if not author_ids:
+        return
+    counters.change(map(counters.followers_key, author_ids), -1)
+    feed.remove_authors(user_id, author_ids)
+    limit = feed.fanout_limit()
+    for author_id, followers in counters.follower_counts(
+        author_ids
+    ).items():
+        if followers == limit:
+            # Автор только что перестал читаться напрямую.
+            feed.backfill_author(author_id)
+    caching.bump(
+        f'follow:{user_id}', *(f'author:{pk}' for pk in author_ids)
+    )
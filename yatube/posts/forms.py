@@ -1,4 +1,5 @@
 from django import forms
+from . import images, uploads
 from .models import Post, Comment
 from django.contrib.auth import get_user_model
 
@@ -17,6 +18,38 @@ class PostForm(forms.ModelForm):
             'group': 'Группа, к которой будет относиться пост',
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Файл, отброшенный LimitedUploadHandler, до поля не доходит.
+        self.oversized = self.files.get('image')
+        if isinstance(self.oversized, uploads.OversizedUpload):
+            self.files = self.files.copy()
+            del self.files['image']
+        else:
+            self.oversized = None
+
+    def clean_image(self):
+        """Пределы размера файла и числа пикселей новой картинки."""
+        image = self.cleaned_data['image']
+        if self.oversized is not None:
+            uploads.check_size(self.oversized.size)
+        # Атрибут image ImageField ставит лишь новому загруженному файлу.
+        if image and hasattr(image, 'image'):
+            uploads.check_size(image.size)
+            uploads.check_pixels(*image.image.size)
+        return image
+
+    def save(self, commit=True):
+        """Варианты прежней картинки сбрасываются.
+
+        Новые строит очередь миниатюр: в запросе картинка целиком не
+        декодируется.
+        """
+        post = super().save(commit)
+        if commit and 'image' in self.changed_data:
+            images.clear_variants(post)
+        return post
+
 
 class CommentForm(forms.ModelForm):
     """Форма содания комментария."""
@@ -0,0 +1,202 @@
+"""Адаптивные варианты картинок постов.
+
+Новая картинка поста обрабатывается не в запросе, а в очереди
+миниатюр (``posts.thumbnails``): она один раз декодируется, обрезается
+по пропорциям карточки и кодируется в нескольких ширинах
+(``POSTS_IMAGE_WIDTHS``) в современных форматах (``POSTS_IMAGE_FORMATS``)
+и в JPEG для остальных браузеров. Варианты записываются в
+``PostImageVariant``, а шаблоны выводят их через ``<picture>`` и
+``srcset``, так что телефон скачивает узкую картинку; пока вариантов
+нет, показывается исходник.
+
+AVIF кодируется, если установлен ``pillow-avif-plugin``; WebP — если
+Pillow собран с libwebp.
+"""
+import io
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from . import caching
+from .models import Post, PostImageVariant
+
+try:
+    import pillow_avif  # noqa: F401 регистрирует формат AVIF
+except ImportError:
+    pass
+
+CARD_GEOMETRY = '960x339'
+VARIANTS_DIR = 'posts/variants'
+FALLBACK_FORMAT = 'jpeg'
+QUALITY = {'avif': 50, 'webp': 75, 'jpeg': 80}
+CONTENT_TYPES = {
+    'avif': 'image/avif', 'webp': 'image/webp', 'jpeg': 'image/jpeg',
+}
+EXTENSIONS = {'avif': 'avif', 'webp': 'webp', 'jpeg': 'jpg'}
+CARD_WIDTH, CARD_HEIGHT = map(int, CARD_GEOMETRY.split('x'))
+EXIF_ORIENTATION = 0x0112
+# Значения ориентации, при которых картинка повёрнута на 90°.
+ROTATED = {5, 6, 7, 8}
+
+
+def can_encode(fmt):
+    Image.init()
+    return fmt.upper() in Image.SAVE
+
+
+def formats():
+    """Форматы вариантов по предпочтению; JPEG — последним."""
+    return [
+        fmt for fmt in settings.POSTS_IMAGE_FORMATS
+        if fmt != FALLBACK_FORMAT and can_encode(fmt)
+    ] + [FALLBACK_FORMAT]
+
+
+def widths(source_width):
+    """Ширины без увеличения исходника; самая узкая есть всегда."""
+    allowed = sorted(settings.POSTS_IMAGE_WIDTHS)
+    return [
+        width for width in allowed if width <= source_width
+    ] or allowed[:1]
+
+
+def draft_size(image):
+    """Размер, до которого JPEG можно сразу уменьшить при декодировании."""
+    largest = max(settings.POSTS_IMAGE_WIDTHS)
+    size = (largest, round(largest * CARD_HEIGHT / CARD_WIDTH))
+    if image.getexif().get(EXIF_ORIENTATION) in ROTATED:
+        return size[::-1]
+    return size
+
+
+def encode(image, fmt):
+    buffer = io.BytesIO()
+    image.save(
+        buffer, fmt.upper(), quality=QUALITY.get(fmt, 80), optimize=True
+    )
+    return buffer.getvalue()
+
+
+def build_variants(post):
+    """Пересоздать варианты картинки поста; вернуть их список."""
+    old = list(post.image_variants.all())
+    variants = []
+    if post.image:
+        with default_storage.open(post.image.name) as source:
+            image = Image.open(source)
+            image.draft('RGB', draft_size(image))
+            image = ImageOps.exif_transpose(image).convert('RGB')
+        stem = os.path.splitext(os.path.basename(post.image.name))[0]
+        for width in widths(image.width):
+            height = round(width * CARD_HEIGHT / CARD_WIDTH)
+            resized = ImageOps.fit(
+                image, (width, height), Image.LANCZOS, centering=(0.5, 0.5)
+            )
+            for fmt in formats():
+                data = encode(resized, fmt)
+                name = default_storage.save(
+                    f'{VARIANTS_DIR}/{stem}-{width}w.{EXTENSIONS[fmt]}',
+                    ContentFile(data),
+                )
+                variants.append(PostImageVariant(
+                    post=post, format=fmt, width=width, height=height,
+                    file=name, size=len(data),
+                ))
+    with transaction.atomic():
+        PostImageVariant.objects.filter(pk__in=[v.pk for v in old]).delete()
+        PostImageVariant.objects.bulk_create(variants)
+    # Страницы, закешированные между сохранением поста и этим местом,
+    # ещё ссылаются на исходную картинку.
+    caching.bump(
+        f'post:{post.pk}',
+        *caching.post_scopes(post.author_id, post.group_id),
+    )
+    # Файл с тем же содержимым может быть у варианта другого поста.
+    names = {variant.file.name for variant in old}
+    names -= set(PostImageVariant.objects.filter(file__in=names).values_list(
+        'file', flat=True
+    ))
+    for name in names:
+        default_storage.delete(name)
+    return variants
+
+
+def clear_variants(post):
+    """Забыть варианты прежней картинки поста.
+
+    Файлы остаются: они могут быть общими с другими постами, а без
+    ссылок их удалит ``gc_media``.
+    """
+    if post.image_variants.all().delete()[0]:
+        caching.bump(
+            f'post:{post.pk}',
+            *caching.post_scopes(post.author_id, post.group_id),
+        )
+
+
+def build_missing(name):
+    """Построить варианты картинки ``name`` постам, у которых их нет.
+
+    Картинка декодируется один раз, остальные посты с тем же файлом
+    получают копии строк вариантов.
+    """
+    posts = list(missing(Post.objects.filter(image=name)).order_by('pk'))
+    if not posts:
+        return []
+    variants = build_variants(posts[0])
+    copies = [
+        PostImageVariant(
+            post=post, format=variant.format, width=variant.width,
+            height=variant.height, file=variant.file.name,
+            size=variant.size,
+        )
+        for post in posts[1:]
+        for variant in variants
+    ]
+    PostImageVariant.objects.bulk_create(copies, ignore_conflicts=True)
+    return variants + copies
+
+
+def missing(queryset=None):
+    """Посты с картинкой, у которых ещё нет вариантов."""
+    queryset = Post.objects.all() if queryset is None else queryset
+    return queryset.exclude(image='').filter(image_variants__isnull=True)
+
+
+def sources(variants):
+    """Данные для ``<picture>``: ``srcset`` по форматам и JPEG-запас.
+
+    ``None``, если вариантов нет и нужно показать исходную картинку.
+    """
+    by_format = {}
+    for variant in sorted(variants, key=lambda variant: variant.width):
+        by_format.setdefault(variant.format, []).append(variant)
+    fallback = by_format.pop(FALLBACK_FORMAT, None)
+    if not fallback:
+        return None
+    # Для src — самый узкий вариант не уже карточки.
+    default = next(
+        (variant for variant in fallback if variant.width >= CARD_WIDTH),
+        fallback[-1],
+    )
+    return {
+        'sources': [
+            {'type': CONTENT_TYPES[fmt], 'srcset': srcset(by_format[fmt])}
+            for fmt in settings.POSTS_IMAGE_FORMATS if fmt in by_format
+        ],
+        'src': default.file.url,
+        'srcset': srcset(fallback),
+        'width': default.width,
+        'height': default.height,
+        'sizes': f'(max-width: {CARD_WIDTH}px) 100vw, {CARD_WIDTH}px',
+    }
+
+
+def srcset(variants):
+    return ', '.join(
+        f'{variant.file.url} {variant.width}w' for variant in variants
+    )
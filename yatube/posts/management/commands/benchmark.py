@@ -0,0 +1,73 @@
+import json
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.benchmark import compare, run
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет маршруты posts: перцентили времени ответа, число '
+        'запросов и память; пишет отчёт в JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=20,
+            help='Число запросов к каждому маршруту.',
+        )
+        parser.add_argument(
+            '--route', action='append', dest='routes', metavar='NAME',
+            help='Замерить только этот маршрут (можно повторять).',
+        )
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кеш фрагментов перед каждым запросом.',
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0, metavar='POSTS',
+            help='Предварительно выполнить seed с таким числом постов.',
+        )
+        parser.add_argument(
+            '--output', metavar='FILE',
+            help='Записать отчёт в файл вместо вывода.',
+        )
+        parser.add_argument(
+            '--baseline', metavar='FILE',
+            help='Сравнить медиану с отчётом прошлого запуска.',
+        )
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests должно быть не меньше 1.')
+        if options['seed']:
+            posts = options['seed']
+            call_command(
+                'seed', users=max(posts // 100, 2),
+                groups=max(posts // 1000, 1), posts=posts,
+                comments=posts, follows=posts // 10,
+                stdout=self.stdout,
+            )
+        report = run(
+            requests=options['requests'], cold=options['cold'],
+            only=options['routes'],
+        )
+        if options['baseline']:
+            with open(options['baseline']) as baseline:
+                report['p50_change_percent'] = compare(
+                    report, json.load(baseline)
+                )
+        data = json.dumps(report, ensure_ascii=False, indent=2)
+        if not options['output']:
+            self.stdout.write(data)
+            return
+        with open(options['output'], 'w') as output:
+            output.write(data)
+        for name, values in report['routes'].items():
+            self.stdout.write(
+                f"{name}: p50 {values['p50_ms']:.2f} мс, "
+                f"p95 {values['p95_ms']:.2f} мс, "
+                f"запросов {values['queries']}, "
+                f"память {values['peak_memory_kib']:.0f} КиБ"
+            )
@@ -0,0 +1,57 @@
+import json
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from posts.benchmark import TEMPLATE_ROUTES, run_templates
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет отрисовку index.html, profile.html и post_detail.html '
+        'с кеширующим и обычным загрузчиком шаблонов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat', type=int, default=50,
+            help='Число отрисовок каждого шаблона.',
+        )
+        parser.add_argument(
+            '--template', action='append', dest='templates',
+            choices=sorted(TEMPLATE_ROUTES), metavar='NAME',
+            help='Замерить только этот шаблон (можно повторять).',
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0, metavar='POSTS',
+            help='Предварительно выполнить seed с таким числом постов.',
+        )
+        parser.add_argument(
+            '--output', metavar='FILE',
+            help='Записать отчёт в файл вместо вывода.',
+        )
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            posts = options['seed']
+            call_command(
+                'seed', users=max(posts // 100, 2),
+                groups=max(posts // 1000, 1), posts=posts,
+                comments=posts, follows=posts // 10,
+                stdout=self.stdout,
+            )
+        report = run_templates(
+            repeat=options['repeat'], only=options['templates']
+        )
+        data = json.dumps(report, ensure_ascii=False, indent=2)
+        if not options['output']:
+            self.stdout.write(data)
+            return
+        with open(options['output'], 'w') as output:
+            output.write(data)
+        for name, values in report['templates'].items():
+            cached, plain = values['cached_loader'], values['plain_loader']
+            self.stdout.write(
+                f"{name}: p50 {cached['p50_ms']:.2f} мс, "
+                f"без кеширующего загрузчика {plain['p50_ms']:.2f} мс"
+            )
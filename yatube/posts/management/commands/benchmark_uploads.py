@@ -0,0 +1,40 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from posts.benchmark import UPLOAD_SAMPLES, run_uploads
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время и пик памяти загрузки картинки поста: '
+        'в запросе post_create и в фоновой обработке.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sample', action='append', dest='samples',
+            choices=sorted(UPLOAD_SAMPLES), metavar='NAME',
+            help='Замерить только эту картинку (можно повторять).',
+        )
+        parser.add_argument(
+            '--output', metavar='FILE',
+            help='Записать отчёт в файл вместо вывода.',
+        )
+
+    def handle(self, *args, **options):
+        report = run_uploads(only=options['samples'])
+        data = json.dumps(report, ensure_ascii=False, indent=2)
+        if not options['output']:
+            self.stdout.write(data)
+            return
+        with open(options['output'], 'w') as output:
+            output.write(data)
+        for name, values in report['uploads'].items():
+            request = values['request']
+            self.stdout.write(
+                f"{name}: {values['status']}, "
+                f"{request['ms']:.0f} мс, "
+                f"пик Python {request['python_peak_kib']:.0f} КиБ, "
+                f"пик процесса {request['rss_peak_kib']} КиБ"
+            )
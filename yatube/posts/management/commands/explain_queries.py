@@ -0,0 +1,126 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from posts.feed import FEED_ORDERING, feed_posts
+from posts.models import Comment, Follow, Group, Post
+from posts.seeding import seed
+
+POST_ON_PAGE = 10
+
+# Индексы, которые добавила миграция 0012, и одиночные индексы
+# внешних ключей, которые были до неё.
+QUERY_INDEXES = (
+    'post_pub_date_idx',
+    'post_author_pub_date_idx',
+    'post_group_pub_date_idx',
+    'comment_post_created_idx',
+)
+LEGACY_INDEXES = (
+    ('bench_post_author_id', 'posts_post', 'author_id'),
+    ('bench_post_group_id', 'posts_post', 'group_id'),
+    ('bench_comment_post_id', 'posts_comment', 'post_id'),
+)
+
+
+class Rollback(Exception):
+    pass
+
+
+def view_queries():
+    """Запросы первых страниц представлений posts, как в views.py."""
+    posts = Post.objects.select_related('author', 'group')
+    group = Group.objects.order_by('pk').first()
+    author_id = Post.objects.values_list('author_id', flat=True).first()
+    follow = Follow.objects.select_related('user').order_by('pk').first()
+    post_id = Comment.objects.values_list('post_id', flat=True).first()
+    queries = {'index': posts.all()}
+    if group is not None:
+        queries['group_posts'] = posts.filter(group=group)
+    if author_id is not None:
+        queries['profile'] = posts.filter(author_id=author_id)
+    if follow is not None:
+        queries['follow_index'] = feed_posts(follow.user).select_related(
+            'author', 'group'
+        ).order_by(*FEED_ORDERING)
+    if post_id is not None:
+        queries['post_detail: comments'] = Comment.objects.filter(
+            post_id=post_id
+        ).select_related('author')
+    pages = {name: query[:POST_ON_PAGE] for name, query in queries.items()}
+    pages['index (стр. 100)'] = posts.all()[
+        POST_ON_PAGE * 99:POST_ON_PAGE * 100
+    ]
+    return pages
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает план (EXPLAIN) и время запросов представлений posts; '
+        'с --compare — также для схемы без составных индексов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed', type=int, default=0, metavar='POSTS',
+            help='Предварительно создать столько постов (и связанных данных).',
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Число повторов каждого запроса.',
+        )
+        parser.add_argument(
+            '--compare', action='store_true',
+            help='Сравнить со схемой до миграции 0012 (в откатываемой '
+                 'транзакции).',
+        )
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            posts = options['seed']
+            created = seed(
+                users=max(posts // 100, 2), groups=max(posts // 1000, 1),
+                posts=posts, comments=posts, follows=posts // 10,
+            )
+            self.stdout.write(f'Создано: {created}')
+        queries = view_queries()
+        if options['compare']:
+            self.stdout.write(self.style.MIGRATE_HEADING('До индексов'))
+            try:
+                with transaction.atomic():
+                    self.use_legacy_indexes()
+                    self.report(queries, options['repeat'])
+                    raise Rollback
+            except Rollback:
+                pass
+            self.stdout.write(self.style.MIGRATE_HEADING('После индексов'))
+        self.report(queries, options['repeat'])
+
+    def use_legacy_indexes(self):
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            for name in QUERY_INDEXES:
+                cursor.execute(f'DROP INDEX {quote(name)}')
+            for name, table, column in LEGACY_INDEXES:
+                cursor.execute(
+                    f'CREATE INDEX {quote(name)} '
+                    f'ON {quote(table)} ({quote(column)})'
+                )
+            if connection.vendor == 'sqlite':
+                cursor.execute('ANALYZE')
+
+    def report(self, queries, repeat):
+        for name, query in queries.items():
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                list(query.all())
+                timings.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(self.style.SUCCESS(
+                f'{name}: медиана {statistics.median(timings):.2f} мс, '
+                f'максимум {max(timings):.2f} мс'
+            ))
+            for line in query.explain().splitlines():
+                self.stdout.write(f'    {line}')
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.exporting import CHUNK_SIZE, FORMATS, MODELS, chunks, lines
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает группы, посты, комментарии и подписки в JSONL или CSV '
+        'без загрузки всех объектов в память.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model', action='append', dest='models', choices=MODELS,
+            help='Таблица для выгрузки (можно повторять); по умолчанию все.',
+        )
+        parser.add_argument(
+            '--format', choices=FORMATS, default='jsonl',
+            help='Формат выгрузки; CSV — только для одной таблицы.',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=CHUNK_SIZE,
+            help='Строк за одно чтение из базы.',
+        )
+        parser.add_argument(
+            '--output', metavar='FILE',
+            help='Файл для выгрузки; по умолчанию стандартный вывод.',
+        )
+
+    def handle(self, *args, **options):
+        kinds = options['models'] or list(MODELS)
+        if options['format'] == 'csv' and len(kinds) != 1:
+            raise CommandError('Для CSV укажите одну таблицу в --model.')
+        text = chunks(lines(kinds, options['format'], options['chunk_size']))
+        if not options['output']:
+            for chunk in text:
+                self.stdout.write(chunk, ending='')
+            return
+        with open(options['output'], 'w', newline='',
+                  encoding='utf-8') as output:
+            for chunk in text:
+                output.write(chunk)
@@ -0,0 +1,37 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+
+from posts.media import MIN_AGE, collect
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет картинки постов и их варианты, на которые больше '
+        'не ссылается ни один пост, вместе с миниатюрами.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age', type=float, metavar='HOURS',
+            default=MIN_AGE.total_seconds() / 3600,
+            help='Не трогать файлы, изменённые позже (часов назад).',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, что было бы удалено.',
+        )
+
+    def handle(self, *args, **options):
+        names, size = collect(
+            min_age=timedelta(hours=options['min_age']),
+            dry_run=options['dry_run'],
+        )
+        if options['verbosity'] > 1 or options['dry_run']:
+            for name in names:
+                self.stdout.write(name)
+        verb = 'К удалению' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} файлов: {len(names)}, {filesizeformat(size)}'
+        ))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from posts.images import build_variants, missing
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Строит адаптивные варианты картинок постов, загруженных '
+        'до их появления.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересоздать варианты всех картинок, не только недостающие.',
+        )
+        parser.add_argument(
+            '--limit', type=int, default=None,
+            help='Обработать не больше стольких постов.',
+        )
+
+    def handle(self, *args, **options):
+        if options['all']:
+            posts = Post.objects.exclude(image='')
+        else:
+            posts = missing()
+        posts = posts.order_by('pk')[:options['limit']]
+        done = failed = 0
+        for post in posts.iterator():
+            try:
+                build_variants(post)
+            except (OSError, ValueError) as error:
+                failed += 1
+                self.stderr.write(f'Пост {post.pk}: {error}')
+                continue
+            done += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано картинок: {done}, с ошибками: {failed}'
+        ))
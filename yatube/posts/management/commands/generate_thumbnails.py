@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.thumbnails import process
+
+
+class Command(BaseCommand):
+    help = 'Строит миниатюры картинок из очереди ThumbnailTask.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int, default=None,
+            help='Обработать не больше стольких картинок.',
+        )
+        parser.add_argument(
+            '--watch', type=float, default=0, metavar='SECONDS',
+            help='Не завершаться: проверять очередь с этим интервалом.',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            done = process(limit=options['limit'])
+            if done or not options['watch']:
+                self.stdout.write(
+                    self.style.SUCCESS(f'Обработано картинок: {done}')
+                )
+            if not options['watch']:
+                return
+            time.sleep(options['watch'])
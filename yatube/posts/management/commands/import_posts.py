@@ -0,0 +1,77 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.importing import (
+    BATCH_SIZE, FORMATS, PostImporter, detect_format, read_rows,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует посты из JSONL или CSV (поля text, author, group, '
+        'image, pub_date) пачками bulk_create.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='Файл с постами или «-» для стандартного ввода.',
+        )
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='Формат файла; по умолчанию — по расширению.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Постов в одной пачке и транзакции.',
+        )
+        parser.add_argument(
+            '--no-create', action='store_true',
+            help='Пропускать записи с неизвестными авторами и группами.',
+        )
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help=(
+                'После импорта пересобрать счётчики, оценки, ленты и '
+                'поисковый индекс по всей базе.'
+            ),
+        )
+        parser.add_argument(
+            '--progress', type=int, default=100, metavar='BATCHES',
+            help='Печатать скорость каждые столько пачек (0 — не печатать).',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or detect_format(path)
+        importer = PostImporter(
+            batch_size=options['batch_size'],
+            create_missing=not options['no_create'],
+        )
+        batches = 0
+
+        def progress(importer):
+            nonlocal batches
+            batches += 1
+            if options['progress'] and batches % options['progress'] == 0:
+                self.stdout.write(
+                    f'{importer.imported} постов, '
+                    f'{importer.rate:.0f} в секунду'
+                )
+
+        try:
+            if path == '-':
+                importer.run(read_rows(sys.stdin, fmt), progress)
+            else:
+                with open(path, newline='', encoding='utf-8') as stream:
+                    importer.run(read_rows(stream, fmt), progress)
+        except OSError as error:
+            raise CommandError(error)
+        importer.finish(rebuild=options['rebuild'])
+        for error in importer.errors:
+            self.stderr.write(error)
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано: {importer.imported}, '
+            f'пропущено: {importer.skipped}, '
+            f'{importer.elapsed:.1f} с ({importer.rate:.0f} в секунду)'
+        ))
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.ranking import BATCH_SIZE, update_ranks
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает оценки постов для лент «Горячее» и «В тренде»: '
+        'изменившиеся посты и посты с недавней активностью.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Пересчитать оценки всех постов.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Постов в одной транзакции.',
+        )
+        parser.add_argument(
+            '--watch', type=float, default=0, metavar='SECONDS',
+            help='Не завершаться: пересчитывать с этим интервалом.',
+        )
+
+    def handle(self, *args, **options):
+        full = options['full']
+        while True:
+            total = update_ranks(
+                full=full, batch_size=options['batch_size']
+            )
+            self.stdout.write(
+                self.style.SUCCESS(f'Пересчитано оценок: {total}')
+            )
+            if not options['watch']:
+                return
+            full = False
+            time.sleep(options['watch'])
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts.feed import rebuild_feeds
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает материализованные ленты подписок.'
+
+    def handle(self, *args, **options):
+        rebuild_feeds()
+        self.stdout.write(self.style.SUCCESS('Ленты подписок пересобраны'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from posts.activity import BATCH_SIZE, refresh_post_activity
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает число комментариев и время последней активности '
+        'постов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Постов в одной транзакции.',
+        )
+
+    def handle(self, *args, **options):
+        total = refresh_post_activity(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано постов: {total}'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import refresh_post_counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов и подписчиков.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Размер пачки при записи счётчиков.',
+        )
+
+    def handle(self, *args, **options):
+        total = refresh_post_counters(batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Пересчитано счётчиков: {total}')
+        )
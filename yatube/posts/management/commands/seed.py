@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from faker import Faker
+
+from posts.seeding import BATCH_SIZE, seed
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет базу пользователями, группами, постами, комментариями '
+        'и подписками заданного объёма.'
+    )
+
+    def add_arguments(self, parser):
+        for name, default in (
+            ('users', 100), ('groups', 10), ('posts', 1000),
+            ('comments', 1000), ('follows', 1000),
+        ):
+            parser.add_argument(
+                f'--{name}', type=int, default=default,
+                help=f'Сколько создать (по умолчанию {default}).',
+            )
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Размер пачки bulk_create.',
+        )
+        parser.add_argument(
+            '--random-seed', type=int, default=None,
+            help='Зерно генератора для воспроизводимых данных.',
+        )
+        parser.add_argument(
+            '--faker', action='store_true',
+            help='Тексты от Faker (медленнее, но правдоподобнее).',
+        )
+
+    def handle(self, *args, **options):
+        text = None
+        if options['faker']:
+            fake = Faker('ru_RU')
+            fake.seed_instance(options['random_seed'])
+
+            def text(rng):
+                return fake.paragraph(nb_sentences=rng.randint(1, 5))
+
+        created = seed(
+            users=options['users'], groups=options['groups'],
+            posts=options['posts'], comments=options['comments'],
+            follows=options['follows'], text=text,
+            batch_size=options['batch_size'],
+            random_seed=options['random_seed'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Создано: {created}'))
@@ -0,0 +1,68 @@
+"""Удаление медиафайлов постов, на которые не осталось ссылок.
+
+Хранилище по хешу (``core.storage``) делит один файл между постами,
+поэтому ни удаление поста, ни замена картинки в ``post_edit``, ни
+уменьшение исходника (``shrink_original``) файл не трогают. Команда
+``gc_media`` обходит каталог картинок постов и удаляет файлы, на
+которые не ссылаются ни ``Post.image``, ни ``PostImageVariant.file``,
+вместе с их миниатюрами sorl. Недавно
+изменённые файлы пропускаются: ссылка на только что сохранённый файл
+может быть ещё не зафиксирована в базе.
+"""
+import posixpath
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from sorl.thumbnail import delete as delete_thumbnails
+from sorl.thumbnail.images import ImageFile
+
+from .models import Post, PostImageVariant
+
+MEDIA_DIR = Post.image.field.upload_to.rstrip('/')
+MIN_AGE = timedelta(hours=24)
+
+
+def walk(directory):
+    """Имена всех файлов каталога хранилища и его подкаталогов."""
+    if not default_storage.exists(directory):
+        return
+    directories, files = default_storage.listdir(directory)
+    for name in files:
+        yield posixpath.join(directory, name)
+    for name in directories:
+        yield from walk(posixpath.join(directory, name))
+
+
+def referenced():
+    names = set(
+        Post.objects.exclude(image='').values_list('image', flat=True)
+    )
+    names.update(PostImageVariant.objects.values_list('file', flat=True))
+    return names
+
+
+def orphans(min_age=MIN_AGE, now=None):
+    """Файлы без ссылок, не менявшиеся дольше ``min_age``."""
+    cutoff = (now or timezone.now()) - min_age
+    used = referenced()
+    for name in walk(MEDIA_DIR):
+        if (
+            name not in used
+            and default_storage.get_modified_time(name) <= cutoff
+        ):
+            yield name
+
+
+def collect(min_age=MIN_AGE, dry_run=False):
+    """Удалить файлы без ссылок; вернуть их имена и общий размер."""
+    names, size = [], 0
+    for name in orphans(min_age):
+        size += default_storage.size(name)
+        if not dry_run:
+            delete_thumbnails(
+                ImageFile(name, default_storage), delete_file=False
+            )
+            default_storage.delete(name)
+        names.append(name)
+    return names, size
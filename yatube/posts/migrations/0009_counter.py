@@ -0,0 +1,43 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:55
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_post_counters(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Counter = apps.get_model('posts', 'Counter')
+    counters = [Counter(key='posts:all', value=Post.objects.count())]
+    for field in ('author', 'group'):
+        rows = (
+            Post.objects.filter(**{f'{field}__isnull': False})
+            .order_by().values(field).annotate(total=Count('id'))
+        )
+        counters.extend(
+            Counter(key=f'posts:{field}:{row[field]}', value=row['total'])
+            for row in rows.iterator()
+        )
+    Counter.objects.bulk_create(counters, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_auto_20221128_1745'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Counter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True, verbose_name='Ключ')),
+                ('value', models.IntegerField(default=0, verbose_name='Значение')),
+            ],
+            options={
+                'verbose_name': 'счётчик',
+                'verbose_name_plural': 'счётчики',
+            },
+        ),
+        migrations.RunPython(fill_post_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:08
+
+from django.db import migrations, models
+
+
+def enqueue_images(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    ThumbnailTask = apps.get_model('posts', 'ThumbnailTask')
+    images = Post.objects.exclude(image='').values_list('image', flat=True)
+    ThumbnailTask.objects.bulk_create(
+        (ThumbnailTask(image=image) for image in images.iterator()),
+        batch_size=500, ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_post_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThumbnailTask',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image', models.CharField(max_length=100, unique=True, verbose_name='Картинка')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата постановки')),
+            ],
+            options={
+                'verbose_name': 'задача миниатюры',
+                'verbose_name_plural': 'задачи миниатюр',
+            },
+        ),
+        migrations.RunPython(enqueue_images, migrations.RunPython.noop),
+    ]
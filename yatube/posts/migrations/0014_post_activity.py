@@ -0,0 +1,49 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:19
+
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+import django.utils.timezone
+
+
+def fill_activity(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    comments = Comment.objects.filter(post=OuterRef('pk')).order_by().values(
+        'post'
+    )
+    Post.objects.update(
+        comment_count=Coalesce(
+            Subquery(comments.annotate(total=Count('id')).values('total')),
+            Value(0),
+        ),
+        last_activity=Greatest('pub_date', Coalesce(
+            Subquery(comments.annotate(latest=Max('created')).values('latest')),
+            'pub_date',
+        )),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_thumbnailtask'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Комментариев'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='last_activity',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Последняя активность'),
+        ),
+        migrations.RunPython(fill_activity, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-last_activity', '-id'], name='post_last_activity_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def create_ranks(apps, schema_editor):
+    """Оценки существующих постов посчитает команда rank_posts."""
+    Post = apps.get_model('posts', 'Post')
+    PostRank = apps.get_model('posts', 'PostRank')
+    posts = Post.objects.values_list('pk', flat=True)
+    PostRank.objects.bulk_create(
+        (PostRank(post_id=pk) for pk in posts.iterator()),
+        batch_size=500, ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_post_activity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostRank',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rank', serialize=False, to='posts.Post')),
+                ('hot', models.FloatField(default=0, verbose_name='Горячее')),
+                ('trending', models.FloatField(default=0, verbose_name='В тренде')),
+                ('computed', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата расчёта')),
+                ('dirty', models.BooleanField(default=True, verbose_name='Требует пересчёта')),
+            ],
+            options={
+                'verbose_name': 'оценка поста',
+                'verbose_name_plural': 'оценки постов',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='postrank',
+            index=models.Index(fields=['-hot', '-post'], name='post_rank_hot_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='postrank',
+            index=models.Index(fields=['-trending', '-post'], name='post_rank_trending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='postrank',
+            index=models.Index(fields=['dirty'], name='post_rank_dirty_idx'),
+        ),
+        migrations.RunPython(create_ranks, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 User = get_user_model()
 
@@ -33,7 +34,8 @@ class Post(models.Model):
         User,
         on_delete=models.CASCADE,
         related_name='posts',
-        verbose_name='Автор'
+        verbose_name='Автор',
+        db_index=False
     )
     group = models.ForeignKey(
         Group,
@@ -42,31 +44,71 @@ class Post(models.Model):
         on_delete=models.SET_NULL,
         related_name='posts',
         verbose_name='Группа',
-        help_text='Выберите группу'
+        help_text='Выберите группу',
+        db_index=False
     )
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
         blank=True
     )
+    comment_count = models.PositiveIntegerField(
+        'Комментариев',
+        default=0,
+        editable=False
+    )
+    last_activity = models.DateTimeField(
+        'Последняя активность',
+        default=timezone.now,
+        editable=False
+    )
+
+    # Поля, которые сигналы комментариев меняют атомарным UPDATE.
+    DENORMALIZED_FIELDS = ('comment_count', 'last_activity')
 
     class Meta:
-        """Сортировка по дате."""
+        """Сортировка по дате и индексы под выборки лент."""
         verbose_name = 'запись'
         verbose_name_plural = 'записи'
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='post_pub_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date'], name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date'], name='post_group_pub_date_idx'
+            ),
+            models.Index(
+                fields=['-last_activity', '-id'],
+                name='post_last_activity_idx'
+            ),
+        ]
 
     def __str__(self):
         """Вывод на печать 15 символов поста."""
         return self.text[:CHAR_IN_POST]
 
+    def save(self, *args, **kwargs):
+        """Редактирование не перезаписывает счётчики комментариев."""
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.DENORMALIZED_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
 
 class Comment(models.Model):
     """Модель для работы с комментариями."""
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
-        related_name='comments'
+        related_name='comments',
+        db_index=False
     )
     author = models.ForeignKey(
         User,
@@ -83,8 +125,13 @@ class Comment(models.Model):
     )
 
     class Meta:
-        """Сортировка по дате."""
+        """Сортировка по дате и индекс для комментариев поста."""
         ordering = ('-created',)
+        indexes = [
+            models.Index(
+                fields=['post', '-created'], name='comment_post_created_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text
@@ -92,15 +139,18 @@ class Comment(models.Model):
 
 class Follow(models.Model):
     """Модель для работы с подписками."""
+    # Одиночные индексы внешних ключей заменены составными из Meta.
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
-        related_name="follower"
+        related_name="follower",
+        db_index=False,
     )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
-        related_name="following"
+        related_name="following",
+        db_index=False,
     )
 
     class Meta:
@@ -110,3 +160,144 @@ class Follow(models.Model):
                 fields=['user', 'author'], name='unique_follow'
             )
         ]
+        indexes = [
+            # Списки подписчиков и подписок, новые первыми.
+            models.Index(fields=['author', '-id'], name='follow_author_idx'),
+            models.Index(fields=['user', '-id'], name='follow_user_idx'),
+        ]
+
+
+class PostImageVariant(models.Model):
+    """Уменьшенная копия картинки поста в одном формате и ширине."""
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='image_variants'
+    )
+    format = models.CharField('Формат', max_length=8)
+    width = models.PositiveIntegerField('Ширина')
+    height = models.PositiveIntegerField('Высота')
+    file = models.ImageField('Файл', max_length=200)
+    size = models.PositiveIntegerField('Размер, байт')
+
+    class Meta:
+        """Один файл на формат и ширину."""
+        verbose_name = 'вариант картинки'
+        verbose_name_plural = 'варианты картинок'
+        ordering = ('width',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=['post', 'format', 'width'],
+                name='unique_image_variant'
+            )
+        ]
+
+    def __str__(self):
+        return self.file.name
+
+
+class FeedEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        db_index=False
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        """Одна запись о посте на подписчика, выборка по дате."""
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_feed_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='feed_user_pub_date_idx',
+            ),
+            models.Index(
+                fields=['user', 'author'], name='feed_user_author_idx'
+            ),
+        ]
+
+
+class Counter(models.Model):
+    """Денормализованные счётчики: число постов автора, группы и т.п."""
+    key = models.CharField(
+        'Ключ',
+        max_length=64,
+        unique=True
+    )
+    value = models.IntegerField(
+        'Значение',
+        default=0
+    )
+
+    class Meta:
+        verbose_name = 'счётчик'
+        verbose_name_plural = 'счётчики'
+
+    def __str__(self):
+        return f'{self.key}={self.value}'
+
+
+class ThumbnailTask(models.Model):
+    """Очередь генерации миниатюр: имя исходной картинки в хранилище."""
+    image = models.CharField(
+        'Картинка',
+        max_length=100,
+        unique=True
+    )
+    created = models.DateTimeField(
+        'Дата постановки',
+        auto_now_add=True
+    )
+
+    class Meta:
+        verbose_name = 'задача миниатюры'
+        verbose_name_plural = 'задачи миниатюр'
+
+    def __str__(self):
+        return self.image
+
+
+class PostRank(models.Model):
+    """Предвычисленные оценки поста для лент «Горячее» и «В тренде»."""
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='rank'
+    )
+    hot = models.FloatField('Горячее', default=0)
+    trending = models.FloatField('В тренде', default=0)
+    computed = models.DateTimeField('Дата расчёта', default=timezone.now)
+    dirty = models.BooleanField('Требует пересчёта', default=True)
+
+    class Meta:
+        """Индексы под выборку ленты и под поиск устаревших оценок."""
+        verbose_name = 'оценка поста'
+        verbose_name_plural = 'оценки постов'
+        indexes = [
+            models.Index(fields=['-hot', '-post'], name='post_rank_hot_idx'),
+            models.Index(
+                fields=['-trending', '-post'], name='post_rank_trending_idx'
+            ),
+            models.Index(fields=['dirty'], name='post_rank_dirty_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.post_id}: {self.hot:.3f}/{self.trending:.3f}'
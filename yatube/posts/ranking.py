@@ -0,0 +1,151 @@
+"""Ленты «Горячее» и «В тренде» по предвычисленным оценкам.
+
+Оценки постов лежат в ``PostRank`` и пересчитываются фоновой командой
+``rank_posts``, поэтому страница ленты — один запрос по индексу
+оценки без агрегатов по ``Comment``. Пересчёт инкрементальный: берутся
+посты, помеченные сигналами как изменившиеся (``dirty``), и посты с
+активностью в окне ``TRENDING_WINDOW``, чья оценка «В тренде»
+убывает со временем.
+
+«Горячее» — формула Reddit: логарифм очков плюс время публикации,
+поэтому без новых комментариев и подписчиков оценка не меняется.
+
+Число подписчиков автора берётся из счётчика ``followers:`` в момент
+пересчёта, а подписка посты не помечает: иначе каждый клик переписывал
+бы всю историю автора. Посты в окне пересчитываются при каждом запуске,
+более старые получают новое число при следующем изменении или при
+``rank_posts --full``.
+«В тренде» — формула Hacker News: свежие очки, делённые на возраст
+поста в степени ``GRAVITY``.
+"""
+import math
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from . import caching, counters
+from .models import Comment, Post, PostRank
+
+ORDERINGS = {
+    'hot': ('-rank__hot', '-id'),
+    'trending': ('-rank__trending', '-id'),
+}
+BATCH_SIZE = 500
+EPOCH = datetime(2020, 1, 1, tzinfo=timezone.utc)
+# Каждые 12,5 часа новизны весят как десятикратный рост очков.
+HOT_DECAY_SECONDS = 45000
+TRENDING_WINDOW = timedelta(days=2)
+GRAVITY = 1.8
+# Подписчик автора стоит десятой части комментария.
+FOLLOWER_WEIGHT = 0.1
+
+
+def hot_score(pub_date, comments, followers):
+    points = 1 + comments + FOLLOWER_WEIGHT * followers
+    age = (pub_date - EPOCH).total_seconds()
+    return math.log10(points) + age / HOT_DECAY_SECONDS
+
+
+def trending_score(pub_date, recent_comments, followers, now):
+    hours = max((now - pub_date).total_seconds() / 3600, 0)
+    points = recent_comments + FOLLOWER_WEIGHT * followers
+    return points / (hours + 2) ** GRAVITY
+
+
+def ranked(queryset):
+    """Посты с оценками: INNER JOIN, чтобы сортировка шла по индексу."""
+    return queryset.filter(rank__isnull=False).select_related('rank')
+
+
+def post_created(post):
+    PostRank.objects.create(
+        post=post, hot=hot_score(post.pub_date, 0, 0), computed=post.pub_date
+    )
+
+
+def posts_created(posts):
+    """Оценки для пачки постов, вставленных в обход сигналов."""
+    PostRank.objects.bulk_create(
+        [
+            PostRank(
+                post_id=post.pk, hot=hot_score(post.pub_date, 0, 0),
+                computed=post.pub_date,
+            )
+            for post in posts
+        ],
+        batch_size=BATCH_SIZE, ignore_conflicts=True,
+    )
+
+
+def post_changed(post_id):
+    PostRank.objects.filter(post_id=post_id).update(dirty=True)
+
+
+def create_missing(batch_size=BATCH_SIZE):
+    """Завести оценки постам, вставленным в обход сигналов."""
+    missing = list(
+        Post.objects.filter(rank__isnull=True).values_list('pk', flat=True)
+    )
+    PostRank.objects.bulk_create(
+        [PostRank(post_id=pk) for pk in missing],
+        batch_size=batch_size, ignore_conflicts=True,
+    )
+    return len(missing)
+
+
+def update_ranks(now=None, full=False, batch_size=BATCH_SIZE):
+    """Пересчитать изменившиеся оценки; вернуть число пересчитанных.
+
+    ``full`` пересчитывает все посты — после загрузки данных пачками.
+    """
+    now = now or timezone.now()
+    since = now - TRENDING_WINDOW
+    create_missing(batch_size)
+    # Вне окна оценка «В тренде» больше не нужна.
+    expired = PostRank.objects.filter(trending__gt=0).exclude(
+        post__last_activity__gte=since
+    ).update(trending=0)
+    stale = PostRank.objects.all()
+    if not full:
+        stale = stale.filter(
+            Q(dirty=True) | Q(post__last_activity__gte=since)
+        )
+    ids = list(stale.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(ids), batch_size):
+        _update_batch(ids[start:start + batch_size], now, since)
+    if ids or expired:
+        caching.bump('ranking')
+    return len(ids)
+
+
+def _update_batch(ids, now, since):
+    with transaction.atomic():
+        # Пометка, поставленная во время пересчёта, доживёт до следующего.
+        PostRank.objects.filter(pk__in=ids, dirty=True).update(dirty=False)
+        posts = list(Post.objects.filter(pk__in=ids).values_list(
+            'pk', 'author_id', 'pub_date', 'comment_count', 'last_activity'
+        ))
+        followers = counters.follower_counts(
+            {author_id for _, author_id, *_ in posts}
+        )
+        recent = dict(
+            Comment.objects.filter(post_id__in=ids, created__gte=since)
+            .order_by().values('post').annotate(total=Count('id'))
+            .values_list('post', 'total')
+        )
+        ranks = []
+        for pk, author_id, pub_date, comments, last_activity in posts:
+            trending = 0
+            if last_activity >= since:
+                trending = trending_score(
+                    pub_date, recent.get(pk, 0), followers[author_id], now
+                )
+            ranks.append(PostRank(
+                post_id=pk, computed=now, trending=trending,
+                hot=hot_score(pub_date, comments, followers[author_id]),
+            ))
+        PostRank.objects.bulk_update(
+            ranks, ['hot', 'trending', 'computed'], batch_size=BATCH_SIZE
+        )
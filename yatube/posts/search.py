@@ -0,0 +1,167 @@
+"""Полнотекстовый поиск по постам.
+
+На SQLite используется виртуальная таблица FTS5 ``posts_post_fts``
+(rowid совпадает с id поста), которую синхронизируют сигналы ``Post``.
+На других СУБД поиск сводится к ``icontains`` без подсветки.
+"""
+import re
+
+from django.db import connection
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+
+FTS_TABLE = 'posts_post_fts'
+SNIPPET_TOKENS = 24
+_MARK_START = '\x02'
+_MARK_END = '\x03'
+
+
+def fts_available():
+    return connection.vendor == 'sqlite'
+
+
+def build_match(query):
+    """Запрос FTS5 из слов пользователя: все слова, последнее — префикс."""
+    words = re.findall(r'\w+', query)
+    if not words:
+        return ''
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def index_post(post):
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post.pk])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)',
+            [post.pk, post.text],
+        )
+
+
+def index_new_posts(posts):
+    """Добавить в индекс посты, которых в нём ещё нет."""
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)',
+            [(post.pk, post.text) for post in posts],
+        )
+
+
+def unindex_post(post_id):
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id])
+
+
+def rebuild_search_index():
+    """Перестроить индекс по всем постам."""
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) '
+            f'SELECT id, text FROM {Post._meta.db_table}'
+        )
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')"
+        )
+
+
+def filter_posts(queryset, query):
+    """Оставить в ``queryset`` посты, подходящие под запрос."""
+    match = build_match(query)
+    if not match:
+        return queryset.none()
+    if not fts_available():
+        return queryset.filter(text__icontains=query)
+    # RawSQL в pk__in оборачивается в лишние скобки, и SQLite читает
+    # подзапрос как скалярный: находился бы не больше чем один пост.
+    opts = queryset.model._meta
+    return queryset.extra(
+        where=[
+            f'{opts.db_table}.{opts.pk.column} IN ('
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)'
+        ],
+        params=[match],
+    )
+
+
+def highlight(snippet):
+    """Экранировать фрагмент и выделить найденные слова."""
+    return mark_safe(
+        escape(snippet)
+        .replace(_MARK_START, '<mark>')
+        .replace(_MARK_END, '</mark>')
+    )
+
+
+class SearchResults:
+    """Ленивая выдача поиска для Paginator: посты по релевантности.
+
+    Срез выполняет один запрос к FTS-индексу (rowid и фрагмент текста)
+    и один запрос за постами с авторами и группами.
+    """
+
+    def __init__(self, query):
+        self.query = query
+        self.match = build_match(query)
+
+    def count(self):
+        if not self.match:
+            return 0
+        if not fts_available():
+            return Post.objects.filter(text__icontains=self.query).count()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT COUNT(*) FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s',
+                [self.match],
+            )
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        limit = index.stop - start
+        if not self.match or limit <= 0:
+            return []
+        if not fts_available():
+            return list(
+                Post.objects.select_related('author', 'group')
+                .prefetch_related('image_variants')
+                .filter(text__icontains=self.query)[start:index.stop]
+            )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid, snippet({FTS_TABLE}, 0, %s, %s, %s, %s) '
+                f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'ORDER BY rank LIMIT %s OFFSET %s',
+                [_MARK_START, _MARK_END, '…', SNIPPET_TOKENS,
+                 self.match, limit, start],
+            )
+            rows = cursor.fetchall()
+        posts = (
+            Post.objects.select_related('author', 'group')
+            .prefetch_related('image_variants')
+            .in_bulk([post_id for post_id, _ in rows])
+        )
+        results = []
+        for post_id, snippet in rows:
+            post = posts.get(post_id)
+            if post is not None:
+                post.snippet = highlight(snippet)
+                results.append(post)
+        return results
@@ -0,0 +1,140 @@
+"""Наполнение базы большим объёмом данных для замеров.
+
+Данные вставляются через ``bulk_create`` пачками, поэтому сигналы не
+срабатывают: после вставки счётчики, ленты подписок и поисковый индекс
+пересобираются целиком.
+"""
+import random
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from .activity import refresh_post_activity
+from .counters import refresh_post_counters
+from .feed import rebuild_feeds
+from .models import Comment, Follow, Group, Post
+from .ranking import update_ranks
+from .search import rebuild_search_index
+from .utils import keep_auto_now_add
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+PERIOD = timedelta(days=365)
+
+
+def _batches(objects, size):
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _insert(model, objects, batch_size):
+    """Вставить объекты пачками; вернуть диапазон новых первичных ключей."""
+    last = model.objects.order_by('-pk').values_list('pk', flat=True).first()
+    for batch in _batches(objects, batch_size):
+        with transaction.atomic():
+            model.objects.bulk_create(batch)
+    ids = model.objects.filter(pk__gt=last or 0).order_by('pk')
+    first = ids.values_list('pk', flat=True).first()
+    newest = ids.values_list('pk', flat=True).last()
+    if first is None:
+        return range(0)
+    return range(first, newest + 1)
+
+
+def _moment(rng, now):
+    return now - PERIOD * rng.random()
+
+
+def seed(users=100, groups=10, posts=1000, comments=1000, follows=1000,
+         text=None, batch_size=BATCH_SIZE, random_seed=None):
+    """Создать данные заданного объёма и пересобрать производные таблицы.
+
+    ``text`` — функция ``text(rng)``, возвращающая текст поста или
+    комментария; по умолчанию генерируется набор слов.
+    """
+    rng = random.Random(random_seed)
+    text = text or _words
+    now = timezone.now()
+    prefix = f'seed{rng.randrange(10 ** 8)}'
+    user_ids = _insert(User, (
+        User(username=f'{prefix}_user{i}', password='!')
+        for i in range(users)
+    ), batch_size)
+    group_ids = _insert(Group, (
+        Group(
+            title=f'Группа {i}', slug=f'{prefix}-group-{i}',
+            description=text(rng),
+        )
+        for i in range(groups)
+    ), batch_size)
+    with keep_auto_now_add(Post, 'pub_date'):
+        post_ids = _insert(Post, (
+            Post(
+                text=text(rng),
+                author_id=rng.choice(user_ids),
+                group_id=(
+                    rng.choice(group_ids)
+                    if group_ids and rng.random() < 0.7 else None
+                ),
+                pub_date=_moment(rng, now),
+            )
+            for _ in range(posts)
+        ), batch_size)
+    if post_ids:
+        with keep_auto_now_add(Comment, 'created'):
+            _insert(Comment, (
+                Comment(
+                    text=text(rng),
+                    post_id=rng.choice(post_ids),
+                    author_id=rng.choice(user_ids),
+                    created=_moment(rng, now),
+                )
+                for _ in range(comments)
+            ), batch_size)
+    pairs = set()
+    if len(user_ids) > 1:
+        limit = min(follows, len(user_ids) * (len(user_ids) - 1))
+        while len(pairs) < limit:
+            user_id, author_id = rng.sample(user_ids, 2)
+            pairs.add((user_id, author_id))
+    for batch in _batches(sorted(pairs), batch_size):
+        Follow.objects.bulk_create(
+            (Follow(user_id=u, author_id=a) for u, a in batch),
+            ignore_conflicts=True,
+        )
+    rebuild_derived()
+    return {
+        'users': len(user_ids),
+        'groups': len(group_ids),
+        'posts': len(post_ids),
+        'comments': comments if post_ids else 0,
+        'follows': len(pairs),
+    }
+
+
+def rebuild_derived():
+    """Пересобрать данные, которые обычно поддерживают сигналы."""
+    refresh_post_counters()
+    refresh_post_activity()
+    update_ranks(full=True)
+    rebuild_feeds()
+    rebuild_search_index()
+
+
+_VOCABULARY = (
+    'блог пост лента автор группа новость день город книга музыка кино '
+    'путешествие код python django запрос индекс кеш фото море горы'
+).split()
+
+
+def _words(rng, size=20):
+    return ' '.join(rng.choice(_VOCABULARY) for _ in range(size))
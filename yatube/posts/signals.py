@@ -0,0 +1,131 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import (
+    activity, caching, counters, feed, follows, ranking, search,
+    thumbnails,
+)
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_scope(sender, instance, raw=False, **kwargs):
+    """Запомнить автора и группу поста до редактирования."""
+    if raw or instance._state.adding or hasattr(instance, '_counted'):
+        return
+    instance._counted = Post.objects.filter(pk=instance.pk).values_list(
+        'author_id', 'group_id'
+    ).first()
+
+
+@receiver(post_save, sender=Post)
+def track_saved_post(sender, instance, created, raw=False, **kwargs):
+    """Обновить счётчики и ленты после создания или смены группы."""
+    current = (instance.author_id, instance.group_id)
+    if created:
+        counters.change(counters.post_keys(*current), 1)
+        feed.fan_out_post(instance)
+        ranking.post_created(instance)
+    else:
+        previous = getattr(instance, '_counted', None)
+        if previous is not None and previous != current:
+            old_keys = set(counters.post_keys(*previous))
+            new_keys = set(counters.post_keys(*current))
+            counters.change(old_keys - new_keys, -1)
+            counters.change(new_keys - old_keys, 1)
+            caching.bump(*caching.post_scopes(*previous))
+    instance._counted = current
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    counters.change(
+        counters.post_keys(instance.author_id, instance.group_id), -1
+    )
+
+
+@receiver(post_save, sender=Follow)
+def track_follow(sender, instance, created, **kwargs):
+    """Подписка, сохранённая моделью, а не ``follows.follow``."""
+    if created:
+        follows.followed(instance.user_id, [instance.author_id])
+
+
+@receiver(post_delete, sender=Follow)
+def track_unfollow(sender, instance, **kwargs):
+    follows.unfollowed(instance.user_id, [instance.author_id])
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_pages(sender, instance, **kwargs):
+    caching.bump(
+        f'post:{instance.pk}',
+        *caching.post_scopes(instance.author_id, instance.group_id),
+    )
+
+
+@receiver(post_save, sender=Comment)
+def track_saved_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        activity.comment_added(instance)
+        ranking.post_changed(instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def track_deleted_comment(sender, instance, **kwargs):
+    activity.comment_removed(instance)
+    ranking.post_changed(instance.post_id)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_pages(sender, instance, **kwargs):
+    """Число комментариев видно в карточках поста во всех лентах."""
+    scope = Post.objects.filter(pk=instance.post_id).values_list(
+        'author_id', 'group_id'
+    ).first()
+    caching.bump(
+        f'post:{instance.post_id}',
+        *(caching.post_scopes(*scope) if scope else ()),
+    )
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_pages(sender, instance, **kwargs):
+    caching.bump('posts', f'group:{instance.pk}')
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_author_pages(sender, instance, update_fields=None, **kwargs):
+    """Имя автора есть в карточках постов; вход на сайт не в счёт."""
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    # Группы кешируются отдельно от ленты, а имя автора есть и в них.
+    groups = Post.objects.filter(
+        author_id=instance.pk, group__isnull=False
+    ).order_by().values_list('group_id', flat=True).distinct()
+    caching.bump(
+        'posts', f'author:{instance.pk}', *(f'group:{pk}' for pk in groups)
+    )
+
+
+@receiver(post_save, sender=Post)
+def index_saved_post(sender, instance, **kwargs):
+    search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_deleted_post(sender, instance, **kwargs):
+    search.unindex_post(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def enqueue_thumbnail(sender, instance, raw=False, **kwargs):
+    if instance.image and not raw:
+        thumbnails.enqueue(instance.image.name)
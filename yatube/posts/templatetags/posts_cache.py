@@ -0,0 +1,19 @@
+from django import template
+
+from posts import caching, ranking
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def fragment_version(context, name, order=None):
+    """Версия фрагмента ``name`` для текущего пользователя и порядка."""
+    return caching.fragment_version(
+        name, context['user'], ranked=order in ranking.ORDERINGS
+    )
+
+
+@register.simple_tag
+def fragment_ttl():
+    """Время жизни кешируемых фрагментов лент."""
+    return caching.fragment_ttl()
@@ -0,0 +1,103 @@
+from functools import lru_cache
+from urllib.parse import quote
+
+from django import template
+from django.urls import get_script_prefix, reverse
+from django.utils.http import RFC3986_SUBDELIMS
+from django.utils.safestring import mark_safe
+
+from posts import images, thumbnails
+
+register = template.Library()
+
+CARD_TEMPLATE = 'posts/includes/posts_card.html'
+# Сколько номеров страниц показывать по обе стороны от текущей.
+PAGE_WINDOW = 3
+# Значение аргумента, подходящее под int, slug и str, для разметки URL.
+URL_PLACEHOLDER = '9876543210'
+
+
+@register.simple_tag(takes_context=True)
+def page_query(context, **params):
+    """Строка запроса текущей страницы с заменёнными параметрами."""
+    query = context['request'].GET.copy()
+    for name, value in params.items():
+        query[name] = value
+    return query.urlencode()
+
+
+@register.simple_tag
+def page_window(page_obj, size=PAGE_WINDOW):
+    """Номера страниц около текущей, первая и последняя; ``None`` — пропуск.
+
+    Ссылки на все страницы длинной ленты стоили бы сотни вызовов
+    ``page_query`` на каждую отрисовку.
+    """
+    last = page_obj.paginator.num_pages
+    current = page_obj.number
+    numbers = sorted({
+        1, last,
+        *range(max(current - size, 1), min(current + size, last) + 1),
+    })
+    pages, previous = [], 0
+    for number in numbers:
+        if number - previous > 1:
+            pages.append(None)
+        pages.append(number)
+        previous = number
+    return pages
+
+
+@register.simple_tag
+def card_thumbnail(image):
+    """Готовая миниатюра картинки поста или ``None``, если её ещё нет."""
+    return thumbnails.cached_card(image)
+
+
+@register.simple_tag
+def image_sources(post):
+    """Варианты картинки поста для ``<picture>`` или ``None``."""
+    return images.sources(post.image_variants.all())
+
+
+@lru_cache(maxsize=None)
+def _url_parts(name, script_prefix):
+    head, tail = reverse(name, args=[URL_PLACEHOLDER]).split(URL_PLACEHOLDER)
+    return head, tail
+
+
+def fast_url(name):
+    """Функция «аргумент -> URL» для маршрута с одним параметром.
+
+    ``reverse`` выполняется один раз, дальше аргумент подставляется
+    в готовый URL с тем же экранированием, что у ``reverse``.
+    """
+    head, tail = _url_parts(name, get_script_prefix())
+    safe = RFC3986_SUBDELIMS + '/~:@'
+    return lambda value: f'{head}{quote(str(value), safe=safe)}{tail}'
+
+
+@register.simple_tag(takes_context=True)
+def post_card(context, template_name=CARD_TEMPLATE, **extra):
+    """Карточка поста ``post`` из контекста, быстрая замена ``include``.
+
+    Узлы скомпилированного шаблона рендерятся прямо в текущем контексте:
+    без поиска шаблона и нового состояния render_context на каждый пост,
+    поэтому и вложенные ``include`` загружаются один раз за страницу.
+    Ссылки карточки (``card.profile_url``, ``card.detail_url``,
+    ``card.group_url``) собираются без ``{% url %}``.
+    """
+    nodes = context.render_context.get(template_name)
+    if nodes is None:
+        nodes = context.template.engine.get_template(template_name).nodelist
+        context.render_context[template_name] = nodes
+    post = context['post']
+    card = {
+        'profile_url': fast_url('posts:profile')(post.author.username),
+        'detail_url': fast_url('posts:post_detail')(post.pk),
+        'group_url': (
+            post.group_id and fast_url('posts:group_list')(post.group.slug)
+        ),
+    }
+    with context.push(card=card, **extra):
+        return mark_safe(nodes.render(context))
@@ -0,0 +1,265 @@
+import io
+import json
+import tempfile
+from urllib.parse import urlencode
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.test.client import BOUNDARY, encode_multipart
+from django.urls import reverse
+from PIL import Image
+
+from posts.models import Comment, Follow, Group, Post
+from posts.utils import encode_cursor
+
+User = get_user_model()
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.author = User.objects.create_user(username='Author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        for i in range(25):
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {i}'
+            )
+        cls.post = Post.objects.create(author=cls.author, text='Последний')
+        cls.posts_url = reverse('api:posts')
+        cls.post_url = reverse('api:post', kwargs={'post_id': cls.post.pk})
+        cls.comments_url = reverse(
+            'api:comments', kwargs={'post_id': cls.post.pk}
+        )
+        cls.follow_url = reverse(
+            'api:follow', kwargs={'username': cls.author.username}
+        )
+
+    def setUp(self):
+        caches['posts'].clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def send(self, client, method, url, data):
+        return getattr(client, method)(
+            url, json.dumps(data), content_type='application/json'
+        )
+
+    def test_posts_cursor_pages(self):
+        """Список постов листается курсором без запросов на объект."""
+        with self.assertNumQueries(1):
+            response = self.guest_client.get(self.posts_url)
+        data = response.json()
+        self.assertEqual(len(data['results']), 20)
+        self.assertEqual(data['results'][0]['text'], 'Последний')
+        self.assertEqual(data['results'][0]['author'], 'Author')
+        self.assertIsNone(data['previous'])
+        data = self.guest_client.get(data['next']).json()
+        self.assertEqual(len(data['results']), 6)
+        self.assertEqual(data['results'][-1]['text'], 'Пост 0')
+        self.assertEqual(data['results'][-1]['group'], 'test-slug')
+        self.assertIsNone(data['next'])
+
+    def test_invalid_cursor(self):
+        """Битый или подделанный курсор — ошибка 400, а не 500."""
+        for token in (
+            'broken',
+            encode_cursor('n', ['abc', 1]),
+            encode_cursor('n', [{'dt': '2020-01-01T00:00:00'}, 'zz']),
+        ):
+            with self.subTest(token=token):
+                response = self.guest_client.get(
+                    self.posts_url, {'cursor': token}
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('detail', response.json())
+
+    def test_sparse_fields_and_filters(self):
+        """``fields`` оставляет только запрошенные поля."""
+        response = self.guest_client.get(
+            self.posts_url, {'fields': 'id,text', 'group': 'test-slug'}
+        )
+        results = response.json()['results']
+        self.assertEqual(set(results[0]), {'id', 'text'})
+        self.assertNotIn(self.post.pk, [item['id'] for item in results])
+        response = self.guest_client.get(self.posts_url, {'fields': 'nope'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_search_filter(self):
+        """``q`` оставляет все подходящие посты, а не только первый."""
+        data = self.guest_client.get(
+            self.posts_url, {'q': 'пост', 'limit': 100, 'fields': 'text'}
+        ).json()
+        self.assertEqual(len(data['results']), 25)
+        self.assertNotIn({'text': 'Последний'}, data['results'])
+        self.assertIsNone(data['next'])
+
+    def test_etag(self):
+        """Совпавший ETag даёт 304 без запросов; изменение — новый ETag."""
+        response = self.guest_client.get(self.post_url)
+        self.assertEqual(response.json()['text'], 'Последний')
+        with self.assertNumQueries(0):
+            revalidated = self.guest_client.get(
+                self.post_url, HTTP_IF_NONE_MATCH=response['ETag']
+            )
+        self.assertEqual(revalidated.status_code, 304)
+        Comment.objects.create(post=self.post, author=self.user, text='Ок')
+        changed = self.guest_client.get(
+            self.post_url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.json()['comment_count'], 1)
+
+    def test_create_and_edit_post(self):
+        """Пост создаёт пользователь, а редактирует только автор."""
+        data = {'text': 'Новый пост', 'group': 'test-slug'}
+        response = self.send(self.guest_client, 'post', self.posts_url, data)
+        self.assertEqual(response.status_code, 401)
+        response = self.send(
+            self.authorized_client, 'post', self.posts_url, data
+        )
+        self.assertEqual(response.status_code, 201)
+        created = response.json()
+        self.assertEqual(created['author'], 'TestUser')
+        self.assertEqual(created['group'], 'test-slug')
+        post = Post.objects.get(pk=created['id'])
+        self.assertEqual(post.group, self.group)
+        response = self.send(
+            self.authorized_client, 'patch', self.post_url, {'text': 'Чужой'}
+        )
+        self.assertEqual(response.status_code, 403)
+        response = self.send(
+            self.author_client, 'patch', self.post_url, {'text': 'Правка'}
+        )
+        self.assertEqual(response.json()['text'], 'Правка')
+        response = self.send(
+            self.author_client, 'patch', self.post_url, {'text': ''}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('text', response.json()['detail'])
+
+    def test_patch_form_bodies(self):
+        """PATCH принимает multipart и форму; прочие типы — 415."""
+        buffer = io.BytesIO()
+        Image.new('RGB', (8, 8), 'teal').save(buffer, 'PNG')
+        image = SimpleUploadedFile(
+            'small.png', buffer.getvalue(), content_type='image/png'
+        )
+        with tempfile.TemporaryDirectory() as media:
+            with override_settings(MEDIA_ROOT=media):
+                response = self.author_client.patch(
+                    self.post_url,
+                    encode_multipart(
+                        BOUNDARY, {'text': 'Из формы', 'image': image}
+                    ),
+                    content_type=f'multipart/form-data; boundary={BOUNDARY}',
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json()['text'], 'Из формы')
+                self.assertIsNotNone(response.json()['image'])
+        response = self.author_client.patch(
+            self.post_url, urlencode({'text': 'Urlencoded'}),
+            content_type='application/x-www-form-urlencoded',
+        )
+        self.assertEqual(response.json()['text'], 'Urlencoded')
+        response = self.author_client.patch(
+            self.post_url, 'text=Plain', content_type='text/plain'
+        )
+        self.assertEqual(response.status_code, 415)
+        self.assertEqual(
+            Post.objects.get(pk=self.post.pk).text, 'Urlencoded'
+        )
+
+    def test_comments(self):
+        """Комментарии добавляются и выводятся от новых к старым."""
+        for text in ('Первый', 'Второй'):
+            response = self.send(
+                self.authorized_client, 'post', self.comments_url,
+                {'text': text},
+            )
+            self.assertEqual(response.status_code, 201)
+        results = self.guest_client.get(self.comments_url).json()['results']
+        self.assertEqual(
+            [item['text'] for item in results], ['Второй', 'Первый']
+        )
+        self.assertEqual(results[0]['author'], 'TestUser')
+
+    def test_follow_and_feed(self):
+        """Подписка и отписка идемпотентны; лента — посты авторов."""
+        author_url = reverse(
+            'api:author', kwargs={'username': self.author.username}
+        )
+        response = self.authorized_client.post(self.follow_url)
+        self.assertEqual(response.status_code, 201)
+        response = self.authorized_client.post(self.follow_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Follow.objects.filter(user=self.user).count(), 1)
+        data = self.authorized_client.get(author_url).json()
+        self.assertEqual(data['posts_count'], 26)
+        self.assertEqual(data['followers_count'], 1)
+        self.assertTrue(data['following'])
+        feed = self.authorized_client.get(reverse('api:feed')).json()
+        self.assertEqual(feed['results'][0]['id'], self.post.pk)
+        ids = [item['id'] for item in feed['results']]
+        while feed['next']:
+            feed = self.authorized_client.get(feed['next']).json()
+            ids += [item['id'] for item in feed['results']]
+        self.assertEqual(ids, list(
+            Post.objects.order_by('-pub_date', '-id').values_list(
+                'id', flat=True
+            )
+        ))
+        for _ in range(2):
+            response = self.authorized_client.delete(self.follow_url)
+            self.assertEqual(response.status_code, 204)
+        self.assertFalse(Follow.objects.filter(user=self.user).exists())
+        response = self.author_client.post(self.follow_url)
+        self.assertEqual(response.status_code, 400)
+        response = self.guest_client.get(reverse('api:feed'))
+        self.assertEqual(response.status_code, 401)
+
+    def test_groups(self):
+        response = self.guest_client.get(reverse('api:groups'))
+        self.assertEqual(response.json()['results'][0]['slug'], 'test-slug')
+        response = self.guest_client.get(
+            reverse('api:group', kwargs={'slug': 'test-slug'})
+        )
+        self.assertEqual(response.json()['posts_count'], 25)
+        response = self.guest_client.get(
+            reverse('api:group', kwargs={'slug': 'missing'})
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_group_follow_and_lists(self):
+        """Подписка на авторов группы и списки подписок по курсору."""
+        url = reverse('api:group_follow', kwargs={'slug': 'test-slug'})
+        response = self.authorized_client.post(url)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['followed'], 1)
+        response = self.authorized_client.post(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['followed'], 0)
+        response = self.guest_client.get(reverse(
+            'api:followers', kwargs={'username': self.author.username}
+        ))
+        self.assertEqual(
+            [item['username'] for item in response.json()['results']],
+            [self.user.username],
+        )
+        response = self.guest_client.get(reverse(
+            'api:following', kwargs={'username': self.user.username}
+        ))
+        self.assertEqual(
+            [item['username'] for item in response.json()['results']],
+            [self.author.username],
+        )
@@ -0,0 +1,236 @@
+import json
+from collections import Counter
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from posts import benchmark, counters
+from posts.models import (
+    Comment, FeedEntry, Follow, Post, PostRank, ThumbnailTask,
+)
+from posts.search import SearchResults
+
+User = get_user_model()
+
+
+class SeedCommandsTest(TestCase):
+    def test_explain_queries_with_seed(self):
+        """Команда наполняет базу и показывает планы до и после индексов."""
+        out = StringIO()
+        call_command(
+            'explain_queries', seed=200, repeat=1, compare=True, stdout=out
+        )
+        output = out.getvalue()
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 200)
+        self.assertIn('post_pub_date_idx', output)
+        self.assertIn('bench_post_author_id', output)
+        # Индексы после отката транзакции на месте.
+        self.assertIn('post_pub_date_idx', str(
+            Post.objects.all()[:10].explain()
+        ))
+
+    def test_seed_rebuilds_derived_data(self):
+        """После bulk-вставки счётчики и ленты соответствуют данным."""
+        call_command('explain_queries', seed=200, repeat=1, stdout=StringIO())
+        self.assertEqual(counters.post_count(), Post.objects.count())
+        follow = Follow.objects.first()
+        self.assertEqual(
+            FeedEntry.objects.filter(user=follow.user).count(),
+            Post.objects.filter(
+                author__following__user=follow.user
+            ).count(),
+        )
+
+    def test_seed_and_benchmark_report(self):
+        """seed создаёт данные, benchmark пишет отчёт по маршрутам posts."""
+        call_command(
+            'seed', users=5, groups=2, posts=30, comments=30, follows=5,
+            faker=True, random_seed=1, stdout=StringIO(),
+        )
+        self.assertEqual(Post.objects.count(), 30)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'report.json')
+            call_command(
+                'benchmark', requests=2, cold=True, output=path,
+                stdout=StringIO(),
+            )
+            with open(path) as report_file:
+                report = json.load(report_file)
+        self.assertEqual(report['meta']['data']['posts'], 30)
+        self.assertIn('profile_follow', report['skipped'])
+        self.assertIn('group_follow', report['skipped'])
+        for name in ('index', 'group_list', 'profile', 'post_detail',
+                     'follow_index', 'post_edit', 'search', 'followers',
+                     'following'):
+            with self.subTest(route=name):
+                route = report['routes'][name]
+                self.assertEqual(route['status'], 200)
+                self.assertGreater(route['queries'], 0)
+                self.assertLessEqual(route['p50_ms'], route['max_ms'])
+
+    def test_benchmark_percentiles(self):
+        """Перцентили интерполируются между замерами."""
+        self.assertEqual(
+            benchmark._percentiles([5, 1, 4, 2, 3]),
+            {'p50': 3, 'p90': 4.6, 'p95': 4.8, 'p99': 4.96},
+        )
+        self.assertEqual(benchmark._percentiles([7])['p99'], 7)
+
+    def test_benchmark_requires_requests(self):
+        with self.assertRaises(CommandError):
+            call_command('benchmark', requests=0, stdout=StringIO())
+
+    def test_benchmark_templates(self):
+        """benchmark_templates замеряет три шаблона двумя загрузчиками."""
+        call_command(
+            'seed', users=5, groups=2, posts=30, comments=30, follows=5,
+            random_seed=1, stdout=StringIO(),
+        )
+        out = StringIO()
+        call_command('benchmark_templates', repeat=2, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['skipped'], [])
+        for name in ('posts/index.html', 'posts/profile.html',
+                     'posts/post_detail.html'):
+            with self.subTest(template=name):
+                values = report['templates'][name]
+                self.assertGreater(values['cached_loader']['p50_ms'], 0)
+                self.assertGreater(values['plain_loader']['p50_ms'], 0)
+
+    def test_benchmark_uploads(self):
+        """benchmark_uploads замеряет загрузку и отказ по размеру."""
+        out = StringIO()
+        with override_settings(POSTS_UPLOAD_MAX_BYTES=1024 * 1024):
+            call_command(
+                'benchmark_uploads', samples=['photo', 'oversized'],
+                stdout=out,
+            )
+        report = json.loads(out.getvalue())
+        photo, oversized = (
+            report['uploads'][name] for name in ('photo', 'oversized')
+        )
+        self.assertTrue(photo['accepted'])
+        self.assertGreater(photo['request']['python_peak_kib'], 0)
+        self.assertIn('worker', photo)
+        self.assertFalse(oversized['accepted'])
+        self.assertFalse(Post.objects.exists())
+
+    def test_import_posts(self):
+        """Импорт JSONL и CSV создаёт посты, авторов и группы."""
+        with tempfile.TemporaryDirectory() as directory:
+            jsonl = os.path.join(directory, 'posts.jsonl')
+            with open(jsonl, 'w') as stream:
+                for row in (
+                    {'text': 'Первый', 'author': 'leo', 'group': 'books',
+                     'pub_date': '2020-01-02T03:04:05+00:00'},
+                    {'text': 'Второй', 'author': 'leo',
+                     'image': 'posts/old.jpg'},
+                    {'text': '', 'author': 'leo'},
+                    {'text': 123, 'author': 'leo'},
+                    {'text': 'Автор-число', 'author': 5},
+                    {'text': 'Группа-список', 'author': 'leo',
+                     'group': ['books']},
+                ):
+                    stream.write(json.dumps(row, ensure_ascii=False) + '\n')
+                stream.write('{не json\n')
+            csv_path = os.path.join(directory, 'posts.csv')
+            with open(csv_path, 'w') as stream:
+                stream.write('text,author,group\nТретий,anna,books\n')
+            err = StringIO()
+            call_command(
+                'import_posts', jsonl, batch_size=2, stdout=StringIO(),
+                stderr=err,
+            )
+            call_command('import_posts', csv_path, stdout=StringIO())
+        for number in range(3, 8):
+            self.assertIn(f'строка {number}', err.getvalue())
+        first = Post.objects.get(text='Первый')
+        self.assertEqual(first.group.slug, 'books')
+        self.assertEqual(first.pub_date.year, 2020)
+        self.assertEqual(
+            Post.objects.get(text='Третий').group_id, first.group_id
+        )
+        self.assertEqual(counters.post_count(author=first.author), 2)
+        self.assertEqual(counters.post_count(group=first.group), 2)
+        self.assertTrue(
+            ThumbnailTask.objects.filter(image='posts/old.jpg').exists()
+        )
+        self.assertEqual(len(SearchResults('Третий')), 1)
+
+    def test_import_updates_only_imported(self):
+        """Импорт обновляет производные данные только своих постов."""
+        call_command(
+            'seed', users=3, groups=1, posts=5, comments=0, follows=0,
+            random_seed=1, stdout=StringIO(),
+        )
+        reader, leo = (
+            User.objects.create_user(username=name)
+            for name in ('reader', 'leo')
+        )
+        Follow.objects.create(user=reader, author=leo)
+        other = counters.author_key(
+            Post.objects.values_list('author_id', flat=True).first()
+        )
+        # Неверное значение счётчика исправит только полная пересборка.
+        counters.change([other], 90)
+        inflated = counters.get_counts([other])[other]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'posts.jsonl')
+            with open(path, 'w') as stream:
+                for text in ('Импорт один', 'Импорт два'):
+                    stream.write(json.dumps(
+                        {'text': text, 'author': 'leo', 'group': 'books'},
+                        ensure_ascii=False,
+                    ) + '\n')
+            call_command('import_posts', path, stdout=StringIO())
+            imported = Post.objects.filter(author=leo)
+            self.assertEqual(counters.post_count(author=leo), 2)
+            self.assertEqual(counters.post_count(), 7)
+            self.assertEqual(
+                counters.post_count(group=imported[0].group), 2
+            )
+            self.assertEqual(
+                FeedEntry.objects.filter(user=reader).count(), 2
+            )
+            self.assertEqual(
+                PostRank.objects.filter(post__in=imported).count(), 2
+            )
+            self.assertEqual(len(SearchResults('Импорт')), 2)
+            self.assertEqual(counters.get_counts([other])[other], inflated)
+            call_command(
+                'import_posts', path, rebuild=True, stdout=StringIO()
+            )
+        self.assertEqual(counters.post_count(author=leo), 4)
+        self.assertEqual(counters.get_counts([other])[other], inflated - 90)
+
+    def test_export_content(self):
+        """Выгрузка JSONL содержит все таблицы, CSV — заголовок и строки."""
+        call_command(
+            'seed', users=3, groups=1, posts=5, comments=4, follows=2,
+            stdout=StringIO(),
+        )
+        out = StringIO()
+        call_command('export_content', chunk_size=2, stdout=out)
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(
+            Counter(record['model'] for record in records),
+            {'groups': 1, 'posts': 5, 'comments': 4, 'follows': 2},
+        )
+        post = Post.objects.order_by('pk').first()
+        self.assertIn({
+            'model': 'posts', 'id': post.pk, 'author': post.author.username,
+            'group': post.group.slug if post.group else None,
+            'pub_date': post.pub_date.isoformat(),
+            'image': '', 'text': post.text,
+        }, records)
+        out = StringIO()
+        call_command('export_content', model=['follows'], format='csv',
+                     stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0], 'id,user,author')
+        self.assertEqual(len(lines), 3)
@@ -1,11 +1,18 @@
+import io
 import shutil
 import tempfile
 from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management import call_command
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.auth import get_user_model
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
-from posts.models import Group, Post, Comment
+from PIL import Image
+from posts import caching, thumbnails
+from posts.images import CARD_HEIGHT, CARD_WIDTH
+from posts.uploads import shrink_original
+from posts.models import Group, Post, PostImageVariant, Comment
 
 User = get_user_model()
 
@@ -155,3 +162,218 @@ class PostFormTests(TestCase):
             response, ('/auth/login/?next=/posts/1/comment/')
         )
         self.assertEqual(Comment.objects.count(), comments_count)
+
+
+def png(width, height, color='teal'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), color).save(buffer, 'PNG')
+    return SimpleUploadedFile(
+        name='picture.png', content=buffer.getvalue(),
+        content_type='image/png'
+    )
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT, POSTS_IMAGE_WIDTHS=(480, 960, 1440)
+)
+class PostImageVariantsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_variants_built_on_upload(self):
+        """Очередь кодирует картинку в ширинах не больше исходной."""
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'С картинкой', 'image': png(1000, 800)},
+        )
+        post = Post.objects.get(author=self.user)
+        # Запрос загрузки картинку не декодирует.
+        self.assertFalse(post.image_variants.exists())
+        thumbnails.process()
+        variants = list(post.image_variants.filter(format='jpeg'))
+        self.assertEqual([v.width for v in variants], [480, 960])
+        self.assertEqual(
+            [v.height for v in variants],
+            [round(width * CARD_HEIGHT / CARD_WIDTH) for width in (480, 960)],
+        )
+        for variant in variants:
+            self.assertTrue(default_storage.exists(variant.file.name))
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        )
+        self.assertContains(response, '<picture>')
+        self.assertContains(response, f'{variants[1].file.url} 960w')
+
+    def test_variants_replaced_on_edit(self):
+        """Новая картинка заменяет варианты, старые файлы убирает gc."""
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'С картинкой', 'image': png(600, 400)},
+        )
+        thumbnails.process()
+        post = Post.objects.get(author=self.user)
+        old = [v.file.name for v in post.image_variants.all()]
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            data={
+                'text': 'Другая картинка',
+                'image': png(1500, 900, 'navy'),
+            },
+        )
+        self.assertFalse(post.image_variants.exists())
+        thumbnails.process()
+        call_command('gc_media', min_age=0, stdout=io.StringIO())
+        widths = post.image_variants.filter(format='jpeg').values_list(
+            'width', flat=True
+        )
+        self.assertEqual(list(widths), [480, 960, 1440])
+        for name in old:
+            self.assertFalse(default_storage.exists(name))
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            data={'text': 'Только текст'},
+        )
+        self.assertEqual(post.image_variants.count(), 3)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageUploadLimitsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def create(self, image):
+        return self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'С картинкой', 'image': image},
+        )
+
+    @override_settings(POSTS_UPLOAD_MAX_BYTES=100)
+    def test_oversized_file_rejected(self):
+        """Файл больше предела отклоняется без разбора картинки."""
+        response = self.create(png(300, 300))
+        self.assertFormError(
+            response, 'form', 'image', 'Файл больше 100\xa0байт.'
+        )
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(POSTS_IMAGE_MAX_PIXELS=10 ** 4)
+    def test_too_many_pixels_rejected(self):
+        """Число пикселей проверяется по заголовку картинки."""
+        response = self.create(png(200, 100))
+        self.assertEqual(
+            response.context['form'].errors.as_data()['image'][0].code,
+            'too_many_pixels',
+        )
+        self.assertFalse(Post.objects.exists())
+        self.create(png(100, 100))
+        self.assertTrue(Post.objects.exists())
+
+    @override_settings(POSTS_IMAGE_MAX_SIDE=500)
+    def test_large_original_shrunk(self):
+        """Большой исходник уменьшается, посты переходят на копию."""
+        self.create(png(1000, 800))
+        post = Post.objects.get()
+        name = post.image.name
+        scope = f'post:{post.pk}'
+        version = caching.get_versions([scope])[scope]
+        shrunk = shrink_original(name)
+        post.refresh_from_db()
+        self.assertEqual(post.image.name, shrunk)
+        self.assertGreater(caching.get_versions([scope])[scope], version)
+        # Исходник без ссылок удаляет только gc_media.
+        self.assertTrue(default_storage.exists(name))
+        call_command('gc_media', min_age=0, stdout=io.StringIO())
+        self.assertFalse(default_storage.exists(name))
+        with default_storage.open(shrunk) as stored:
+            self.assertEqual(Image.open(stored).size, (500, 400))
+        self.assertEqual(shrink_original(shrunk), shrunk)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class MediaStorageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def create(self, image):
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'С картинкой', 'image': image},
+        )
+        thumbnails.process()
+        return Post.objects.latest('pk')
+
+    def gc(self, **options):
+        call_command('gc_media', min_age=0, stdout=io.StringIO(), **options)
+
+    def test_identical_uploads_share_file(self):
+        """Одинаковые картинки хранятся одним файлом по хешу."""
+        first = self.create(png(600, 400))
+        second = self.create(png(600, 400))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(
+            first.image.name, r'^posts/[0-9a-f]{2}/[0-9a-f]{64}\.png$'
+        )
+        self.assertTrue(second.image_variants.exists())
+        self.assertEqual(
+            set(first.image_variants.values_list('file', flat=True)),
+            set(second.image_variants.values_list('file', flat=True)),
+        )
+
+    def test_gc_removes_unreferenced_files(self):
+        """gc_media удаляет файлы, на которые не ссылается ни один пост."""
+        first = self.create(png(600, 400))
+        second = self.create(png(600, 400))
+        shared = first.image.name
+        variants = list(
+            first.image_variants.values_list('file', flat=True)
+        )
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': first.pk}),
+            data={'text': 'Другая', 'image': png(600, 400, 'navy')},
+        )
+        thumbnails.process()
+        first.refresh_from_db()
+        self.gc()
+        self.assertTrue(default_storage.exists(shared))
+        second.delete()
+        self.gc(dry_run=True)
+        self.assertTrue(default_storage.exists(shared))
+        self.gc()
+        for name in [shared, *variants]:
+            self.assertFalse(default_storage.exists(name))
+        self.assertTrue(default_storage.exists(first.image.name))
+        for variant in PostImageVariant.objects.all():
+            self.assertTrue(default_storage.exists(variant.file.name))
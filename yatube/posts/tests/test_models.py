@@ -1,7 +1,11 @@
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
-from ..models import Group, Post
+from .. import activity, counters, ranking
+from ..models import Comment, Counter, Follow, Group, Post, PostRank
 
 User = get_user_model()
 
@@ -32,3 +36,173 @@ class PostModelTest(TestCase):
         post = PostModelTest.post
         expected_object_name = post.text[:15]
         self.assertEqual(expected_object_name, str(post))
+
+
+class PostCounterTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.group_1 = Group.objects.create(
+            title='Тестовая группа 2',
+            slug='test-slug-2',
+            description='Тестовое описание 2',
+        )
+
+    def assertCounters(self):
+        """Счётчики совпадают с реальным числом постов."""
+        self.assertEqual(counters.post_count(), Post.objects.count())
+        self.assertEqual(
+            counters.post_count(author=self.user),
+            Post.objects.filter(author=self.user).count(),
+        )
+        for group in (self.group, self.group_1):
+            self.assertEqual(
+                counters.post_count(group=group),
+                Post.objects.filter(group=group).count(),
+            )
+
+    def test_counters_follow_create_edit_delete(self):
+        """Счётчики обновляются при создании, смене группы и удалении."""
+        self.assertCounters()
+        post = Post.objects.create(
+            author=self.user, text='Тестовый пост', group=self.group
+        )
+        Post.objects.create(author=self.user, text='Пост без группы')
+        self.assertCounters()
+        post = Post.objects.get(pk=post.pk)
+        post.group = self.group_1
+        post.save()
+        self.assertCounters()
+        post.delete()
+        self.assertCounters()
+
+    def test_refresh_post_counters(self):
+        """Пересчёт исправляет рассинхронизированные счётчики."""
+        Post.objects.create(author=self.user, text='Тестовый пост')
+        Counter.objects.filter(key=counters.ALL_POSTS_KEY).update(value=42)
+        counters.refresh_post_counters()
+        self.assertCounters()
+
+
+class PostActivityTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def test_comments_update_count_and_activity(self):
+        """Комментарий увеличивает счётчик и сдвигает активность."""
+        comment = Comment.objects.create(
+            post=self.post, author=self.user, text='Комментарий'
+        )
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(post.last_activity, comment.created)
+        comment.delete()
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(post.comment_count, 0)
+        self.assertEqual(post.last_activity, post.pub_date)
+
+    def test_activity_stored_in_one_format(self):
+        """Комментарий и пересчёт пишут дату в одном формате."""
+        def stored():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'SELECT last_activity FROM {Post._meta.db_table} '
+                    'WHERE id = %s', [self.post.pk],
+                )
+                return cursor.fetchone()[0]
+
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Комментарий'
+        )
+        from_signal = stored()
+        activity.refresh_post_activity()
+        self.assertEqual(from_signal, stored())
+
+    def test_post_save_keeps_denormalized_fields(self):
+        """Сохранение устаревшего объекта не затирает счётчик."""
+        post = Post.objects.get(pk=self.post.pk)
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Комментарий'
+        )
+        post.text = 'Новый текст'
+        post.save()
+        self.assertEqual(Post.objects.get(pk=post.pk).comment_count, 1)
+
+    def test_refresh_post_activity(self):
+        """Пересчёт исправляет рассинхронизированные поля."""
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Комментарий'
+        )
+        Post.objects.update(comment_count=7, last_activity=self.post.pub_date)
+        activity.refresh_post_activity()
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(
+            post.last_activity, Comment.objects.get().created
+        )
+
+
+class PostRankTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def test_changes_mark_rank_dirty(self):
+        """Новый пост и комментарий требуют пересчёта оценки."""
+        rank = PostRank.objects.get(post=self.post)
+        self.assertTrue(rank.dirty)
+        ranking.update_ranks()
+        self.assertFalse(PostRank.objects.get(post=self.post).dirty)
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        self.assertTrue(PostRank.objects.get(post=self.post).dirty)
+
+    def test_follow_does_not_touch_ranks(self):
+        """Подписка не пишет в оценки; пересчёт окна читает счётчик."""
+        ranking.update_ranks()
+        with CaptureQueriesContext(connection) as queries:
+            Follow.objects.create(user=self.reader, author=self.user)
+        self.assertFalse(any(
+            'posts_postrank' in query['sql'] for query in queries
+        ))
+        self.assertFalse(PostRank.objects.get(post=self.post).dirty)
+        ranking.update_ranks()
+        self.assertAlmostEqual(
+            PostRank.objects.get(post=self.post).hot,
+            ranking.hot_score(self.post.pub_date, 0, 1),
+        )
+
+    def test_update_ranks(self):
+        """Оценки учитывают комментарии и подписчиков и гаснут вне окна."""
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=self.reader, author=self.user)
+        ranking.update_ranks()
+        rank = PostRank.objects.get(post=self.post)
+        self.assertAlmostEqual(
+            rank.hot, ranking.hot_score(self.post.pub_date, 1, 1)
+        )
+        self.assertGreater(rank.trending, 0)
+        later = timezone.now() + ranking.TRENDING_WINDOW * 2
+        self.assertEqual(ranking.update_ranks(now=later), 0)
+        self.assertEqual(PostRank.objects.get(post=self.post).trending, 0)
+
+    def test_missing_ranks_are_created(self):
+        """Посты, вставленные без сигналов, получают оценку."""
+        PostRank.objects.all().delete()
+        self.assertEqual(ranking.update_ranks(), 1)
+        self.assertTrue(PostRank.objects.filter(post=self.post).exists())
@@ -0,0 +1,54 @@
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core import db_router
+from core.middleware import PIN_COOKIE, ReplicaPinMiddleware
+from posts.models import Post
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'], DATABASE_PIN_SECONDS=5)
+class ReplicaRouterTest(SimpleTestCase):
+    def setUp(self):
+        self.router = db_router.ReplicaRouter()
+        self.factory = RequestFactory()
+        self.reads = []
+        db_router.reset()
+
+    def tearDown(self):
+        db_router.reset()
+
+    def view(self, write=False):
+        def get_response(request):
+            self.reads.append(self.router.db_for_read(Post))
+            if write:
+                self.router.db_for_write(Post)
+                self.reads.append(self.router.db_for_read(Post))
+            return HttpResponse()
+        return ReplicaPinMiddleware(get_response)
+
+    def test_reads_go_to_replica_writes_to_primary(self):
+        """Чтение уходит на реплику, запись — в основную базу."""
+        self.assertEqual(self.router.db_for_read(Post), 'replica1')
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        """Без реплик всё идёт в основную базу."""
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_read_your_writes(self):
+        """После записи чтение закреплено за основной базой по cookie."""
+        response = self.view()(self.factory.get('/'))
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+        response = self.view(write=True)(self.factory.get('/'))
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 5)
+        request = self.factory.get('/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        self.view()(request)
+        self.view()(self.factory.post('/'))
+        self.assertEqual(
+            self.reads, ['replica1', 'replica1', 'default', 'default',
+                         'default']
+        )
+        self.assertEqual(self.router.db_for_read(Post), 'replica1')
@@ -0,0 +1,110 @@
+import gzip
+import os
+import shutil
+import tempfile
+
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.utils.http import http_date
+
+from core import serving
+
+STYLES = 'body { color: #333; }\n' * 100
+
+
+class StaticServingTest(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        source = os.path.join(self.root, 'source')
+        os.makedirs(os.path.join(source, 'css'))
+        with open(os.path.join(source, 'css', 'site.css'), 'w') as styles:
+            styles.write(STYLES)
+        settings = override_settings(
+            STATIC_ROOT=os.path.join(self.root, 'collected'),
+            STATICFILES_DIRS=[source],
+            STATICFILES_FINDERS=[
+                'django.contrib.staticfiles.finders.FileSystemFinder',
+            ],
+            STATICFILES_STORAGE=(
+                'core.storage.CompressedManifestStaticFilesStorage'
+            ),
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        self.name = staticfiles_storage.stored_name('css/site.css')
+        self.factory = RequestFactory()
+
+    def get(self, path, **headers):
+        request = self.factory.get(f'/static/{path}', **headers)
+        return serving.static(request, path)
+
+    def test_collectstatic_hashes_and_compresses(self):
+        """collectstatic кладёт рядом с файлом с хешем копию .gz."""
+        self.assertRegex(self.name, r'^css/site\.[0-9a-f]{12}\.css$')
+        self.assertTrue(staticfiles_storage.exists(self.name + '.gz'))
+
+    def test_precompressed_and_immutable(self):
+        """Файл с хешем отдаётся сжатым и кешируется на год."""
+        response = self.get(
+            self.name, HTTP_ACCEPT_ENCODING='br;q=0, gzip, deflate'
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertIn('immutable', response['Cache-Control'])
+        body = gzip.decompress(b''.join(response.streaming_content))
+        self.assertEqual(body.decode(), STYLES)
+        plain = self.get(self.name)
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertEqual(
+            b''.join(plain.streaming_content).decode(), STYLES
+        )
+        unhashed = self.get('css/site.css')
+        self.assertNotIn('immutable', unhashed['Cache-Control'])
+
+    def test_not_modified_and_missing(self):
+        response = self.get(self.name, HTTP_IF_MODIFIED_SINCE=http_date())
+        self.assertEqual(response.status_code, 304)
+        for path in ('css/missing.css', '../source/css/site.css'):
+            with self.subTest(path=path):
+                with self.assertRaises(serving.Http404):
+                    self.get(path)
+
+
+class MediaServingTest(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        digest = 'ab' + '0' * 62
+        self.path = f'posts/ab/{digest}.jpg'
+        os.makedirs(os.path.join(self.root, 'posts', 'ab'))
+        for path in (self.path, 'posts/old.jpg'):
+            with open(os.path.join(self.root, path), 'wb') as image:
+                image.write(b'jpeg')
+        self.factory = RequestFactory()
+
+    def get(self, path, backend):
+        with override_settings(MEDIA_ROOT=self.root, MEDIA_SENDFILE=backend):
+            return serving.media(self.factory.get(f'/media/{path}'), path)
+
+    def test_sendfile_headers(self):
+        """С MEDIA_SENDFILE байты отдаёт фронт-сервер."""
+        response = self.get(self.path, 'x-accel')
+        self.assertEqual(
+            response['X-Accel-Redirect'], f'/protected-media/{self.path}'
+        )
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertIn('immutable', response['Cache-Control'])
+        response = self.get(self.path, 'x-sendfile')
+        self.assertEqual(
+            response['X-Sendfile'], os.path.join(self.root, self.path)
+        )
+
+    def test_file_response_without_sendfile(self):
+        response = self.get('posts/old.jpg', '')
+        self.assertEqual(b''.join(response.streaming_content), b'jpeg')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=3600')
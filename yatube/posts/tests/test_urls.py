@@ -34,12 +34,16 @@ class PostURLTests(TestCase):
         cls.post_edit = reverse(
             'posts:post_edit', kwargs={'post_id': cls.post.id}
         )
+        cls.post_comments = reverse(
+            'posts:post_comments', kwargs={'post_id': cls.post.id}
+        )
         cls.post_create = reverse('posts:post_create')
         cls.public_urls = (
             (cls.index, 'posts/index.html'),
             (cls.group_list, 'posts/group_list.html'),
             (cls.profile, 'posts/profile.html'),
             (cls.post_detail, 'posts/post_detail.html'),
+            (cls.post_comments, 'posts/includes/comment_list.html'),
         )
         cls.privat_urls = (
             (cls.index, 'posts/index.html'),
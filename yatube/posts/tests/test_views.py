@@ -1,19 +1,43 @@
 import shutil
 import tempfile
+import time
+from io import StringIO
+from unittest import mock
 
 from django.conf import settings
+from django.core.cache import caches
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.paginator import Paginator
+from django.db import connection
+from django.template import engines
+from django.template.loaders.cached import Loader as CachedLoader
 from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from posts.models import Group, Post, Follow
+from posts import caching, follows
+from posts.counters import follower_counts
+from posts.models import (
+    Comment, FeedEntry, Follow, Group, Post, ThumbnailTask
+)
+from core import metrics
+from core.cache_backends import cache_stats, reset_cache_stats
+from posts.feed import FEED_ORDERING, feed_posts
 from posts.forms import PostForm
+from posts.ranking import update_ranks
+from posts.search import filter_posts
+from posts.templatetags.posts_extras import fast_url, page_window
+from posts.utils import CursorPage, encode_cursor
+from posts.views import COMMENTS_ON_PAGE, FOLLOWS_ON_PAGE
+from posts.tests.utils import QueryBudgetMixin
 
 User = get_user_model()
 
 POST_ON_PAGE = 10
 POST_ON_ANOTER_PAGE = 3
+QUERY_BUDGET = 10
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -193,15 +217,90 @@ class PostPageViewsTests(TestCase):
         response = self.authorized_client.get(self.post_detail)
         self.assertEqual(response.context['post'].image, self.post.image)
 
+    def test_thumbnails_generated_off_request(self):
+        """Страница показывает оригинал, пока варианты не построит очередь."""
+        caches['default'].clear()
+        self.assertTrue(
+            ThumbnailTask.objects.filter(image=self.post.image.name).exists()
+        )
+        response = self.authorized_client.get(self.post_detail)
+        self.assertContains(response, self.post.image.url)
+        self.assertTrue(ThumbnailTask.objects.exists())
+        call_command('generate_thumbnails', stdout=StringIO())
+        self.assertFalse(ThumbnailTask.objects.exists())
+        response = self.authorized_client.get(self.post_detail)
+        self.assertNotContains(response, self.post.image.url)
+        self.assertContains(response, '<picture>')
+
+    def test_thumbnail_refreshes_cached_pages(self):
+        """Готовые варианты сразу заменяют оригинал в кеше страниц."""
+        caches['default'].clear()
+        guest = Client()
+        response = guest.get(reverse('posts:index'))
+        self.assertContains(response, self.post.image.url)
+        call_command('generate_thumbnails', stdout=StringIO())
+        response = guest.get(reverse('posts:index'))
+        self.assertNotContains(response, self.post.image.url)
+
+    def test_pages_do_not_count_posts(self):
+        """Страницы берут число постов из счётчиков, без COUNT по постам."""
+        for reverse_name in (
+            self.index, self.group_list, self.profile, self.post_detail
+        ):
+            with self.subTest(reverse_name=reverse_name):
+                with CaptureQueriesContext(connection) as queries:
+                    self.authorized_client.get(reverse_name)
+                self.assertFalse([
+                    query['sql'] for query in queries
+                    if 'COUNT(' in query['sql']
+                    and 'FROM "posts_post"' in query['sql']
+                ])
+
     def test_check_cache(self):
         """Проверка кеша."""
         response_1 = self.guest_client.get(self.index)
         res_1 = response_1.content
-        Post.objects.get(id=1).delete()
+        Post.objects.filter(id=self.post.id).update(text='Без сигналов')
         response_2 = self.guest_client.get(self.index)
         res_2 = response_2.content
         self.assertEqual(res_1, res_2)
 
+    def test_fragment_cache_namespace_and_stats(self):
+        """Фрагменты ленты лежат в кеше posts и учитываются в статистике."""
+        caches['posts'].clear()
+        reset_cache_stats()
+        self.guest_client.get(self.index)
+        self.guest_client.get(self.index)
+        stats = next(
+            values for name, values in cache_stats().items()
+            if name.endswith('posts')
+        )
+        self.assertGreaterEqual(stats['hits'], 1)
+        self.assertGreaterEqual(stats['misses'], 1)
+
+    def test_ranking_bump_keeps_chronological_fragments(self):
+        """Пересчёт оценок сбрасывает только ленты по оценкам."""
+        versions = {
+            ranked: caching.fragment_version('index', self.user, ranked)
+            for ranked in (False, True)
+        }
+        caching.bump('ranking')
+        self.assertEqual(
+            caching.fragment_version('index', self.user), versions[False]
+        )
+        self.assertNotEqual(
+            caching.fragment_version('index', self.user, True),
+            versions[True],
+        )
+
+    def test_cache_invalidated_by_signals(self):
+        """Изменение поста сбрасывает кеш ленты."""
+        response_1 = self.guest_client.get(self.index)
+        Post.objects.create(author=self.user, text='Свежий пост')
+        response_2 = self.guest_client.get(self.index)
+        self.assertNotEqual(response_1.content, response_2.content)
+        self.assertContains(response_2, 'Свежий пост')
+
 
 class PaginatorViewsTest(TestCase):
     @classmethod
@@ -259,6 +358,390 @@ class PaginatorViewsTest(TestCase):
                 self.assertEqual(len(response.context['page_obj']), posts)
 
 
+class TemplateFastPathTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='автор.тест')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, group=cls.group, text='Тестовый пост'
+        )
+
+    def setUp(self):
+        caches['posts'].clear()
+        self.guest_client = Client()
+
+    def test_cached_loader(self):
+        """Шаблоны загружаются через кеширующий загрузчик."""
+        loader = engines.all()[0].engine.template_loaders[0]
+        self.assertIsInstance(loader, CachedLoader)
+
+    def test_fast_url_matches_reverse(self):
+        """Ссылки карточек совпадают с результатом reverse."""
+        for name, value in (
+            ('posts:profile', self.user.username),
+            ('posts:post_detail', self.post.pk),
+            ('posts:group_list', self.group.slug),
+        ):
+            with self.subTest(name=name):
+                self.assertEqual(
+                    fast_url(name)(value), reverse(name, args=[value])
+                )
+
+    def test_cards_have_links(self):
+        """Карточки в лентах содержат ссылки на автора, пост и группу."""
+        links = (
+            reverse('posts:profile', args=[self.user.username]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+            reverse('posts:group_list', args=[self.group.slug]),
+        )
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.user.username]),
+        ):
+            response = self.guest_client.get(url)
+            for link in links:
+                if url == link:
+                    continue
+                with self.subTest(url=url, link=link):
+                    self.assertContains(response, link)
+
+    def test_page_window(self):
+        """Номера страниц: окно вокруг текущей, первая и последняя."""
+        paginator = Paginator(range(100), 1)
+        self.assertEqual(
+            page_window(paginator.page(50)),
+            [1, None, 47, 48, 49, 50, 51, 52, 53, None, 100],
+        )
+        self.assertEqual(
+            page_window(paginator.page(2)), [1, 2, 3, 4, 5, None, 100]
+        )
+
+
+@override_settings(POSTS_CURSOR_PAGINATION=True)
+class CursorPaginatorViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Post.objects.bulk_create(
+            Post(
+                author=cls.user,
+                text=f'Тестовый пост - {i} для CursorPaginatorViewsTest',
+                group=cls.group,
+            )
+            for i in range(0, 13)
+        )
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', kwargs={'username': cls.user.username}),
+        )
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_cursor_pages_cover_all_posts(self):
+        """Курсоры «вперёд/назад» обходят ленту без пропусков."""
+        expected = list(
+            Post.objects.order_by('-pub_date', '-id').values_list(
+                'id', flat=True
+            )
+        )
+        for url in self.urls:
+            with self.subTest(url=url):
+                first = self.authorized_client.get(url).context['page_obj']
+                self.assertIsInstance(first, CursorPage)
+                self.assertFalse(first.has_previous())
+                second = self.authorized_client.get(
+                    url, {'cursor': first.next_cursor}
+                ).context['page_obj']
+                self.assertFalse(second.has_next())
+                self.assertEqual(
+                    [post.id for post in first] + [post.id for post in second],
+                    expected,
+                )
+                back = self.authorized_client.get(
+                    url, {'cursor': second.previous_cursor}
+                ).context['page_obj']
+                self.assertEqual(
+                    [post.id for post in back], [post.id for post in first]
+                )
+
+    def test_broken_cursor_shows_first_page(self):
+        """Некорректный курсор открывает первую страницу."""
+        response = self.authorized_client.get(
+            self.urls[0], {'cursor': 'broken'}
+        )
+        self.assertEqual(len(response.context['page_obj']), POST_ON_PAGE)
+
+    def test_forged_cursor_shows_first_page(self):
+        """Значения курсора неверного типа тоже ведут на первую страницу."""
+        forged = (
+            ({}, ['n', 'abc', 1]),
+            ({}, ['n', {'dt': '2020-01-01T00:00:00'}, 'zz']),
+            ({'order': 'hot'}, ['n', 'abc', 1]),
+            ({'order': 'activity'}, ['n', None, 1]),
+        )
+        for params, payload in forged:
+            token = encode_cursor(payload[0], payload[1:])
+            with self.subTest(payload=payload, **params):
+                first = self.authorized_client.get(self.urls[0], params)
+                response = self.authorized_client.get(
+                    self.urls[0], {**params, 'cursor': token}
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    list(response.context['page_obj']),
+                    list(first.context['page_obj']),
+                )
+
+
+class QueryBudgetViewsTest(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.author = User.objects.create_user(username='TestAuthor')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        cls.post = Post.objects.create(
+            author=cls.author, text='Тестовый пост', group=cls.group
+        )
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', kwargs={'username': cls.author}),
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.id}),
+            reverse('posts:follow_index'),
+            reverse('posts:post_create'),
+            reverse('posts:post_edit', kwargs={'post_id': cls.post.id}),
+        )
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def count_queries(self):
+        counts = {}
+        for url in self.urls:
+            caches['posts'].clear()
+            with self.assertMaxQueries(QUERY_BUDGET) as queries:
+                self.authorized_client.get(url)
+            counts[url] = len(queries)
+        return counts
+
+    def test_queries_do_not_depend_on_page_size(self):
+        """Число запросов страниц не зависит от количества записей."""
+        few = self.count_queries()
+        for i in range(POST_ON_PAGE):
+            user = User.objects.create_user(username=f'Commenter{i}')
+            Post.objects.create(
+                author=self.author, text=f'Пост {i}', group=self.group
+            )
+            Comment.objects.create(
+                post=self.post, author=user, text=f'Комментарий {i}'
+            )
+        self.assertEqual(self.count_queries(), few)
+
+
+class CommentsPaginationViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+        for i in range(COMMENTS_ON_PAGE + 5):
+            Comment.objects.create(
+                post=cls.post, author=cls.user, text=f'Комментарий {i}'
+            )
+        cls.post_detail = reverse(
+            'posts:post_detail', kwargs={'post_id': cls.post.id}
+        )
+        cls.post_comments = reverse(
+            'posts:post_comments', kwargs={'post_id': cls.post.id}
+        )
+
+    def setUp(self):
+        caches['posts'].clear()
+        self.guest_client = Client()
+
+    def test_post_detail_shows_first_page(self):
+        """На странице поста только первая страница комментариев."""
+        response = self.guest_client.get(self.post_detail)
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS_ON_PAGE)
+        self.assertEqual(
+            comments[0].text, f'Комментарий {COMMENTS_ON_PAGE + 4}'
+        )
+        self.assertTrue(comments.has_next())
+        self.assertContains(response, comments.next_cursor)
+
+    def test_fragment_loads_next_page(self):
+        """Фрагмент по курсору отдаёт оставшиеся комментарии."""
+        first = self.guest_client.get(self.post_detail).context['comments']
+        response = self.guest_client.get(
+            self.post_comments, {'cursor': first.next_cursor}
+        )
+        comments = response.context['comments']
+        self.assertEqual(
+            [comment.text for comment in comments],
+            [f'Комментарий {i}' for i in reversed(range(5))],
+        )
+        self.assertFalse(comments.has_next())
+        self.assertNotContains(response, '<html')
+
+
+class PostOrderingViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.discussed = Post.objects.create(
+            author=cls.user, group=cls.group, text='Обсуждаемый пост'
+        )
+        cls.fresh = Post.objects.create(
+            author=cls.user, group=cls.group, text='Свежий пост'
+        )
+
+    def setUp(self):
+        caches['posts'].clear()
+        self.guest_client = Client()
+
+    def test_order_by_activity(self):
+        """Новый комментарий поднимает пост в порядке «Обсуждаемые»."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.context['page_obj'][0], self.fresh)
+        Comment.objects.create(
+            post=self.discussed, author=self.user, text='Комментарий'
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url, {'order': 'activity'})
+                self.assertEqual(response.context['order'], 'activity')
+                first = response.context['page_obj'][0]
+                self.assertEqual(first, self.discussed)
+                self.assertEqual(first.comment_count, 1)
+                response = self.guest_client.get(url, {'order': 'unknown'})
+                self.assertEqual(response.context['order'], 'new')
+                self.assertEqual(response.context['page_obj'][0], self.fresh)
+
+    def test_order_by_rank(self):
+        """Ленты «Горячее» и «В тренде» следуют пересчитанным оценкам."""
+        update_ranks()
+        Comment.objects.create(
+            post=self.discussed, author=self.user, text='Комментарий'
+        )
+        index = reverse('posts:index')
+        for order in ('hot', 'trending'):
+            with self.subTest(order=order):
+                response = self.guest_client.get(index, {'order': order})
+                self.assertEqual(response.context['order'], order)
+                self.assertEqual(response.context['page_obj'][0], self.fresh)
+        update_ranks()
+        for order in ('hot', 'trending'):
+            with self.subTest(order=order):
+                response = self.guest_client.get(index, {'order': order})
+                self.assertEqual(
+                    response.context['page_obj'][0], self.discussed
+                )
+        group = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        response = self.guest_client.get(group, {'order': 'hot'})
+        self.assertEqual(response.context['order'], 'new')
+
+
+class SearchViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.post = Post.objects.create(
+            author=cls.user, text='Пишем <b>тесты</b> для поиска'
+        )
+        cls.other = Post.objects.create(
+            author=cls.user, text='Совсем другая запись'
+        )
+        cls.search = reverse('posts:search')
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def test_search_finds_and_highlights(self):
+        """Поиск находит пост и подсвечивает слово без HTML из текста."""
+        response = self.guest_client.get(self.search, {'q': 'тест'})
+        page_obj = response.context['page_obj']
+        self.assertEqual(list(page_obj), [self.post])
+        self.assertIn('<mark>тесты</mark>', page_obj[0].snippet)
+        self.assertNotIn('<b>', page_obj[0].snippet)
+
+    def test_search_follows_edit_and_delete(self):
+        """Индекс обновляется при изменении и удалении поста."""
+        self.other.text = 'Теперь тоже про тесты'
+        self.other.save()
+        response = self.guest_client.get(self.search, {'q': 'тесты'})
+        self.assertEqual(len(response.context['page_obj']), 2)
+        self.other.delete()
+        response = self.guest_client.get(self.search, {'q': 'тесты'})
+        self.assertEqual(list(response.context['page_obj']), [self.post])
+
+    def test_empty_query(self):
+        """Пустой запрос или запрос из спецсимволов ничего не находит."""
+        for query in ('', '"*'):
+            with self.subTest(query=query):
+                response = self.guest_client.get(self.search, {'q': query})
+                self.assertEqual(len(response.context['page_obj']), 0)
+
+    def test_filter_posts_several_matches(self):
+        """filter_posts и поиск в админке находят все подходящие посты."""
+        third = Post.objects.create(author=self.user, text='Ещё тесты')
+        found = filter_posts(Post.objects.order_by('pk'), 'тест')
+        self.assertEqual(list(found), [self.post, third])
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'тест'}
+        )
+        self.assertEqual(response.context['cl'].result_count, 2)
+
+    def test_cursor_param_ignored(self):
+        """Параметр cursor не переключает поиск на курсорный режим."""
+        response = self.guest_client.get(
+            self.search, {'q': 'тест', 'cursor': 'x'}
+        )
+        self.assertEqual(list(response.context['page_obj']), [self.post])
+
+
 class TestFollowViews(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -318,3 +801,386 @@ class TestFollowViews(TestCase):
         response = self.author_client.get(
             reverse('posts:follow_index'))
         self.assertNotIn(self.post, response.context['page_obj'].object_list)
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост автора попадает в ленты подписчиков."""
+        Follow.objects.create(
+            user=self.post_follower,
+            author=self.post_author)
+        post = Post.objects.create(
+            text='Новый пост',
+            author=self.post_author,
+        )
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.post_follower, post=post
+        ).exists())
+        response = self.follower_client.get(
+            reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj'].object_list),
+            [post, self.post],
+        )
+
+    def test_feed_reads_index_in_order(self):
+        """Страница ленты — обход индекса FeedEntry без сортировки."""
+        Follow.objects.create(
+            user=self.post_follower,
+            author=self.post_author)
+        plan = feed_posts(self.post_follower).order_by(
+            *FEED_ORDERING
+        )[:POST_ON_PAGE].explain()
+        self.assertIn('feed_user_pub_date_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_unfollow_clears_feed(self):
+        """После отписки посты автора пропадают из ленты."""
+        Follow.objects.create(
+            user=self.post_follower,
+            author=self.post_author)
+        self.follower_client.post(
+            reverse(
+                'posts:profile_unfollow',
+                kwargs={'username': self.post_author}))
+        self.assertFalse(
+            FeedEntry.objects.filter(user=self.post_follower).exists()
+        )
+
+    def test_follow_is_idempotent(self):
+        """Повторная подписка и отписка ничего не меняют."""
+        url = reverse(
+            'posts:profile_follow', kwargs={'username': self.post_author}
+        )
+        for _ in range(2):
+            self.follower_client.get(url)
+        self.author_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.post_author}
+        ))
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(
+            follower_counts([self.post_author.pk])[self.post_author.pk], 1
+        )
+        for _ in range(2):
+            self.follower_client.get(reverse(
+                'posts:profile_unfollow',
+                kwargs={'username': self.post_author}
+            ))
+        self.assertFalse(Follow.objects.exists())
+        self.assertEqual(
+            follower_counts([self.post_author.pk])[self.post_author.pk], 0
+        )
+
+    def test_follow_single_statement(self):
+        """Подписка на любое число авторов — один INSERT."""
+        authors = [
+            User.objects.create(username=f'bulk_{i}') for i in range(5)
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            created = follows.follow(
+                self.post_follower, [author.pk for author in authors]
+            )
+        self.assertEqual(len(created), 5)
+        inserts = [
+            query for query in queries
+            if query['sql'].startswith('INSERT INTO "posts_follow"')
+        ]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(follows.follow(
+            self.post_follower, [author.pk for author in authors]
+        ), [])
+
+    def test_follow_without_returning(self):
+        """Без RETURNING подписки считаются по выборкам до и после."""
+        authors = [self.post_author.pk, self.post_follower.pk]
+        with mock.patch.object(
+            follows, 'supports_returning', return_value=False
+        ):
+            for expected in ([self.post_author.pk], []):
+                self.assertEqual(
+                    follows.follow(self.post_follower, authors), expected
+                )
+            self.assertEqual(
+                follower_counts([self.post_author.pk])[self.post_author.pk],
+                1,
+            )
+            self.assertTrue(FeedEntry.objects.filter(
+                user=self.post_follower, post=self.post
+            ).exists())
+            for expected in ([self.post_author.pk], []):
+                self.assertEqual(
+                    follows.unfollow(self.post_follower, authors), expected
+                )
+        self.assertFalse(Follow.objects.exists())
+        self.assertFalse(FeedEntry.objects.exists())
+        self.assertEqual(
+            follower_counts([self.post_author.pk])[self.post_author.pk], 0
+        )
+
+    def test_profile_following_flag(self):
+        """Кнопка на профиле зависит от подписки текущего пользователя."""
+        url = reverse('posts:profile', kwargs={'username': self.post_author})
+        Follow.objects.create(user=self.post_author, author=self.post_author)
+        response = self.follower_client.get(url)
+        self.assertFalse(response.context['following'])
+        Follow.objects.create(user=self.post_follower, author=self.post_author)
+        response = self.follower_client.get(url)
+        self.assertTrue(response.context['following'])
+
+    def test_group_follow(self):
+        """Подписка на всех авторов группы заполняет ленту."""
+        group = Group.objects.create(title='Группа', slug='group')
+        other = User.objects.create(username='other_author')
+        posts = [
+            Post.objects.create(text='В группе', author=author, group=group)
+            for author in (self.post_author, other, self.post_follower)
+        ]
+        url = reverse('posts:group_follow', kwargs={'slug': group.slug})
+        response = self.follower_client.get(url)
+        self.assertEqual(response.status_code, 405)
+        self.assertFalse(Follow.objects.exists())
+        csrf_client = Client(enforce_csrf_checks=True)
+        csrf_client.force_login(self.post_follower)
+        response = csrf_client.post(url)
+        self.assertTemplateUsed(response, 'core/403csrf.html')
+        self.assertFalse(Follow.objects.exists())
+        self.follower_client.post(url)
+        self.assertEqual(
+            set(Follow.objects.filter(user=self.post_follower).values_list(
+                'author_id', flat=True
+            )),
+            {self.post_author.pk, other.pk},
+        )
+        self.assertEqual(
+            set(FeedEntry.objects.filter(user=self.post_follower).values_list(
+                'post_id', flat=True
+            )),
+            {self.post.pk, posts[0].pk, posts[1].pk},
+        )
+
+    def test_follow_lists_paginated(self):
+        """Списки подписчиков и подписок листаются курсором."""
+        readers = [
+            User.objects.create(username=f'reader_{i}')
+            for i in range(FOLLOWS_ON_PAGE + 1)
+        ]
+        for reader in readers:
+            follows.follow(reader, [self.post_author.pk])
+        url = reverse(
+            'posts:followers', kwargs={'username': self.post_author}
+        )
+        response = self.client.get(url)
+        self.assertEqual(response.context['followers_count'], len(readers))
+        first = response.context['people']
+        self.assertEqual(first[0], readers[-1])
+        self.assertEqual(len(first), FOLLOWS_ON_PAGE)
+        response = self.client.get(
+            url, {'cursor': response.context['page_obj'].next_cursor}
+        )
+        self.assertEqual(response.context['people'], [readers[0]])
+        response = self.client.get(reverse(
+            'posts:following', kwargs={'username': readers[0]}
+        ))
+        self.assertEqual(response.context['people'], [self.post_author])
+
+    @override_settings(POSTS_FEED_FANOUT_LIMIT=0)
+    def test_celebrity_posts_read_on_demand(self):
+        """Посты авторов с множеством подписчиков читаются напрямую."""
+        Follow.objects.create(
+            user=self.post_follower,
+            author=self.post_author)
+        post = Post.objects.create(
+            text='Новый пост',
+            author=self.post_author,
+        )
+        self.assertFalse(FeedEntry.objects.exists())
+        response = self.follower_client.get(
+            reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj'].object_list),
+            [post, self.post],
+        )
+
+
+class PerformanceMetricsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.staff = User.objects.create_user(
+            username='Staff', is_staff=True
+        )
+        Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        metrics.reset()
+        self.guest_client = Client()
+
+    def test_server_timing_header(self):
+        """Ответы posts и about содержат замеры в Server-Timing."""
+        for url in (reverse('posts:index'), reverse('about:author')):
+            with self.subTest(url=url):
+                timing = self.guest_client.get(url)['Server-Timing']
+                self.assertIn('total;dur=', timing)
+                self.assertRegex(timing, r'db;dur=[\d.]+;desc="\d+ queries"')
+                self.assertIn('tpl;dur=', timing)
+
+    def test_metrics_aggregated_by_view(self):
+        """Замеры складываются по представлениям и видны персоналу."""
+        caches['posts'].clear()
+        self.guest_client.get(reverse('posts:index'))
+        self.guest_client.get(reverse('posts:index'))
+        metrics_url = reverse('performance_metrics')
+        self.assertEqual(self.guest_client.get(metrics_url).status_code, 302)
+        staff_client = Client()
+        staff_client.force_login(self.staff)
+        data = staff_client.get(metrics_url).json()
+        index = data['views']['posts:index']
+        self.assertEqual(index['requests'], 2)
+        self.assertGreater(index['sql_queries'], 0)
+        self.assertGreater(index['template_ms'], 0)
+        self.assertEqual(sum(index['histogram'].values()), 2)
+        self.assertGreaterEqual(index['cache_hits'], 1)
+        self.assertNotIn('performance_metrics', data['views'])
+
+
+class AnonymousPageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа', slug='other-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, text='Тестовый пост', group=cls.group
+        )
+        cls.index = reverse('posts:index')
+        cls.group_list = reverse(
+            'posts:group_list', kwargs={'slug': cls.group.slug}
+        )
+        cls.post_detail = reverse(
+            'posts:post_detail', kwargs={'post_id': cls.post.id}
+        )
+
+    def setUp(self):
+        caches['posts'].clear()
+        self.guest_client = Client()
+
+    @override_settings(CACHE_SHARED=False)
+    def test_versions_expire_in_process_cache(self):
+        """Без общего кеша версии истекают, и ETag страницы меняется."""
+        first = self.guest_client.get(self.index)
+        later = time.time() + caching.version_ttl() + 1
+        with mock.patch('time.time', return_value=later):
+            second = self.guest_client.get(self.index)
+        self.assertNotEqual(first['ETag'], second['ETag'])
+        with override_settings(CACHE_SHARED=True):
+            self.assertIsNone(caching.version_ttl())
+
+    def test_cached_page_served_without_queries(self):
+        """Повторный запрос анонима отдаётся из кеша без запросов к БД."""
+        first = self.guest_client.get(self.index)
+        with self.assertNumQueries(0):
+            second = self.guest_client.get(self.index)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertIn('Last-Modified', second)
+
+    def test_conditional_get(self):
+        """Совпавшие ETag или Last-Modified дают 304."""
+        response = self.guest_client.get(self.post_detail)
+        for header, value in (
+            ('HTTP_IF_NONE_MATCH', response['ETag']),
+            ('HTTP_IF_MODIFIED_SINCE', response['Last-Modified']),
+        ):
+            with self.subTest(header=header):
+                revalidated = self.guest_client.get(
+                    self.post_detail, **{header: value}
+                )
+                self.assertEqual(revalidated.status_code, 304)
+
+    def test_invalidated_by_related_changes_only(self):
+        """Страница сбрасывается только изменениями своих данных."""
+        urls = (self.index, self.group_list, self.post_detail)
+
+        def changed_after(change):
+            etags = {url: self.guest_client.get(url)['ETag'] for url in urls}
+            change()
+            return {
+                url: self.guest_client.get(url)['ETag'] != etag
+                for url, etag in etags.items()
+            }
+
+        # Карточки в списках показывают число комментариев.
+        self.assertEqual(changed_after(lambda: Comment.objects.create(
+            post=self.post, author=self.user, text='Ок'
+        )), {
+            self.index: True,
+            self.group_list: True,
+            self.post_detail: True,
+        })
+        self.assertEqual(changed_after(lambda: Post.objects.create(
+            author=User.objects.create_user(username='Other'),
+            text='Пост в другой группе', group=self.other_group,
+        )), {
+            self.index: True,
+            self.group_list: False,
+            self.post_detail: False,
+        })
+
+        def rename():
+            self.user.first_name = 'Новое имя'
+            self.user.save()
+
+        self.assertTrue(changed_after(rename)[self.group_list])
+
+    def test_unknown_params_share_entry(self):
+        """Лишние параметры не заводят новых записей в кеше."""
+        first = self.guest_client.get(self.index, {'order': 'new'})
+        for params in ({'order': 'new', 'x': 1}, {'x': 2, 'order': 'new'}):
+            with self.subTest(params=params):
+                with self.assertNumQueries(0):
+                    response = self.guest_client.get(self.index, params)
+                self.assertEqual(response.content, first.content)
+                self.assertNotIn(b'x=', response.content)
+
+    def test_authorized_pages_not_cached(self):
+        """Авторизованный пользователь получает страницу без кеша."""
+        client = Client()
+        client.force_login(self.user)
+        self.guest_client.get(self.index)
+        response = client.get(self.index)
+        self.assertIn('page_obj', response.context)
+        self.assertNotIn('ETag', response)
+
+
+class ExportViewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.staff = User.objects.create_user(
+            username='Staff', is_staff=True
+        )
+        Post.objects.create(author=cls.user, text='Тестовый пост')
+        cls.export = reverse('posts:export')
+
+    def test_export_streams_for_staff_only(self):
+        """Выгрузка идёт потоком и доступна только персоналу."""
+        client = Client()
+        client.force_login(self.user)
+        self.assertEqual(client.get(self.export).status_code, 302)
+        client.force_login(self.staff)
+        response = client.get(self.export, {'model': 'posts'})
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertIn('Тестовый пост', lines[0])
+        response = client.get(
+            self.export, {'format': 'csv', 'model': ['posts', 'groups']}
+        )
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,20 @@
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    """Проверки числа SQL-запросов для страниц."""
+
+    @contextmanager
+    def assertMaxQueries(self, budget):
+        """Блок выполняет не больше ``budget`` запросов."""
+        with CaptureQueriesContext(connection) as queries:
+            yield queries
+        executed = len(queries)
+        if executed > budget:
+            self.fail(
+                f'Выполнено {executed} запросов при бюджете {budget}:\n'
+                + '\n'.join(query['sql'] for query in queries)
+            )
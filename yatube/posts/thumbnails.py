@@ -0,0 +1,150 @@
+"""Фоновая генерация миниатюр картинок постов.
+
+Сохранение поста с картинкой ставит её в очередь ``ThumbnailTask``,
+которую разбирает команда ``generate_thumbnails`` (или пул потоков
+процесса, если задан ``POSTS_THUMBNAIL_WORKERS``). Шаблоны берут
+миниатюру только из хранилища ключей sorl и, пока её нет, показывают
+исходную картинку — запрос страницы ничего не масштабирует. Там же
+уменьшаются слишком большие исходники (см. ``posts.uploads``) и
+строятся адаптивные варианты (см. ``posts.images``), так что запрос
+загрузки картинку целиком не декодирует.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from sorl.thumbnail import default
+from sorl.thumbnail import get_thumbnail as make_thumbnail
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+from . import caching
+from .images import CARD_GEOMETRY, build_missing
+from .models import Post, PostImageVariant, ThumbnailTask
+from .uploads import shrink_original
+
+logger = logging.getLogger(__name__)
+
+CARD_OPTIONS = {'crop': 'center', 'upscale': True}
+BATCH_SIZE = 50
+
+_lock = threading.Lock()
+_pending = set()
+_executor = None
+
+
+class CachedThumbnailBackend(ThumbnailBackend):
+    """Поиск готовой миниатюры без обращения к картинке."""
+
+    def cached_thumbnail(self, file_, geometry_string, **options):
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+
+_backend = CachedThumbnailBackend()
+
+
+def cached_card(image):
+    """Готовая миниатюра карточки поста или ``None``."""
+    if not image:
+        return None
+    return _backend.cached_thumbnail(image, CARD_GEOMETRY, **CARD_OPTIONS)
+
+
+def generate(name):
+    """Уменьшить большой исходник, построить варианты и миниатюры.
+
+    ``False``, если файла нет.
+    """
+    if not default_storage.exists(name):
+        return False
+    name = shrink_original(name)
+    # Варианты заменяют в карточке миниатюру sorl: второй раз картинку
+    # декодировать не нужно.
+    if not build_missing(name) and not PostImageVariant.objects.filter(
+        post__image=name
+    ).exists():
+        # Исходник — в хранилище картинок постов, а не миниатюр.
+        make_thumbnail(
+            ImageFile(name, default_storage), CARD_GEOMETRY, **CARD_OPTIONS
+        )
+    # Закешированные карточки до сих пор показывают исходник.
+    caching.bump_posts(posts_with_image(name))
+    return True
+
+
+def posts_with_image(name):
+    return Post.objects.filter(image=name).values_list(
+        'pk', 'author_id', 'group_id'
+    )
+
+
+def enqueue(name):
+    """Поставить картинку в очередь; пулу — после фиксации транзакции."""
+    ThumbnailTask.objects.bulk_create(
+        [ThumbnailTask(image=name)], ignore_conflicts=True
+    )
+    if settings.POSTS_THUMBNAIL_WORKERS:
+        transaction.on_commit(lambda: _submit(name))
+
+
+def _submit(name):
+    global _executor
+    with _lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.POSTS_THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+    _executor.submit(_work, name)
+
+
+def _work(name):
+    try:
+        process(ThumbnailTask.objects.filter(image=name))
+    except Exception:
+        logger.exception('Не удалось построить миниатюру %s', name)
+    finally:
+        with _lock:
+            _pending.discard(name)
+        connection.close()
+
+
+def process(tasks=None, limit=None):
+    """Разобрать очередь; вернуть число обработанных картинок.
+
+    Задача удаляется и тогда, когда файла нет или он не открывается:
+    повторная попытка ничего не изменит.
+    """
+    tasks = ThumbnailTask.objects.all() if tasks is None else tasks
+    done = 0
+    while limit is None or done < limit:
+        size = BATCH_SIZE if limit is None else min(BATCH_SIZE, limit - done)
+        batch = list(tasks.order_by('pk')[:size])
+        if not batch:
+            break
+        for task in batch:
+            try:
+                generate(task.image)
+            except Exception:
+                logger.exception('Не удалось построить миниатюру %s', task)
+            ThumbnailTask.objects.filter(pk=task.pk).delete()
+            done += 1
+    return done
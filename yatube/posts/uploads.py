@@ -0,0 +1,112 @@
+"""Ограничения на загружаемые картинки постов.
+
+Тело запроса читается потоком: ``LimitedUploadHandler`` считает байты
+каждого файла и, превысив ``POSTS_UPLOAD_MAX_BYTES``, перестаёт
+передавать их дальше — остаток не попадает ни в память, ни во
+временный файл. ``PostForm`` отклоняет такой файл, а у остальных
+проверяет число пикселей по заголовку, который ``ImageField`` уже
+прочитал: картинка целиком при проверке не декодируется.
+
+Исходники со стороной больше ``POSTS_IMAGE_MAX_SIDE`` уменьшаются
+не в запросе, а в очереди миниатюр (``shrink_original``).
+"""
+import io
+import os
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps
+
+from . import caching
+from .models import Post
+
+SAVE_OPTIONS = {'JPEG': {'quality': 90}, 'PNG': {'optimize': True}}
+
+
+class OversizedUpload(UploadedFile):
+    """Отброшенный файл: от него остались только имя и размер."""
+
+    def __init__(self, name, content_type, size):
+        super().__init__(io.BytesIO(), name, content_type, size)
+
+
+class LimitedUploadHandler(FileUploadHandler):
+    """Первый обработчик загрузки: не пускает дальше лишние байты."""
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.POSTS_UPLOAD_MAX_BYTES:
+            return None
+        return raw_data
+
+    def file_complete(self, file_size):
+        if self.received > settings.POSTS_UPLOAD_MAX_BYTES:
+            return OversizedUpload(
+                self.file_name, self.content_type, self.received
+            )
+        return None
+
+
+def check_size(size):
+    if size > settings.POSTS_UPLOAD_MAX_BYTES:
+        raise ValidationError(
+            'Файл больше %(limit)s.', code='too_large',
+            params={'limit': filesizeformat(settings.POSTS_UPLOAD_MAX_BYTES)},
+        )
+
+
+def check_pixels(width, height):
+    if width * height > settings.POSTS_IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Картинка больше %(limit)s Мп.', code='too_many_pixels',
+            params={'limit': settings.POSTS_IMAGE_MAX_PIXELS // 10 ** 6},
+        )
+
+
+def shrink_original(name):
+    """Уменьшить исходник до ``POSTS_IMAGE_MAX_SIDE``; вернуть имя файла.
+
+    Посты с этой картинкой переводятся на уменьшенную копию, анимация
+    не трогается. Исходник не удаляется: файл с тем же хешем мог только
+    что получить новый пост, а без ссылок его уберёт ``gc_media``.
+    """
+    max_side = settings.POSTS_IMAGE_MAX_SIDE
+    with default_storage.open(name) as source:
+        image = Image.open(source)
+        if (
+            max(image.size) <= max_side
+            or getattr(image, 'is_animated', False)
+        ):
+            return name
+        image_format = image.format
+        scale = max_side / max(image.size)
+        # JPEG декодируется сразу в уменьшенном масштабе.
+        image.draft(image.mode, (
+            round(image.width * scale), round(image.height * scale)
+        ))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(
+            buffer, image_format, **SAVE_OPTIONS.get(image_format, {})
+        )
+    saved = default_storage.save(
+        Post.image.field.generate_filename(None, os.path.basename(name)),
+        ContentFile(buffer.getvalue()),
+    )
+    # Одна картинка может быть у нескольких постов. UPDATE не вызывает
+    # сигналов, поэтому их страницы сбрасываются здесь.
+    moved = Post.objects.filter(image=name)
+    rows = list(moved.values_list('pk', 'author_id', 'group_id'))
+    moved.update(image=saved)
+    caching.bump_posts(rows)
+    return saved
@@ -1,7 +1,244 @@
+import base64
+import binascii
+import json
+from collections.abc import Sequence
+from contextlib import contextmanager
+
+from django.core.exceptions import ValidationError
 from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+CURSOR_PARAM = 'cursor'
+POST_ORDERING = ('-pub_date', '-id')
+
 
+def pagination(queryset, request, posts_on_page, cursor=False, count=None,
+               ordering=None):
+    """Постраничный вывод: номера страниц или курсоры (keyset).
 
-def pagination(queryset, request, posts_on_page):
+    Курсорный режим включается флагом ``cursor`` или наличием
+    курсора в запросе, чтобы ссылки «вперёд/назад» оставались рабочими.
+    Известное заранее ``count`` избавляет Paginator от COUNT(*).
+    ``ordering`` — поля сортировки с уникальным последним полем.
+    """
+    if cursor or CURSOR_PARAM in request.GET:
+        paginator = CursorPaginator(
+            queryset, posts_on_page, ordering=ordering or POST_ORDERING
+        )
+        return paginator.get_page(request.GET.get(CURSOR_PARAM))
+    if ordering:
+        queryset = queryset.order_by(*ordering)
     paginator = Paginator(queryset, posts_on_page)
+    if count is not None:
+        # Paginator.count — cached_property, значение можно подставить.
+        paginator.count = count
     page_number = request.GET.get('page')
     return paginator.get_page(page_number)
+
+
+class CursorPaginator:
+    """Пагинатор по ключу сортировки без COUNT(*) и OFFSET.
+
+    Страница выбирается условием «строго после/до последней показанной
+    записи» по полям ``ordering`` (по умолчанию ``(pub_date, id)``),
+    поэтому глубина страницы не влияет на стоимость запроса.
+    """
+
+    keyset = True
+
+    def __init__(self, queryset, per_page, ordering=POST_ORDERING):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+
+    def get_page(self, token):
+        """Вернуть страницу по токену; битый токен ведёт на первую."""
+        try:
+            direction, values = self.decode(token)
+        except ValueError:
+            direction, values = None, None
+        return self.page(direction, values, token)
+
+    def decode(self, token):
+        """Направление и значения ключа из токена; ``ValueError`` для битого.
+
+        Значения приводятся к типам полей сортировки, чтобы подделанный
+        токен не доходил до запроса.
+        """
+        direction, values = decode_cursor(token, len(self.ordering))
+        if values is None:
+            return direction, values
+        try:
+            values = [
+                self._field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except (ValidationError, TypeError, ValueError):
+            raise ValueError('Некорректный курсор')
+        if None in values:
+            raise ValueError('Некорректный курсор')
+        return direction, values
+
+    def _field(self, name):
+        """Поле модели или аннотации по пути ``a__b``."""
+        annotations = self.queryset.query.annotations
+        if name in annotations:
+            return annotations[name].output_field
+        model = self.queryset.model
+        *path, last = name.split('__')
+        for part in path:
+            model = model._meta.get_field(part).related_model
+        return model._meta.get_field(last)
+
+    def page(self, direction=None, values=None, token=None):
+        queryset = self.queryset.order_by(*self.ordering)
+        backwards = direction == 'p'
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, backwards))
+        if backwards:
+            queryset = queryset.reverse()
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+            return CursorPage(
+                rows, self, token,
+                has_next=True, has_previous=has_more,
+            )
+        return CursorPage(
+            rows, self, token,
+            has_next=has_more, has_previous=values is not None,
+        )
+
+    def key(self, obj):
+        """Значения полей сортировки для объекта или строки values()."""
+        if isinstance(obj, dict):
+            return [obj[field.lstrip('-')] for field in self.ordering]
+        values = []
+        for field in self.ordering:
+            value = obj
+            for part in field.lstrip('-').split('__'):
+                value = getattr(value, part)
+            values.append(value)
+        return values
+
+    def _seek(self, values, backwards):
+        """Условие (a, b) < (x, y), развёрнутое в OR для любых СУБД."""
+        condition = Q()
+        equal = {}
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            descending = field.startswith('-') != backwards
+            lookup = 'lt' if descending else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+
+class CursorPage(Sequence):
+    """Страница курсорного пагинатора с интерфейсом, близким к Page."""
+
+    def __init__(self, object_list, paginator, token=None,
+                 has_next=False, has_previous=False):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.token = token or ''
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return f'<CursorPage {self.token or "first"}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    @property
+    def number(self):
+        """Идентификатор страницы для ключей кеша фрагментов."""
+        return self.token or 1
+
+    def has_next(self):
+        return self._has_next and bool(self.object_list)
+
+    def has_previous(self):
+        return self._has_previous and bool(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def next_cursor(self):
+        if not self.has_next():
+            return None
+        return encode_cursor('n', self.paginator.key(self.object_list[-1]))
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous():
+            return None
+        return encode_cursor('p', self.paginator.key(self.object_list[0]))
+
+
+def encode_cursor(direction, values):
+    """Упаковать направление и значения ключа в токен для URL."""
+    payload = json.dumps(
+        [direction] + [_dump_value(value) for value in values],
+        separators=(',', ':'),
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, size):
+    """Распаковать токен курсора; ``ValueError`` для некорректного."""
+    if not token:
+        return None, None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError('Некорректный курсор')
+    if (
+        not isinstance(payload, list)
+        or len(payload) != size + 1
+        or payload[0] not in ('n', 'p')
+    ):
+        raise ValueError('Некорректный курсор')
+    return payload[0], [_load_value(value) for value in payload[1:]]
+
+
+def _dump_value(value):
+    if hasattr(value, 'isoformat'):
+        return {'dt': value.isoformat()}
+    return value
+
+
+def _load_value(value):
+    if isinstance(value, dict):
+        parsed = parse_datetime(str(value.get('dt', '')))
+        if parsed is None:
+            raise ValueError('Некорректный курсор')
+        return parsed
+    if isinstance(value, (int, float, str)) or value is None:
+        return value
+    raise ValueError('Некорректный курсор')
+
+
+@contextmanager
+def keep_auto_now_add(model, *field_names):
+    """Не подменять датой создания значения полей с ``auto_now_add``.
+
+    Нужно для ``bulk_create`` при загрузке данных с готовыми датами.
+    """
+    fields = [model._meta.get_field(name) for name in field_names]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
@@ -1,65 +1,173 @@
 
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.contrib.auth.decorators import login_required
-from .models import Post, Group, Follow
+from django.core.paginator import Paginator
+from django.views.decorators.http import require_POST
+from .models import Comment, Post, Group, Follow
 from .forms import PostForm, User, CommentForm
-from .utils import pagination
+from .caching import anonymous_page_cache, depends_on
+from . import exporting, follows, ranking
+from .counters import follow_feed_count, follower_counts, post_count
+from .feed import FEED_ORDERING, feed_posts
+from .search import SearchResults
+from .utils import CURSOR_PARAM, POST_ORDERING, CursorPaginator, pagination
 
 POST_ON_PAGE: int = 10
+POST_ORDERINGS = {
+    'new': POST_ORDERING,
+    'activity': ('-last_activity', '-id'),
+}
+INDEX_ORDERINGS = {**POST_ORDERINGS, **ranking.ORDERINGS}
+COMMENTS_ON_PAGE: int = 20
+COMMENTS_PARAM = 'comments'
+FOLLOWS_ON_PAGE: int = 50
+FOLLOW_ORDERING = ('-id',)
 
 
+def post_ordering(request, orderings=POST_ORDERINGS):
+    """Порядок ленты из ``?order=``; по умолчанию — новые посты."""
+    order = request.GET.get('order')
+    if order not in orderings:
+        order = 'new'
+    return order, orderings[order]
+
+
+def card_posts(queryset):
+    """Посты для карточек: автор и группа — JOIN, варианты картинок."""
+    return queryset.select_related('author', 'group').prefetch_related(
+        'image_variants'
+    )
+
+
+def comments_page(post_id, token=None):
+    """Страница комментариев поста, от новых к старым, по курсору."""
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author'
+    )
+    paginator = CursorPaginator(
+        comments, COMMENTS_ON_PAGE, ordering=('-created', '-id')
+    )
+    return paginator.get_page(token)
+
+
+@anonymous_page_cache
 def index(request):
     """Вывод на главную страницу 10 последних постов."""
     template = 'posts/index.html'
-    post_list = Post.objects.select_related()
-    page_obj = pagination(post_list, request, POST_ON_PAGE)
+    depends_on(request, 'posts')
+    order, ordering = post_ordering(request, INDEX_ORDERINGS)
+    post_list = card_posts(Post.objects.all())
+    if order in ranking.ORDERINGS:
+        depends_on(request, 'ranking')
+        post_list = ranking.ranked(post_list)
+    page_obj = pagination(
+        post_list, request, POST_ON_PAGE,
+        cursor=settings.POSTS_CURSOR_PAGINATION,
+        count=post_count(),
+        ordering=ordering,
+    )
     context = {
         'page_obj': page_obj,
+        'order': order,
     }
     return render(request, template, context)
 
 
+@anonymous_page_cache
 def group_posts(request, slug):
     """Вывод на страницу 10 постов группы."""
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    page_obj = pagination(post_list, request, POST_ON_PAGE)
+    depends_on(request, f'group:{group.pk}')
+    order, ordering = post_ordering(request)
+    post_list = card_posts(group.posts.all())
+    page_obj = pagination(
+        post_list, request, POST_ON_PAGE,
+        cursor=settings.POSTS_CURSOR_PAGINATION,
+        count=post_count(group=group),
+        ordering=ordering,
+    )
     context = {
         'group': group,
         'page_obj': page_obj,
+        'order': order,
     }
     return render(request, template, context)
 
 
+@anonymous_page_cache
 def profile(request, username):
     """Вывод на страницу 10 постов пользователя."""
     template = 'posts/profile.html'
     author = get_object_or_404(User, username=username)
-    posts = Post.objects.filter(author__username=author)
-    page_obj = pagination(posts, request, POST_ON_PAGE)
-    following = author.following.exists()
+    depends_on(request, f'author:{author.pk}')
+    order, ordering = post_ordering(request)
+    posts = card_posts(author.posts.all())
+    posts_count = post_count(author=author)
+    page_obj = pagination(
+        posts, request, POST_ON_PAGE,
+        cursor=settings.POSTS_CURSOR_PAGINATION,
+        count=posts_count,
+        ordering=ordering,
+    )
+    following = request.user.is_authenticated and Follow.objects.filter(
+        user=request.user, author=author
+    ).exists()
     context = {
         'author': author,
         'page_obj': page_obj,
+        'order': order,
+        'posts_count': posts_count,
         'following': following,
     }
     return render(request, template, context)
 
 
+def search(request):
+    """Полнотекстовый поиск по постам с подсветкой найденного."""
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    # Выдача упорядочена по релевантности, курсор к ней неприменим.
+    paginator = Paginator(SearchResults(query), POST_ON_PAGE)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, template, context)
+
+
+@anonymous_page_cache
 def post_detail(request, post_id):
     """Вывод на страницу подробной информации о посте."""
     template = 'posts/post_detail.html'
     form = CommentForm()
     post = get_object_or_404(
-        Post.objects.select_related('author', 'group'),
+        card_posts(Post.objects.all()),
         pk=post_id
     )
-    comments = post.comments.all()
+    depends_on(request, f'post:{post.pk}', f'author:{post.author_id}')
+    if post.group_id is not None:
+        depends_on(request, f'group:{post.group_id}')
+    comments = comments_page(post.pk, request.GET.get(COMMENTS_PARAM))
     context = {
         'post': post,
         'form': form,
         'comments': comments,
+        'author_posts_count': post_count(author=post.author),
+    }
+    return render(request, template, context)
+
+
+def post_comments(request, post_id):
+    """HTML-фрагмент со следующей страницей комментариев поста."""
+    template = 'posts/includes/comment_list.html'
+    context = {
+        'post_id': post_id,
+        'comments': comments_page(post_id, request.GET.get(CURSOR_PARAM)),
     }
     return render(request, template, context)
 
@@ -77,9 +185,8 @@ def post_create(request):
     if request.method == 'POST':
         if not form.is_valid():
             return render(request, template, context)
-        post = form.save(commit=False)
-        post.author = request.user
-        post.save()
+        form.instance.author = request.user
+        post = form.save()
     return redirect('posts:profile', username=post.author)
 
 
@@ -98,7 +205,7 @@ def post_edit(request, post_id):
         'is_edit': True,
         'post_id': post_id,
     }
-    if post.author == request.user:
+    if post.author_id == request.user.id:
         if request.method == 'POST':
             if not form.is_valid():
                 return render(request, template, context)
@@ -125,8 +232,13 @@ def add_comment(request, post_id):
 def follow_index(request):
     """Вывод на страницу постов авторов, на которых подписан пользователь."""
     template = 'posts/follow.html'
-    post_list = Post.objects.filter(author__following__user=request.user)
-    page_obj = pagination(post_list, request, POST_ON_PAGE)
+    post_list = card_posts(feed_posts(request.user))
+    page_obj = pagination(
+        post_list, request, POST_ON_PAGE,
+        cursor=settings.POSTS_CURSOR_PAGINATION,
+        count=follow_feed_count(request.user),
+        ordering=FEED_ORDERING,
+    )
     context = {
         "page_obj": page_obj,
     }
@@ -137,10 +249,7 @@ def follow_index(request):
 def profile_follow(request, username):
     """Подписка на автора."""
     author = get_object_or_404(User, username=username)
-    if author != request.user and not author.following.filter(
-        user=request.user
-    ).exists():
-        Follow.objects.get_or_create(user=request.user, author=author)
+    follows.follow(request.user, [author.pk])
     return redirect('posts:follow_index')
 
 
@@ -148,5 +257,90 @@ def profile_follow(request, username):
 def profile_unfollow(request, username):
     """Отписка от автора."""
     author = get_object_or_404(User, username=username)
-    Follow.objects.get(user=request.user, author=author).delete()
+    follows.unfollow(request.user, [author.pk])
     return redirect('posts:follow_index')
+
+
+@login_required
+@require_POST
+def group_follow(request, slug):
+    """Подписка на всех авторов группы одним запросом (POST с CSRF)."""
+    group = get_object_or_404(Group, slug=slug)
+    follows.follow(request.user, group_authors(group))
+    return redirect('posts:group_list', slug=slug)
+
+
+def group_authors(group):
+    """Id авторов, писавших в группу."""
+    return group.posts.order_by().values_list(
+        'author_id', flat=True
+    ).distinct()
+
+
+def follow_list(request, user, follows_qs, person):
+    """Страница подписок ``follows_qs`` по курсору, новые первыми.
+
+    ``person`` — поле подписки, которое показывается в списке:
+    ``user`` для подписчиков и ``author`` для подписок.
+    """
+    paginator = CursorPaginator(
+        follows_qs.select_related(person), FOLLOWS_ON_PAGE,
+        ordering=FOLLOW_ORDERING,
+    )
+    page_obj = paginator.get_page(request.GET.get(CURSOR_PARAM))
+    context = {
+        'author': user,
+        'page_obj': page_obj,
+        'people': [getattr(item, person) for item in page_obj],
+        'followers_count': (
+            follower_counts([user.pk])[user.pk] if person == 'user' else None
+        ),
+        'person': person,
+    }
+    return render(request, 'posts/follow_list.html', context)
+
+
+@anonymous_page_cache
+def followers(request, username):
+    """Подписчики автора."""
+    author = get_object_or_404(User, username=username)
+    depends_on(request, f'author:{author.pk}')
+    return follow_list(
+        request, author, Follow.objects.filter(author=author), 'user'
+    )
+
+
+@anonymous_page_cache
+def following(request, username):
+    """Авторы, на которых подписан пользователь."""
+    user = get_object_or_404(User, username=username)
+    depends_on(request, f'follow:{user.pk}')
+    return follow_list(
+        request, user, Follow.objects.filter(user=user), 'author'
+    )
+
+
+@staff_member_required
+def export(request):
+    """Потоковая выгрузка таблиц в JSONL или CSV для персонала."""
+    kinds = request.GET.getlist('model') or list(exporting.MODELS)
+    fmt = request.GET.get('format', 'jsonl')
+    if (
+        fmt not in exporting.FORMATS
+        or not set(kinds) <= set(exporting.MODELS)
+        or fmt == 'csv' and len(kinds) != 1
+    ):
+        return HttpResponseBadRequest(
+            'Укажите format=jsonl|csv и model (для CSV — одну).'
+        )
+    content_type = (
+        'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    )
+    response = StreamingHttpResponse(
+        exporting.chunks(exporting.lines(kinds, fmt)),
+        content_type=f'{content_type}; charset=utf-8',
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{"-".join(kinds)}.{fmt}"'
+    )
+    return response
@@ -49,30 +49,42 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'sorl.thumbnail',
-    'debug_toolbar',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.ReplicaPinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
+# Debug-панель дорога и нужна только при разработке
+if DEBUG:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backends.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Скомпилированные шаблоны хранятся в памяти процесса в любом
+            # окружении; после правки шаблона нужен перезапуск сервера.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -97,6 +109,24 @@ DATABASES = {
     }
 }
 
+# Реплики только для чтения: пути к базам SQLite через запятую
+# в YATUBE_DB_REPLICAS (локально — копии db.sqlite3)
+DATABASE_REPLICAS = []
+for _number, _path in enumerate(
+    filter(None, os.getenv('YATUBE_DB_REPLICAS', '').split(',')), 1
+):
+    DATABASES[f'replica{_number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': _path,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{_number}')
+
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+
+# Сколько секунд после записи пользователь читает из основной базы
+DATABASE_PIN_SECONDS = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -138,6 +168,25 @@ STATIC_URL = '/static/'
 
 STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
 
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+
+# collectstatic с хешами в именах и сжатыми копиями .gz/.br; шаблонам
+# тогда нужен собранный манифест, поэтому включается вместе с выкладкой
+if os.getenv('YATUBE_STATIC_MANIFEST'):
+    STATICFILES_STORAGE = (
+        'core.storage.CompressedManifestStaticFilesStorage'
+    )
+
+# Django сам раздаёт статику и медиа с заголовками долгого кеширования
+# (core.serving) — когда перед ним нет отдельного веб-сервера
+SERVE_FILES = bool(os.getenv('YATUBE_SERVE_FILES'))
+
+# Байты медиа отдаёт фронт-сервер по заголовку ответа: 'x-accel'
+# (nginx, internal location MEDIA_SENDFILE_URL -> MEDIA_ROOT) или
+# 'x-sendfile' (Apache mod_xsendfile); пусто — FileResponse
+MEDIA_SENDFILE = os.getenv('YATUBE_MEDIA_SENDFILE', '')
+MEDIA_SENDFILE_URL = '/protected-media/'
+
 LOGIN_URL = 'users:login'
 
 LOGIN_REDIRECT_URL = 'posts:index'
@@ -154,12 +203,96 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Загрузки хранятся по хешу содержимого: одинаковые картинки — один
+# файл и общие миниатюры; неиспользуемые файлы удаляет gc_media.
+# Миниатюрам sorl нужны имена, которые он вычислил сам.
+DEFAULT_FILE_STORAGE = 'core.storage.HashedFileSystemStorage'
+THUMBNAIL_STORAGE = 'django.core.files.storage.FileSystemStorage'
+
+# Бэкенд кеша: locmem — свой кеш в каждом процессе; file, shm
+# (файлы в разделяемой памяти /dev/shm) и db — общий для воркеров.
+# Для db нужно выполнить `manage.py createcachetable`.
+CACHE_BACKEND = os.getenv('YATUBE_CACHE_BACKEND', 'locmem')
+
+CACHE_BACKENDS = {
+    'locmem': ('core.cache_backends.StatsLocMemCache', 'yatube-{}'),
+    'file': (
+        'core.cache_backends.StatsFileBasedCache',
+        os.path.join(BASE_DIR, 'cache', '{}'),
+    ),
+    'shm': (
+        'core.cache_backends.StatsFileBasedCache',
+        os.path.join('/dev/shm', 'yatube-cache', '{}'),
+    ),
+    'db': ('core.cache_backends.StatsDatabaseCache', 'yatube_cache_{}'),
+}
+
+_cache_class, _cache_location = CACHE_BACKENDS[CACHE_BACKEND]
+
+# Общий кеш видят все воркеры, поэтому повышение версии в одном
+# процессе сразу действует и в остальных. В locmem оно остаётся
+# в своём процессе: там записи и версии живут недолго.
+CACHE_SHARED = CACHE_BACKEND != 'locmem'
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': _cache_class,
+        'LOCATION': _cache_location.format('default'),
+    },
+    # Фрагменты страниц постов и их версии в отдельном пространстве ключей
+    'posts': {
+        'BACKEND': _cache_class,
+        'LOCATION': _cache_location.format('posts'),
+        'KEY_PREFIX': 'posts',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
 }
 
+# Курсорная (keyset) пагинация лент вместо номеров страниц
+POSTS_CURSOR_PAGINATION = False
+
+# Авторы с большим числом подписчиков читаются в ленте напрямую,
+# без раздачи постов по лентам подписчиков
+POSTS_FEED_FANOUT_LIMIT = 10000
+
+# Время жизни фрагментов лент; актуальность обеспечивают версии,
+# которые повышаются сигналами при изменении данных. Без общего
+# кеша другие воркеры версий не видят, и срок ограничивает отставание.
+POSTS_FRAGMENT_CACHE_TTL = 60 * 60 * 3 if CACHE_SHARED else 20
+
+# Время жизни страниц, закешированных целиком для анонимов
+POSTS_PAGE_CACHE_TTL = 60 * 60 * 3 if CACHE_SHARED else 20
+
+# Потоки процесса для генерации миниатюр после сохранения поста;
+# при 0 очередь разбирает команда generate_thumbnails
+POSTS_THUMBNAIL_WORKERS = int(os.getenv('YATUBE_THUMBNAIL_WORKERS', 0))
+
+# Ширины и форматы адаптивных вариантов картинок постов; форматы,
+# которые не умеет кодировать Pillow, пропускаются, JPEG есть всегда
+POSTS_IMAGE_WIDTHS = (480, 960, 1440)
+POSTS_IMAGE_FORMATS = ('avif', 'webp')
+
+# Пределы загружаемой картинки: байты отсекаются при чтении запроса,
+# пиксели проверяются по заголовку, а исходник со стороной больше
+# POSTS_IMAGE_MAX_SIDE уменьшается в очереди миниатюр
+POSTS_UPLOAD_MAX_BYTES = 10 * 1024 * 1024
+POSTS_IMAGE_MAX_PIXELS = 40 * 10 ** 6
+POSTS_IMAGE_MAX_SIDE = 2560
+
+# Файлы больше мегабайта пишутся во временный файл кусками,
+# а не держатся в памяти процесса
+FILE_UPLOAD_MAX_MEMORY_SIZE = 1024 * 1024
+FILE_UPLOAD_HANDLERS = [
+    'posts.uploads.LimitedUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+# Пространства имён представлений, для которых собираются замеры
+# производительности (заголовок Server-Timing и /metrics/)
+PERFORMANCE_NAMESPACES = ('posts', 'api', 'users', 'about')
+PERFORMANCE_SERVER_TIMING = True
+
 INTERNAL_IPS = [
     '127.0.0.1',
 ]